@@ -0,0 +1,180 @@
+from __future__ import annotations
+import io
+import json
+import logging
+import struct
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+import numpy as np
+from django.db import connection, transaction
+from PB_Assistant.models import AcademicPaperTextEmbedding, EmbeddedText, EmbeddingSpace
+
+logger = logging.getLogger(__name__)
+
+# (academicpaper_text_id, chunk_index, content, content_hash, section, section_title, vector)
+EmbeddingRow = Tuple[int, int, str, Optional[str], Optional[str], Optional[str], np.ndarray]
+
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+STAGING_TABLE = "pb_embedding_staging"
+_ROW_PREFIX = struct.Struct("!hiqii")  # field count, bigint text id, integer chunk index
+_LENGTH = struct.Struct("!i")
+_VECTOR_HEADER = struct.Struct("!ihh")  # field length, pgvector dim, pgvector unused
+
+
+def _text_field(parts: list, value: Optional[str]):
+    if value is None:
+        parts.append(_LENGTH.pack(-1))
+    else:
+        data = value.encode("utf-8")
+        parts.append(_LENGTH.pack(len(data)))
+        parts.append(data)
+
+
+def encode_copy_rows(rows: Iterable[EmbeddingRow], dimensions: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yield a PostgreSQL binary COPY stream. Vectors are written from their float32 buffer directly;
+    with `dimensions`, a vector of any other length raises ValueError before it is written.
+    """
+    yield PGCOPY_HEADER
+    for text_id, chunk_index, content, content_hash, section, section_title, vector in rows:
+        vec = np.asarray(vector, dtype=">f4")
+        if dimensions is not None and vec.shape != (dimensions,):
+            raise ValueError(
+                f"Chunk {chunk_index} of text {text_id} has a vector of shape {vec.shape}, "
+                f"expected {dimensions} dimensions"
+            )
+        parts = [_ROW_PREFIX.pack(7, 8, text_id, 4, chunk_index)]
+        _text_field(parts, content)
+        _text_field(parts, content_hash)
+        _text_field(parts, section)
+        _text_field(parts, section_title)
+        parts.append(_VECTOR_HEADER.pack(4 + 4 * vec.shape[0], vec.shape[0], 0))
+        parts.append(vec.tobytes())
+        yield b"".join(parts)
+    yield PGCOPY_TRAILER
+
+
+class _StreamReader(io.RawIOBase):
+    """File-like adapter so psycopg2's copy_expert can pull from a generator of byte blocks."""
+
+    def __init__(self, blocks: Iterator[bytes]):
+        self._blocks = blocks
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._blocks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def copy_embeddings(space: EmbeddingSpace, rows: Iterable[EmbeddingRow], block_size: int = 1 << 20,
+                    mark_complete: bool = False) -> int:
+    """
+    Upsert chunk embeddings of one space via binary COPY into a temp staging table, followed by a
+    single set-based INSERT ... ON CONFLICT merge. Returns the number of rows merged.
+    With `mark_complete` (restores of whole chunk sets) the texts get their EmbeddedText marker.
+    Runs in the caller's transaction when there is one.
+
+    Every vector must have the space's dimensions (ValueError otherwise, nothing is written). If a
+    (text, chunk index) pair occurs more than once, the last row wins.
+    """
+    table = AcademicPaperTextEmbedding._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ("
+            "seq bigserial, academicpaper_text_id bigint, chunk_index integer, content text, "
+            "content_hash varchar(64), section varchar(32), section_title varchar(512), vector vector"
+            ") ON COMMIT DROP"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (academicpaper_text_id, chunk_index, content, content_hash, "
+            "section, section_title, vector) "
+            "FROM STDIN WITH (FORMAT binary)",
+            io.BufferedReader(_StreamReader(encode_copy_rows(rows, space.dimensions)), buffer_size=block_size),
+            size=block_size,
+        )
+        # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement, so repeated
+        # (text, chunk) pairs are collapsed first, keeping the last one copied.
+        cursor.execute(
+            f'INSERT INTO "{table}" '
+            "(space_id, academicpaper_text_id, chunk_index, content, content_hash, section, section_title, vector) "
+            "SELECT DISTINCT ON (academicpaper_text_id, chunk_index) "
+            "%s, academicpaper_text_id, chunk_index, content, content_hash, section, section_title, vector "
+            f"FROM {STAGING_TABLE} ORDER BY academicpaper_text_id, chunk_index, seq DESC "
+            "ON CONFLICT (space_id, academicpaper_text_id, chunk_index) DO UPDATE "
+            "SET content = EXCLUDED.content, content_hash = EXCLUDED.content_hash, section = EXCLUDED.section, "
+            "section_title = EXCLUDED.section_title, vector = EXCLUDED.vector",
+            [space.pk],
+        )
+        merged = cursor.rowcount
+        if mark_complete:
+            markers = EmbeddedText._meta.db_table
+            cursor.execute(
+                f'INSERT INTO "{markers}" (space_id, academicpaper_text_id, chunk_count, updated_at) '
+                f'SELECT e.space_id, e.academicpaper_text_id, count(*), now() FROM "{table}" e '
+                f"WHERE e.space_id = %s AND e.academicpaper_text_id IN (SELECT academicpaper_text_id FROM {STAGING_TABLE}) "
+                "GROUP BY e.space_id, e.academicpaper_text_id "
+                "ON CONFLICT (space_id, academicpaper_text_id) DO UPDATE "
+                "SET chunk_count = EXCLUDED.chunk_count, updated_at = EXCLUDED.updated_at",
+                [space.pk],
+            )
+    logger.debug(f"COPY-merged {merged} embeddings into space {space.name}")
+    return merged
+
+
+def _csv_value(value) -> str:
+    # Unquoted empty is NULL in PostgreSQL CSV; every other value is quoted, so "" stays an empty string.
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_csv(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence], block_size: int = 1 << 20) -> None:
+    """COPY rows (None for NULL; pass jsonb values as JSON strings) into `table`, streamed as CSV from an iterable."""
+    def blocks() -> Iterator[bytes]:
+        lines, size = [], 0
+        for row in rows:
+            line = ",".join(_csv_value(value) for value in row) + "\n"
+            lines.append(line)
+            size += len(line)
+            if size >= block_size:
+                yield "".join(lines).encode("utf-8")
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines).encode("utf-8")
+
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+        io.BufferedReader(_StreamReader(blocks()), buffer_size=block_size),
+        size=block_size,
+    )
+
+
+def rows_from_files(chunks_path: str, vectors_path: str) -> Iterator[EmbeddingRow]:
+    """
+    Read rows from a JSONL file of chunk metadata (academicpaper_text_id, chunk_index, content,
+    content_hash, optional section and section_title) and a parallel .npy matrix, memory-mapped so vectors are never fully loaded.
+    """
+    vectors = np.load(vectors_path, mmap_mode="r")
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            meta = json.loads(line)
+            yield (
+                meta["academicpaper_text_id"],
+                meta["chunk_index"],
+                meta["content"],
+                meta.get("content_hash"),
+                meta.get("section"),
+                meta.get("section_title"),
+                vectors[i],
+            )
@@ -0,0 +1,323 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import logging
+import os
+import socket
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from PB_Assistant.models import (
+    AcademicPaper, AcademicPaperPlanetaryBoundary, AcademicPaperText, AcademicPaperTextEmbedding,
+    AcademicPaperVector, EmbeddingSpace, PlanetaryBoundary,
+)
+from PB_Assistant.apps.textprocessing.copy_loader import copy_csv, copy_embeddings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "pb-corpus-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+VECTOR_DTYPES = ("float16", "float32")
+
+PAPER_FIELDS = (
+    "paper_id", "doi", "time_edited", "text", "title", "title_slug", "title_normalized",
+    "publication_year", "source", "keywords", "author_list", "meta",
+)
+JSON_FIELDS = ("keywords", "author_list", "meta")
+SPACE_FIELDS = ("name", "model_name", "dimensions", "chunk_size", "chunk_overlap", "chunk_unit", "chunker", "skip_sections")
+
+
+class SnapshotError(Exception):
+    """The snapshot is incomplete, corrupt, or does not fit the target database."""
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _write_jsonl(path: Path, records: Iterator[dict]) -> int:
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def _json(value) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def _read_jsonl(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_vectors(path: Path, rows: Iterator[tuple], count: int, dimensions: int, dtype: str, jsonl: Path) -> int:
+    """Write metadata to `jsonl` and vectors into a .npy memmap of `count` rows, in one pass over `rows`."""
+    vectors = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(count, dimensions))
+    written = 0
+
+    def records():
+        nonlocal written
+        for record, vector in rows:
+            if written >= count:
+                raise SnapshotError("More rows than counted; was the table modified during the export?")
+            vectors[written] = vector
+            written += 1
+            yield record
+
+    _write_jsonl(jsonl, records())
+    vectors.flush()
+    del vectors
+    if written != count:
+        raise SnapshotError(f"Expected {count} vectors, exported {written}")
+    return written
+
+
+def export_snapshot(space: EmbeddingSpace, output: str, dtype: str = "float16") -> dict:
+    """
+    Write the library (boundaries, papers, texts) and the chunk and paper vectors of `space`
+    to the directory `output`: gzipped JSONL for metadata, .npy matrices for vectors (float16
+    halves the size; vectors are unit length, so cosine ranking is practically unchanged), and
+    a manifest with row counts, SHA-256 checksums and the embedding model. All tables are read
+    in one REPEATABLE READ snapshot, so the files are consistent with each other.
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}', expected one of {VECTOR_DTYPES}")
+    out = Path(output)
+    out.mkdir(parents=True, exist_ok=True)
+    files: Dict[str, dict] = {}
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        files["boundaries.jsonl.gz"] = {"rows": _write_jsonl(
+            out / "boundaries.jsonl.gz",
+            ({"name": name, "short_name": short_name}
+             for name, short_name in PlanetaryBoundary.objects.order_by("id").values_list("name", "short_name")),
+        )}
+
+        links: Dict[int, list] = {}
+        for paper_id, short_name in AcademicPaperPlanetaryBoundary.objects.values_list(
+            "academicpaper_id", "planetary_boundary__short_name"
+        ):
+            links.setdefault(paper_id, []).append(short_name)
+
+        def papers():
+            for paper in AcademicPaper.objects.order_by("id").values("id", *PAPER_FIELDS).iterator(chunk_size=2000):
+                paper["boundaries"] = links.get(paper.pop("id"), [])
+                yield paper
+
+        files["papers.jsonl.gz"] = {"rows": _write_jsonl(out / "papers.jsonl.gz", papers())}
+        files["texts.jsonl.gz"] = {"rows": _write_jsonl(
+            out / "texts.jsonl.gz",
+            ({"paper_id": paper_id, "text": text, "hasfulltext": hasfulltext, "sections": sections}
+             for paper_id, text, hasfulltext, sections in AcademicPaperText.objects.order_by("id")
+             .values_list("academicpaper__paper_id", "text", "hasfulltext", "sections").iterator(chunk_size=500)),
+        )}
+
+        chunks = AcademicPaperTextEmbedding.objects.filter(space=space)
+        chunk_rows = (
+            ({"paper_id": paper_id, "chunk_index": idx, "content": content, "content_hash": h,
+              "section": section, "section_title": title}, vector)
+            for paper_id, idx, content, h, section, title, vector in chunks
+            .order_by("academicpaper_text_id", "chunk_index")
+            .values_list("academicpaper_text__academicpaper__paper_id", "chunk_index", "content", "content_hash",
+                         "section", "section_title", "vector")
+            .iterator(chunk_size=2000)
+        )
+        rows = _write_vectors(out / "chunk_vectors.npy", chunk_rows, chunks.count(), space.dimensions, dtype,
+                              out / "chunks.jsonl.gz")
+        files["chunks.jsonl.gz"] = {"rows": rows}
+        files["chunk_vectors.npy"] = {"rows": rows}
+
+        paper_vectors = AcademicPaperVector.objects.filter(space=space)
+        paper_vector_rows = (
+            ({"paper_id": paper_id, "kind": kind, "content_hash": h}, vector)
+            for paper_id, kind, h, vector in paper_vectors.order_by("id")
+            .values_list("academicpaper__paper_id", "kind", "content_hash", "vector").iterator(chunk_size=2000)
+        )
+        rows = _write_vectors(out / "paper_vectors.npy", paper_vector_rows, paper_vectors.count(), space.dimensions,
+                              dtype, out / "paper_vectors.jsonl.gz")
+        files["paper_vectors.jsonl.gz"] = {"rows": rows}
+        files["paper_vectors.npy"] = {"rows": rows}
+
+    for name, info in files.items():
+        info["sha256"] = file_sha256(out / name)
+        info["bytes"] = os.path.getsize(out / name)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "source": socket.gethostname(),
+        "space": {field: getattr(space, field) for field in SPACE_FIELDS},
+        # Vectors are only comparable with queries embedded the same way.
+        "embedding": {
+            "backend": settings.EMBEDDING_BACKEND,
+            "quantized": settings.EMBEDDING_QUANTIZE,
+            "sentence_transformers": _package_version("sentence-transformers"),
+        },
+        "vector_dtype": dtype,
+        "files": files,
+    }
+    (out / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def read_manifest(path: str, verify: bool = True) -> dict:
+    """The snapshot's manifest; with `verify`, every file is checked against its recorded checksum."""
+    root = Path(path)
+    try:
+        manifest = json.loads((root / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read {root / MANIFEST}: {e}")
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')} v{manifest.get('version')}")
+    for name, info in manifest["files"].items():
+        if not (root / name).is_file():
+            raise SnapshotError(f"Missing file {name}")
+        if verify and file_sha256(root / name) != info["sha256"]:
+            raise SnapshotError(f"Checksum mismatch for {name}")
+    return manifest
+
+
+def _target_space(manifest: dict, name: Optional[str]) -> tuple[EmbeddingSpace, bool]:
+    fields = dict(manifest["space"])
+    fields["name"] = name or fields["name"]
+    space = EmbeddingSpace.objects.filter(name=fields["name"]).first()
+    if space is None:
+        return EmbeddingSpace.objects.create(**fields, status=EmbeddingSpace.STATUS_BUILDING), True
+    if (space.model_name, space.dimensions) != (fields["model_name"], fields["dimensions"]):
+        raise SnapshotError(
+            f"Embedding space '{space.name}' uses {space.model_name} ({space.dimensions}d), "
+            f"the snapshot {fields['model_name']} ({fields['dimensions']}d)"
+        )
+    return space, False
+
+
+def import_snapshot(path: str, space_name: Optional[str] = None, verify: bool = True) -> tuple[EmbeddingSpace, dict]:
+    """
+    Load a snapshot written by `export_snapshot` in one transaction. Rows are COPYed into
+    staging tables and merged with ON CONFLICT DO NOTHING: papers already present (same
+    paper_id or DOI) keep their data, and only texts and vectors of newly inserted papers
+    are loaded, so running it twice changes nothing. The HNSW indexes are built afterwards
+    by the caller (see embedding_spaces.create_space_index). Returns the space and row counts.
+    """
+    root = Path(path)
+    manifest = read_manifest(path, verify=verify)
+    paper_table = AcademicPaper._meta.db_table
+    text_table = AcademicPaperText._meta.db_table
+    link_table = AcademicPaperPlanetaryBoundary._meta.db_table
+    boundary_table = PlanetaryBoundary._meta.db_table
+    counts = {}
+
+    with transaction.atomic():
+        space, created = _target_space(manifest, space_name)
+        counts["space_created"] = created
+        for record in _read_jsonl(root / "boundaries.jsonl.gz"):
+            PlanetaryBoundary.objects.get_or_create(short_name=record["short_name"], defaults={"name": record["name"]})
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE pb_snapshot_papers ("
+                "paper_id uuid, doi varchar(255), time_edited timestamptz, text text, title varchar(512), "
+                "title_slug varchar(512), title_normalized varchar(512), publication_year integer, "
+                "source varchar(255), keywords jsonb, author_list jsonb, meta jsonb, boundaries jsonb"
+                ") ON COMMIT DROP"
+            )
+            copy_csv(cursor, "pb_snapshot_papers", PAPER_FIELDS + ("boundaries",), (
+                tuple(_json(record.get(field)) if field in JSON_FIELDS else record.get(field) for field in PAPER_FIELDS)
+                + (_json(record.get("boundaries") or []),)
+                for record in _read_jsonl(root / "papers.jsonl.gz")
+            ))
+            columns = ", ".join(PAPER_FIELDS)
+            cursor.execute("CREATE TEMP TABLE pb_snapshot_new_papers (id bigint, paper_id uuid) ON COMMIT DROP")
+            cursor.execute(
+                f'WITH inserted AS (INSERT INTO "{paper_table}" ({columns}) SELECT {columns} FROM pb_snapshot_papers '
+                "ON CONFLICT DO NOTHING RETURNING id, paper_id) "
+                "INSERT INTO pb_snapshot_new_papers SELECT id, paper_id FROM inserted"
+            )
+            counts["papers"] = cursor.rowcount
+            cursor.execute(
+                f'INSERT INTO "{link_table}" (academicpaper_id, planetary_boundary_id) '
+                f'SELECT n.id, MIN(b.id) FROM pb_snapshot_new_papers n JOIN pb_snapshot_papers s ON s.paper_id = n.paper_id '
+                "CROSS JOIN LATERAL jsonb_array_elements_text(s.boundaries) AS sb(short_name) "
+                f'JOIN "{boundary_table}" b ON b.short_name = sb.short_name GROUP BY n.id, sb.short_name'
+            )
+
+            cursor.execute(
+                "CREATE TEMP TABLE pb_snapshot_texts (paper_id uuid, text text, hasfulltext boolean, sections jsonb) "
+                "ON COMMIT DROP"
+            )
+            copy_csv(cursor, "pb_snapshot_texts", ("paper_id", "text", "hasfulltext", "sections"), (
+                (record["paper_id"], record["text"], record["hasfulltext"], _json(record.get("sections")))
+                for record in _read_jsonl(root / "texts.jsonl.gz")
+            ))
+            cursor.execute(
+                f'INSERT INTO "{text_table}" (academicpaper_id, text, hasfulltext, sections, created_at) '
+                "SELECT n.id, t.text, t.hasfulltext, t.sections, now() FROM pb_snapshot_texts t "
+                "JOIN pb_snapshot_new_papers n ON n.paper_id = t.paper_id ON CONFLICT DO NOTHING"
+            )
+            counts["texts"] = cursor.rowcount
+            cursor.execute(
+                f'SELECT n.paper_id::text, n.id, t.id FROM pb_snapshot_new_papers n '
+                f'LEFT JOIN "{text_table}" t ON t.academicpaper_id = n.id'
+            )
+            paper_ids, text_ids = {}, {}
+            for uuid_str, paper_pk, text_pk in cursor.fetchall():
+                paper_ids[uuid_str] = paper_pk
+                if text_pk is not None:
+                    text_ids[uuid_str] = text_pk
+
+        chunk_vectors = np.load(root / "chunk_vectors.npy", mmap_mode="r")
+        if chunk_vectors.shape[1:] != (space.dimensions,):
+            raise SnapshotError(f"Chunk vectors have shape {chunk_vectors.shape}, space expects {space.dimensions}d")
+        counts["chunks"] = copy_embeddings(space, (
+            (text_ids[record["paper_id"]], record["chunk_index"], record["content"], record.get("content_hash"),
+             record.get("section"), record.get("section_title"), chunk_vectors[i])
+            for i, record in enumerate(_read_jsonl(root / "chunks.jsonl.gz"))
+            if record["paper_id"] in text_ids
+        ), mark_complete=True)
+
+        paper_vectors = np.load(root / "paper_vectors.npy", mmap_mode="r")
+        batch, counts["paper_vectors"] = [], 0
+        for i, record in enumerate(_read_jsonl(root / "paper_vectors.jsonl.gz")):
+            if record["paper_id"] not in paper_ids:
+                continue
+            batch.append(AcademicPaperVector(
+                space=space, academicpaper_id=paper_ids[record["paper_id"]], kind=record["kind"],
+                content_hash=record.get("content_hash"), vector=np.asarray(paper_vectors[i], dtype=np.float32),
+            ))
+            if len(batch) >= 2000:
+                counts["paper_vectors"] += len(AcademicPaperVector.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        if batch:
+            counts["paper_vectors"] += len(AcademicPaperVector.objects.bulk_create(batch, ignore_conflicts=True))
+
+    with connection.cursor() as cursor:
+        for model in (AcademicPaper, AcademicPaperText, AcademicPaperTextEmbedding, AcademicPaperVector):
+            cursor.execute(f'ANALYZE "{model._meta.db_table}"')
+    return space, counts
@@ -1,50 +1,463 @@
+import hashlib
 import numpy as np
 import logging
-from typing import List, Tuple
+from contextlib import nullcontext
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from django.conf import settings
 from django.db import transaction, IntegrityError
-from sentence_transformers import SentenceTransformer
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
-from PB_Assistant.models import AcademicPaperText, AcademicPaperTextEmbedding
+from django.db.models import Avg, Exists, OuterRef, Q
+from pgvector.django import VectorField
+from PB_Assistant.models import (
+    AcademicPaper, AcademicPaperText, AcademicPaperTextEmbedding, AcademicPaperVector, EmbeddedText, EmbeddingCache,
+    EmbeddingSpace,
+)
+from PB_Assistant.apps.textprocessing.embedding_backends import cache_model_name, load_sentence_transformer
+from PB_Assistant.apps.textprocessing.copy_loader import copy_embeddings
+from PB_Assistant.apps.textprocessing.embedding_spaces import space_vector
+from PB_Assistant.apps.textprocessing.token_splitter import TokenTextSplitter, token_budget, log_chunk_stats
 
 logger = logging.getLogger(__name__)
 
+# (content, section label, section title)
+Chunk = Tuple[str, Optional[str], Optional[str]]
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+
+def make_splitter(space: EmbeddingSpace, model):
+    """Character splitter, or a token splitter capped at what the model encodes without truncation."""
+    if space.chunk_unit == EmbeddingSpace.CHUNK_UNIT_TOKENS:
+        budget = token_budget(model)
+        if space.chunk_size > budget:
+            logger.warning(f"Embedding space '{space.name}': chunk size {space.chunk_size} exceeds the model's "
+                           f"{budget}-token budget, using {budget}")
+        return TokenTextSplitter(model.tokenizer, min(space.chunk_size, budget), space.chunk_overlap)
+    from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=space.chunk_size, chunk_overlap=space.chunk_overlap)
+
+
+def _split_all(splitter, texts: List[str]) -> List[List[str]]:
+    # The token splitter tokenizes all texts of a document in one batch.
+    if hasattr(splitter, "split_texts"):
+        return splitter.split_texts(texts)
+    return [splitter.split_text(text) for text in texts]
+
+
+def chunk_paper_text(paper_text: AcademicPaperText, splitter, chunker: str = EmbeddingSpace.CHUNKER_RECURSIVE,
+                     skip_sections: Iterable[str] = ()) -> List[Chunk]:
+    """
+    With the "sections" chunker every TEI division is split on its own, so chunks never
+    straddle a section boundary, and sections labelled in `skip_sections` are left out.
+    Texts without stored sections fall back to splitting the flattened text.
+    """
+    if chunker == EmbeddingSpace.CHUNKER_SECTIONS and paper_text.sections:
+        skip = set(skip_sections)
+        kept = [section for section in paper_text.sections if section["label"] not in skip]
+        return [
+            (chunk, section["label"], (section["title"] or "")[:512] or None)
+            for section, chunks in zip(kept, _split_all(splitter, [section["text"] for section in kept]))
+            for chunk in chunks
+        ]
+    return [(chunk, None, None) for chunk in _split_all(splitter, [paper_text.text])[0]]
+
+
+def _segments(text: str, size: int) -> Iterator[str]:
+    """Consecutive slices of about `size` characters, cut after a sentence end where possible."""
+    start, n = 0, len(text)
+    while start < n:
+        end = start + size
+        if end < n:
+            floor = start + size // 2
+            cut = max(text.rfind(". ", floor, end), text.rfind("? ", floor, end), text.rfind("! ", floor, end))
+            if cut > 0:
+                end = cut + 1
+            elif (space := text.rfind(" ", floor, end)) > 0:
+                end = space
+        yield text[start:end]
+        start = end
+
+
+def iter_paper_chunks(paper_text: AcademicPaperText, splitter, chunker: str = EmbeddingSpace.CHUNKER_RECURSIVE,
+                      skip_sections: Iterable[str] = (), segment_chars: int = 200_000) -> Iterator[Chunk]:
+    """
+    Like `chunk_paper_text`, but lazily: the text (or each section) is split in segments of
+    about `segment_chars` characters, so only one segment's chunks exist at a time. Chunks
+    do not straddle segment boundaries, which fall on sentence ends.
+    """
+    if chunker == EmbeddingSpace.CHUNKER_SECTIONS and paper_text.sections:
+        skip = set(skip_sections)
+        for section in paper_text.sections:
+            if section["label"] in skip:
+                continue
+            title = (section["title"] or "")[:512] or None
+            for segment in _segments(section["text"], segment_chars):
+                for chunk in splitter.split_text(segment):
+                    yield chunk, section["label"], title
+        return
+    for segment in _segments(paper_text.text, segment_chars):
+        for chunk in splitter.split_text(segment):
+            yield chunk, None, None
+
+
 class TextEmbedder:
-    def __init__(self, model_name: str = "BAAI/bge-base-en-v1.5", chunk_size: int = 800,
-                 chunk_overlap: int = 100):
-        self.model = SentenceTransformer(model_name, trust_remote_code=True)
-        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    """Chunks and embeds texts into one EmbeddingSpace (the active one unless given)."""
+    def __init__(self, space: EmbeddingSpace | None = None, encode_batch_size: int | None = None,
+                 write_batch_size: int | None = None, backend: str | None = None,
+                 quantize: bool | None = None, threads: int | None = None, stream_window: int | None = None):
+        self.space = space or EmbeddingSpace.get_active()
+        self.model_name = self.space.model_name
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.quantize = settings.EMBEDDING_QUANTIZE if quantize is None else quantize
+        self.model = load_sentence_transformer(
+            self.model_name,
+            backend=self.backend,
+            quantize=self.quantize,
+            threads=threads or settings.EMBEDDING_THREADS,
+        )
+        self.cache_model_name = cache_model_name(self.model_name, self.quantize)
+        dimensions = self.model.get_sentence_embedding_dimension()
+        if dimensions != self.space.dimensions:
+            raise ValueError(
+                f"Model {self.model_name} produces {dimensions}-d vectors, "
+                f"embedding space '{self.space.name}' expects {self.space.dimensions}"
+            )
+        self.splitter = make_splitter(self.space, self.model)
+        self.encode_batch_size = encode_batch_size or getattr(settings, "EMBEDDING_BATCH_SIZE", 64)
+        self.write_batch_size = write_batch_size or getattr(settings, "EMBEDDING_WRITE_BATCH_SIZE", 1024)
+        # Writes of at least this many rows go through binary COPY instead of bulk_create.
+        self.copy_min_rows = getattr(settings, "EMBEDDING_COPY_MIN_ROWS", 500)
+        # Texts longer than about this many chunks are embedded window by window (0: never).
+        self.stream_window = getattr(settings, "EMBEDDING_STREAM_WINDOW", 256) if stream_window is None else stream_window
+        # Roughly 4 characters per token of English text
+        self.chunk_chars = self.space.chunk_size * (4 if self.space.chunk_unit == EmbeddingSpace.CHUNK_UNIT_TOKENS else 1)
 
-    def _chunk(self, text: str) -> List[str]:
-        return self.splitter.split_text(text)
+    def _chunk(self, paper_text: AcademicPaperText) -> List[Chunk]:
+        return chunk_paper_text(paper_text, self.splitter, self.space.chunker, self.space.skip_sections or [])
 
-    def embed_academic_paper(self, paper_text: AcademicPaperText) -> bool:
-        try:
-            chunks = self._chunk(paper_text.text)
-            vectors = self.model.encode(chunks, convert_to_numpy=True, show_progress_bar=False)
-            norms = np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
-            vectors = vectors / norms
-            embeddings = [
+    def _encode(self, chunks: List[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            chunks,
+            batch_size=self.encode_batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return vectors
+
+    def _streams(self, paper_text: AcademicPaperText) -> bool:
+        return bool(self.stream_window) and len(paper_text.text or "") > self.stream_window * self.chunk_chars
+
+    def _vectors_for(self, chunks_by_hash: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """
+        Resolve vectors for the given chunk hashes: reuse the embedding cache for this model
+        and encode only the rest in length-sorted batches, adding them to the cache.
+        Hashes whose encode batch failed are missing from the result.
+        """
+        hashes = list(chunks_by_hash)
+        vectors: Dict[str, np.ndarray] = {}
+        for start in range(0, len(hashes), self.write_batch_size):
+            cached = EmbeddingCache.objects.filter(
+                model_name=self.cache_model_name,
+                content_hash__in=hashes[start:start + self.write_batch_size],
+            ).values_list("content_hash", "vector")
+            vectors.update(cached)
+
+        missing = sorted((h for h in hashes if h not in vectors), key=lambda h: len(chunks_by_hash[h]))
+        for start in range(0, len(missing), self.write_batch_size):
+            batch = missing[start:start + self.write_batch_size]
+            try:
+                encoded = self._encode([chunks_by_hash[h] for h in batch])
+            except Exception as e:
+                logger.error(f"Encoding failed for a batch of {len(batch)} chunks: {e}", exc_info=True)
+                continue
+            EmbeddingCache.objects.bulk_create(
+                [EmbeddingCache(model_name=self.cache_model_name, content_hash=h, vector=vec) for h, vec in zip(batch, encoded)],
+                ignore_conflicts=True,
+            )
+            vectors.update(zip(batch, encoded))
+        return vectors
+
+    def _write_rows(self, rows: List[Tuple[int, int, str, str, Optional[str], Optional[str], np.ndarray]]):
+        if len(rows) >= self.copy_min_rows:
+            copy_embeddings(self.space, rows)
+            return
+        AcademicPaperTextEmbedding.objects.bulk_create(
+            [
                 AcademicPaperTextEmbedding(
-                    academicpaper_text=paper_text,
+                    space=self.space,
+                    academicpaper_text_id=text_id,
                     chunk_index=i,
                     content=chunk,
-                    vector=vec.tolist(),
+                    content_hash=h,
+                    section=section,
+                    section_title=title,
+                    vector=vec,
                 )
-                for i, (chunk, vec) in enumerate(zip(chunks, vectors))
-            ]
+                for text_id, i, chunk, h, section, title, vec in rows
+            ],
+            update_conflicts=True,
+            update_fields=["content", "content_hash", "section", "section_title", "vector"],
+            unique_fields=["space", "academicpaper_text", "chunk_index"],
+            batch_size=self.write_batch_size,
+        )
+
+    def _mark_embedded(self, chunk_counts: Dict[int, int]):
+        """Record these texts' chunk sets as complete; call inside the transaction that wrote their last rows."""
+        EmbeddedText.objects.bulk_create(
+            [EmbeddedText(space=self.space, academicpaper_text_id=text_id, chunk_count=count)
+             for text_id, count in chunk_counts.items()],
+            update_conflicts=True,
+            update_fields=["chunk_count", "updated_at"],
+            unique_fields=["space", "academicpaper_text"],
+            batch_size=self.write_batch_size,
+        )
+
+    def embed_academic_paper(self, paper_text: AcademicPaperText) -> bool:
+        return self.embed_academic_papers([paper_text]) == 1
+
+    def embed_academic_papers(self, paper_texts: Iterable[AcademicPaperText]) -> int:
+        """
+        Embed chunks of many texts together and return the number of texts fully embedded.
+
+        Only chunks whose content hash or section differs from the stored row at the same index are
+        written; their vectors come from the embedding cache or are encoded in length-sorted
+        batches shared by all texts. Chunk indexes beyond the new chunk count are deleted in
+        the same transaction, so re-chunked documents leave no orphans behind. Texts longer
+        than `stream_window` chunks go through `embed_streaming` one by one instead.
+        """
+        paper_texts = list(paper_texts)
+        streamed = sum(self.embed_streaming(paper_text) for paper_text in paper_texts if self._streams(paper_text))
+        paper_texts = [paper_text for paper_text in paper_texts if not self._streams(paper_text)]
+        if not paper_texts:
+            return streamed
+        plans: Dict[int, List[Tuple[int, str, str, Optional[str], Optional[str]]]] = {}
+        failed = set()
+        # The token splitter already knows its chunk sizes, so the statistics need no second tokenizer pass.
+        recording = self.splitter.recording_sizes() if isinstance(self.splitter, TokenTextSplitter) else nullcontext({})
+        with recording as token_counts:
+            for paper_text in paper_texts:
+                try:
+                    chunks = self._chunk(paper_text)
+                except Exception as e:
+                    logger.error(f"Chunking failed for academic paper {paper_text.academicpaper_id}: {e}", exc_info=True)
+                    failed.add(paper_text.pk)
+                    continue
+                plans[paper_text.pk] = [
+                    (i, chunk, chunk_hash(chunk), section, title) for i, (chunk, section, title) in enumerate(chunks)
+                ]
+        log_chunk_stats(self.model, {
+            f"Academic paper {paper_text.academicpaper_id}": [chunk for _, chunk, _, _, _ in plans[paper_text.pk]]
+            for paper_text in paper_texts if paper_text.pk in plans
+        }, token_counts=token_counts)
+
+        existing = {
+            (text_id, idx): (h, section, title)
+            for text_id, idx, h, section, title in AcademicPaperTextEmbedding.objects
+            .filter(space=self.space, academicpaper_text_id__in=list(plans))
+            .values_list("academicpaper_text_id", "chunk_index", "content_hash", "section", "section_title")
+        }
+        changed = [
+            (paper_text, i, chunk, h, section, title)
+            for paper_text in paper_texts if paper_text.pk in plans
+            for i, chunk, h, section, title in plans[paper_text.pk]
+            if existing.get((paper_text.pk, i)) != (h, section, title)
+        ]
+        vectors = self._vectors_for({h: chunk for _, _, chunk, h, _, _ in changed})
+        failed.update(paper_text.pk for paper_text, _, _, h, _, _ in changed if h not in vectors)
+
+        rows = [
+            (paper_text.pk, i, chunk, h, section, title, vectors[h])
+            for paper_text, i, chunk, h, section, title in changed
+            if paper_text.pk not in failed
+        ]
+        done = [text_id for text_id in plans if text_id not in failed]
+        try:
             with transaction.atomic():
-                AcademicPaperTextEmbedding.objects.bulk_create(
-                    embeddings,
-                    update_conflicts=True,
-                    update_fields=["content", "vector"],
-                    unique_fields=["academicpaper_text", "chunk_index"],
-                )
-            return True
+                self._write_rows(rows)
+                for text_id in done:
+                    AcademicPaperTextEmbedding.objects.filter(
+                        space=self.space,
+                        academicpaper_text_id=text_id,
+                        chunk_index__gte=len(plans[text_id]),
+                    ).delete()
+                self._mark_embedded({text_id: len(plans[text_id]) for text_id in done})
         except IntegrityError as e:
-            logger.warning(f"DB error for academic paper {paper_text.academicpaper_id}: {e}")
+            logger.warning(f"DB error while embedding {len(done)} academic papers: {e}")
+            return streamed
+        except Exception as e:
+            logger.error(f"Unexpected error in embed_academic_papers: {e}", exc_info=True)
+            return streamed
+
+        logger.debug(f"Embedded {len(done)} texts: {len(changed)} changed chunks, {len(existing)} previously stored")
+        self._refresh_paper_vectors(paper_text.academicpaper_id for paper_text in paper_texts if paper_text.pk in done)
+        return len(done) + streamed
+
+    def embed_streaming(self, paper_text: AcademicPaperText) -> bool:
+        """
+        Embed one very long text window by window: chunks come from a generator, and each window
+        of `stream_window` chunks is compared with the stored rows, encoded, normalized in place
+        and written before the next window is chunked, so memory is bounded by the window, not
+        the document. Windows are committed one at a time; after an interruption the next run
+        only re-encodes the chunks that are missing or changed.
+        """
+        size = self.stream_window or 256
+        chunks = iter_paper_chunks(
+            paper_text, self.splitter, self.space.chunker, self.space.skip_sections or [],
+            segment_chars=size * self.chunk_chars,
+        )
+        stored = AcademicPaperTextEmbedding.objects.filter(space=self.space, academicpaper_text=paper_text)
+        count = written = 0
+        try:
+            while window := list(islice(chunks, size)):
+                planned = [
+                    (count + i, chunk, chunk_hash(chunk), section, title) for i, (chunk, section, title) in enumerate(window)
+                ]
+                count += len(window)
+                existing = {
+                    idx: (h, section, title)
+                    for idx, h, section, title in stored
+                    .filter(chunk_index__gte=planned[0][0], chunk_index__lte=planned[-1][0])
+                    .values_list("chunk_index", "content_hash", "section", "section_title")
+                }
+                changed = [plan for plan in planned if existing.get(plan[0]) != plan[2:]]
+                if not changed:
+                    continue
+                vectors = self._vectors_for({h: chunk for _, chunk, h, _, _ in changed})
+                if any(h not in vectors for _, _, h, _, _ in changed):
+                    return False
+                with transaction.atomic():
+                    self._write_rows([
+                        (paper_text.pk, i, chunk, h, section, title, vectors[h]) for i, chunk, h, section, title in changed
+                    ])
+                written += len(changed)
+            with transaction.atomic():
+                stored.filter(chunk_index__gte=count).delete()
+                self._mark_embedded({paper_text.pk: count})
+        except Exception as e:
+            logger.error(f"Streaming embedding failed for academic paper {paper_text.academicpaper_id}: {e}", exc_info=True)
+            return False
+        logger.debug(f"Embedded academic paper {paper_text.academicpaper_id} in windows: {count} chunks, {written} written")
+        self._refresh_paper_vectors([paper_text.academicpaper_id])
+        return True
+
+    def _refresh_paper_vectors(self, academicpaper_ids: Iterable[int]):
+        # Chunks are stored at this point; a failure here only delays two-stage retrieval for these papers.
+        try:
+            self.update_paper_vectors(academicpaper_ids)
         except Exception as e:
-            logger.error(f"Unexpected error in embed_academic_paper: {e}", exc_info=True)
-        return False
+            logger.error(f"Updating paper vectors failed: {e}", exc_info=True)
+
+    def update_paper_vectors(self, academicpaper_ids: Iterable[int]) -> int:
+        """
+        Store the paper-level vectors of these papers used by two-stage retrieval: the mean of
+        their chunk vectors (normalized; computed by pgvector) and the embedded abstract
+        (`AcademicPaper.text`, also for papers without fulltext). Unchanged abstracts are not
+        encoded again. Returns the number of vectors written.
+        """
+        ids = list(academicpaper_ids)
+        if not ids:
+            return 0
+        centroids = dict(
+            AcademicPaperTextEmbedding.objects
+            .filter(space=self.space, academicpaper_text__academicpaper_id__in=ids)
+            .values("academicpaper_text__academicpaper_id")
+            .annotate(centroid=Avg(space_vector(self.space), output_field=VectorField()))
+            .values_list("academicpaper_text__academicpaper_id", "centroid")
+        )
+        abstracts = {
+            paper_id: (chunk_hash(text), text)
+            for paper_id, text in AcademicPaper.objects.filter(pk__in=ids).exclude(text__isnull=True).values_list("pk", "text")
+            if text.strip()
+        }
+        stored_hashes = dict(
+            AcademicPaperVector.objects
+            .filter(space=self.space, academicpaper_id__in=list(abstracts), kind=AcademicPaperVector.KIND_ABSTRACT)
+            .values_list("academicpaper_id", "content_hash")
+        )
+        changed = {paper_id: value for paper_id, value in abstracts.items() if stored_hashes.get(paper_id) != value[0]}
+        encoded = self._vectors_for({h: text for h, text in changed.values()})
+
+        rows = [
+            AcademicPaperVector(space=self.space, academicpaper_id=paper_id, kind=AcademicPaperVector.KIND_CENTROID,
+                                vector=vector / (np.linalg.norm(vector) + 1e-12))
+            for paper_id, vector in centroids.items()
+        ] + [
+            AcademicPaperVector(space=self.space, academicpaper_id=paper_id, kind=AcademicPaperVector.KIND_ABSTRACT,
+                                vector=encoded[h], content_hash=h)
+            for paper_id, (h, _) in changed.items() if h in encoded
+        ]
+        with transaction.atomic():
+            AcademicPaperVector.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                update_fields=["vector", "content_hash", "updated_at"],
+                unique_fields=["space", "academicpaper", "kind"],
+                batch_size=self.write_batch_size,
+            )
+            stale = AcademicPaperVector.objects.filter(space=self.space, academicpaper_id__in=ids)
+            stale.filter(kind=AcademicPaperVector.KIND_CENTROID).exclude(academicpaper_id__in=list(centroids)).delete()
+            stale.filter(kind=AcademicPaperVector.KIND_ABSTRACT).exclude(academicpaper_id__in=list(abstracts)).delete()
+        return len(rows)
+
+    def papers_without_vectors(self):
+        """Papers with an abstract or chunks in this space but no paper-level vector yet."""
+        has_chunks = AcademicPaperTextEmbedding.objects.filter(space=self.space, academicpaper_text__academicpaper=OuterRef("pk"))
+        has_vector = AcademicPaperVector.objects.filter(space=self.space, academicpaper=OuterRef("pk"))
+        return (
+            AcademicPaper.objects
+            .filter((Q(text__isnull=False) & ~Q(text="")) | Exists(has_chunks))
+            .filter(~Exists(has_vector))
+            .order_by("id")
+        )
+
+    def embed_missing_paper_vectors(self, batch_size: int = 500, everything: bool = False) -> int:
+        """Backfill paper-level vectors (all papers with `everything`); returns the number written."""
+        qs = AcademicPaper.objects.order_by("id") if everything else self.papers_without_vectors()
+        written = 0
+        batch = []
+        for paper_id in qs.values_list("id", flat=True).iterator(chunk_size=batch_size):
+            batch.append(paper_id)
+            if len(batch) >= batch_size:
+                written += self.update_paper_vectors(batch)
+                batch = []
+                logger.info(f"[{self.space.name}] {written} paper vectors written")
+        if batch:
+            written += self.update_paper_vectors(batch)
+        return written
+
+    def texts_without_embeddings(self):
+        """
+        Texts whose chunk set in this space is missing or incomplete: they have no EmbeddedText
+        marker, which is written together with a text's last chunk rows.
+        """
+        return AcademicPaperText.objects.filter(
+            ~Exists(EmbeddedText.objects.filter(space=self.space, academicpaper_text=OuterRef("pk")))
+        ).order_by("id")
+
+    def embed_missing(self, embed_batch: int = 32, max_papers: int | None = None) -> Tuple[int, int]:
+        """
+        Embed texts that are not (completely) embedded in this space yet; returns (embedded, processed).
+        Chunks stored by an interrupted run are compared by hash and not encoded again.
+        """
+        qs = self.texts_without_embeddings()
+        if max_papers is not None:
+            qs = qs[:max_papers]
+        embedded = processed = 0
+        batch = []
+        for paper_text in qs.iterator(chunk_size=embed_batch):
+            batch.append(paper_text)
+            if len(batch) >= embed_batch:
+                embedded += self.embed_academic_papers(batch)
+                processed += len(batch)
+                batch = []
+                logger.info(f"[{self.space.name}] {processed} texts embedded")
+        if batch:
+            embedded += self.embed_academic_papers(batch)
+            processed += len(batch)
+        return embedded, processed
 
     def embed_text(self, text: str) -> List[float]:
         vectors = self.model.encode(text, convert_to_numpy=True, show_progress_bar=False).tolist()
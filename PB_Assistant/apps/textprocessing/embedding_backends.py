@@ -0,0 +1,123 @@
+from __future__ import annotations
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+from django.conf import settings
+from django.utils.text import slugify
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+QUANTIZATION_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def exported_model_dir(model_name: str, backend: str) -> Path:
+    return Path(settings.EMBEDDING_MODEL_CACHE_DIR) / f"{slugify(model_name.replace('/', '--'))}-{backend}"
+
+
+def _export(model_name: str, backend: str, export_dir: Path):
+    """Convert the model once and keep it on disk; a temp dir + rename keeps concurrent loaders safe."""
+    from sentence_transformers import SentenceTransformer
+    logger.info(f"Exporting {model_name} to {backend} in {export_dir}")
+    export_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=export_dir.parent, prefix=f".{export_dir.name}-")
+    try:
+        SentenceTransformer(model_name, backend=backend, trust_remote_code=True).save_pretrained(tmp_dir)
+        os.replace(tmp_dir, export_dir)
+    except OSError:
+        if not export_dir.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def resolve_quantization_config(config: Optional[str] = None) -> str:
+    """The int8 quantization config to use (EMBEDDING_QUANTIZATION_CONFIG unless given), validated."""
+    config = config or settings.EMBEDDING_QUANTIZATION_CONFIG
+    if config not in QUANTIZATION_CONFIGS:
+        raise ValueError(f"Unknown quantization config '{config}', expected one of {QUANTIZATION_CONFIGS}")
+    return config
+
+
+def quantized_file_suffix(config: str) -> str:
+    # Passed to the exporter explicitly: its default suffix depends on the config's weight dtype
+    # (e.g. "quint8_avx2"), which would not match the name we load.
+    return f"qint8_{config}"
+
+
+def quantized_file_name(config: str) -> str:
+    return f"onnx/model_{quantized_file_suffix(config)}.onnx"
+
+
+def cache_model_name(model_name: str, quantize: bool = False, config: Optional[str] = None) -> str:
+    """
+    Model key of EmbeddingCache entries. int8 vectors differ slightly from fp32 ones, and between
+    quantization configs, so each config gets its own entries.
+    """
+    if not quantize:
+        return model_name
+    return f"{model_name}#qint8-{slugify(resolve_quantization_config(config))}"
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch", quantize: bool = False,
+                              threads: Optional[int] = None,
+                              quantization_config: Optional[str] = None) -> "SentenceTransformer":
+    """
+    Load `model_name` for CPU inference with the given backend.
+
+    "onnx" and "openvino" models are exported on first use and cached under
+    EMBEDDING_MODEL_CACHE_DIR; `quantize` adds a dynamic int8 ONNX variant next to the export.
+    sentence-transformers (and torch) are imported here, not at module import, so processes
+    that never embed do not pay for them.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    if quantize and backend != "onnx":
+        raise ValueError("int8 quantization is only supported with the onnx backend")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, trust_remote_code=True)
+
+    export_dir = exported_model_dir(model_name, backend)
+    if not (export_dir / "modules.json").exists():
+        _export(model_name, backend, export_dir)
+
+    model_kwargs: dict = {}
+    if backend == "onnx":
+        file_name = "onnx/model.onnx"
+        if quantize:
+            config = resolve_quantization_config(quantization_config)
+            file_name = quantized_file_name(config)
+            if not (export_dir / file_name).exists():
+                from sentence_transformers import export_dynamic_quantized_onnx_model
+                logger.info(f"Quantizing {model_name} to int8 ({config})")
+                fp32 = SentenceTransformer(str(export_dir), backend="onnx", model_kwargs={"file_name": "onnx/model.onnx"})
+                export_dynamic_quantized_onnx_model(
+                    fp32, config, str(export_dir), file_suffix=quantized_file_suffix(config)
+                )
+                if not (export_dir / file_name).exists():
+                    raise FileNotFoundError(f"Quantized model not found after export: {export_dir / file_name}")
+        model_kwargs["file_name"] = file_name
+        model_kwargs["provider"] = "CPUExecutionProvider"
+        if threads:
+            import onnxruntime as ort
+            session_options = ort.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            session_options.inter_op_num_threads = 1
+            model_kwargs["session_options"] = session_options
+    else:
+        model_kwargs["file_name"] = "openvino/openvino_model.xml"
+        if threads:
+            model_kwargs["ov_config"] = {"INFERENCE_NUM_THREADS": str(threads)}
+
+    return SentenceTransformer(str(export_dir), backend=backend, model_kwargs=model_kwargs, trust_remote_code=True)
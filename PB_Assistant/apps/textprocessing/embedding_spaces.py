@@ -0,0 +1,51 @@
+from __future__ import annotations
+import logging
+from django.db import connection, transaction
+from django.db.models.functions import Cast
+from django.utils import timezone
+from pgvector.django import VectorField
+from PB_Assistant.models import EmbeddingSpace, AcademicPaperTextEmbedding, AcademicPaperVector
+
+logger = logging.getLogger(__name__)
+
+
+def get_space(name: str | None = None) -> EmbeddingSpace:
+    """Return the named space, or the active one when no name is given."""
+    if name:
+        return EmbeddingSpace.objects.get(name=name)
+    return EmbeddingSpace.get_active()
+
+
+def space_vector(space: EmbeddingSpace, field: str = "vector") -> Cast:
+    """The vector column cast to the space's dimension, i.e. the expression its HNSW index covers."""
+    return Cast(field, VectorField(dimensions=space.dimensions))
+
+
+def create_space_index(space: EmbeddingSpace, concurrently: bool = True):
+    """
+    Build the partial HNSW indexes of one space (chunk vectors and paper vectors).
+    CONCURRENTLY keeps search on other spaces online.
+    """
+    indexes = (
+        (space.index_name, AcademicPaperTextEmbedding._meta.db_table),
+        (space.paper_index_name, AcademicPaperVector._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        for index_name, table in indexes:
+            cursor.execute(
+                f'CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS {index_name} '
+                f'ON "{table}" USING hnsw ((vector::vector({int(space.dimensions)})) vector_cosine_ops) '
+                f'WHERE space_id = {int(space.pk)}'
+            )
+
+
+def activate_space(space: EmbeddingSpace) -> EmbeddingSpace:
+    """Atomically make `space` the one used by search. The previous space is kept for rollback."""
+    if space.status != EmbeddingSpace.STATUS_READY:
+        raise ValueError(f"Embedding space '{space.name}' is not ready (status: {space.status})")
+    with transaction.atomic():
+        EmbeddingSpace.objects.select_for_update().filter(is_active=True).exclude(pk=space.pk).update(is_active=False)
+        EmbeddingSpace.objects.filter(pk=space.pk).update(is_active=True, activated_at=timezone.now())
+    space.refresh_from_db()
+    logger.info(f"Activated embedding space {space}")
+    return space
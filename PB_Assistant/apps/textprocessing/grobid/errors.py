@@ -0,0 +1,32 @@
+from __future__ import annotations
+from typing import Optional
+
+
+class GrobidError(Exception):
+    """A GROBID request failed. `retryable` errors are about GROBID, not the PDF: try the file again later."""
+    retryable = True
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GrobidOverloaded(GrobidError):
+    """GROBID kept answering 503/429 (its worker pool is full) after all retries."""
+
+
+class GrobidUnavailable(GrobidError):
+    """GROBID could not be reached or did not answer in time."""
+
+
+class GrobidCircuitOpen(GrobidUnavailable):
+    """Not sent: too many consecutive failures, GROBID gets `retry_after` seconds to recover."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GROBID circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class GrobidRejected(GrobidError):
+    """GROBID processed the request but failed on this PDF (e.g. 500 for a corrupt file)."""
+    retryable = False
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from PB_Assistant.apps.textprocessing.grobid.errors import GrobidCircuitOpen
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    Client-side limit on concurrent GROBID requests, adapted with AIMD: every success raises
+    the limit by 1/limit (about +1 per round of requests), every overload signal (503/429,
+    timeout, latency above `latency_target`) multiplies it by `backoff`. Several overload
+    signals within one typical request latency count as one, so a burst of 503s from the
+    same round only halves the limit once.
+    """
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 8, backoff: float = 0.5,
+                 latency_target: Optional[float] = None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.latency: Optional[float] = None  # moving average of successful requests, seconds
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float):
+        with self._cond:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency_target and latency > self.latency_target:
+                self._decrease(f"latency {latency:.1f}s")
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_overload(self, reason: str = "503"):
+        with self._cond:
+            self._decrease(reason)
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        if int(self.limit) != previous:
+            logger.info(f"GROBID concurrency {previous} -> {int(self.limit)} ({reason})")
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests after `failure_threshold` consecutive failed requests. After
+    `reset_timeout` seconds one probe request is let through (half-open); its success closes
+    the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_after(self) -> float:
+        """Seconds until a probe may be sent (0 when closed)."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self) -> bool:
+        """
+        Raise GrobidCircuitOpen while the circuit is open. Returns True when this call is the
+        half-open probe; its caller must then record exactly one success or failure.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self.retry_after()
+            if remaining > 0 or self._probing:
+                raise GrobidCircuitOpen(remaining or self.reset_timeout)
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("GROBID circuit closed")
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self._opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(
+                    f"GROBID circuit open after {self.failures} consecutive failures; "
+                    f"pausing for {self.reset_timeout:.0f}s"
+                )
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def wait(self):
+        """Block until a probe may be sent."""
+        remaining = self.retry_after()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+_shared: dict[str, tuple[AdaptiveLimiter, CircuitBreaker]] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_guards(grobid_url: str, **limiter_options) -> tuple[AdaptiveLimiter, CircuitBreaker]:
+    """One limiter and breaker per GROBID server and process, shared by all extractor instances."""
+    with _shared_lock:
+        if grobid_url not in _shared:
+            breaker_options = {
+                key: limiter_options.pop(key) for key in ("failure_threshold", "reset_timeout") if key in limiter_options
+            }
+            _shared[grobid_url] = (AdaptiveLimiter(**limiter_options), CircuitBreaker(**breaker_options))
+        return _shared[grobid_url]
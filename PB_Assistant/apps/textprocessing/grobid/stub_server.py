@@ -0,0 +1,263 @@
+from __future__ import annotations
+import logging
+import random
+import re
+import textwrap
+import threading
+import time
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Sequence
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+TEI_NS = "http://www.tei-c.org/ns/1.0"
+# Synthetic PDFs carry this comment; the stub answers with the fixture it names.
+MARKER_RE = re.compile(rb'%stub-fixture:(\d+)')
+STUB_DOI_PREFIX = "10.5555/grobid-stub"
+
+_WORDS = (
+    "planetary boundaries climate nitrogen phosphorus biosphere integrity land system change freshwater "
+    "ocean acidification aerosol loading novel entities ozone depletion safe operating space resilience "
+    "earth system tipping points feedback emissions carbon budget governance transformation indicators "
+    "assessment model scenario pathway threshold risk global regional local ecosystem services"
+).split()
+
+
+def synthetic_tei(index: int, paragraphs: int = 12, seed: int = 0) -> str:
+    """A GROBID-like fulltext TEI document with a header, an abstract and a few body sections."""
+    rng = random.Random(seed * 1_000_003 + index)
+
+    def sentence():
+        words = rng.choices(_WORDS, k=rng.randint(8, 24))
+        return " ".join(words).capitalize() + "."
+
+    def paragraph():
+        return " ".join(sentence() for _ in range(rng.randint(3, 7)))
+
+    sections = ["Introduction", "Methods", "Results", "Discussion"]
+    body = "".join(
+        f'<div><head>{title}</head>'
+        + "".join(f"<p>{paragraph()}</p>" for _ in range(max(1, paragraphs // len(sections))))
+        + "</div>"
+        for title in sections
+    )
+    return (
+        f'<TEI xmlns="{TEI_NS}"><teiHeader><fileDesc><titleStmt>'
+        f'<title level="a" type="main">Synthetic paper {index}: {sentence()[:-1]}</title></titleStmt>'
+        f'<publicationStmt><publisher>Stub</publisher><date type="published" when="{2000 + index % 25}"/>'
+        f'</publicationStmt><sourceDesc><biblStruct><analytic><author><persName><forename>Ada</forename>'
+        f'<surname>Stub{index}</surname></persName></author></analytic><idno type="DOI">placeholder</idno>'
+        f'</biblStruct></sourceDesc></fileDesc><profileDesc><abstract><div><p>{paragraph()}</p></div></abstract>'
+        f'</profileDesc></teiHeader><text><body>{body}</body><back/></text></TEI>'
+    )
+
+
+def uniquify_tei(tei_xml: str, index: int, run_id: str) -> str:
+    """
+    Give a recorded fixture its own title and DOI (`STUB_DOI_PREFIX.<run_id>.<index>`) so every
+    synthetic PDF imports as a new paper and the rows can be found again afterwards.
+    """
+    root = etree.fromstring(tei_xml.encode("utf-8"))
+    ns = {"tei": TEI_NS}
+    title = root.find(".//tei:teiHeader/tei:fileDesc/tei:titleStmt/tei:title", ns)
+    if title is None:
+        title_stmt = root.find(".//tei:teiHeader/tei:fileDesc/tei:titleStmt", ns)
+        if title_stmt is None:
+            return tei_xml
+        title = etree.SubElement(title_stmt, f"{{{TEI_NS}}}title")
+    text = " ".join(title.itertext()).strip() or "Untitled"
+    for child in list(title):
+        title.remove(child)
+    title.text = f"{text} [{run_id}-{index}]"
+    doi = f"{STUB_DOI_PREFIX}.{run_id}.{index}"
+    idnos = [idno for idno in root.findall(".//tei:teiHeader//tei:idno", ns) if (idno.get("type") or "").lower() == "doi"]
+    if not idnos:
+        bibl = root.find(".//tei:teiHeader/tei:fileDesc/tei:sourceDesc/tei:biblStruct", ns)
+        if bibl is not None:
+            idnos = [etree.SubElement(bibl, f"{{{TEI_NS}}}idno", type="DOI")]
+    for idno in idnos:
+        idno.text = doi
+    return etree.tostring(root, encoding="unicode")
+
+
+def _pdf_escape(line: str) -> bytes:
+    data = line.encode("latin-1", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def synthetic_pdf(index: int, text: Optional[str] = None, lines_per_page: int = 55) -> bytes:
+    """
+    A minimal valid PDF tagged with `%stub-fixture:<index>`. With `text` it has a Helvetica
+    text layer (born-digital); without, one empty page (like a scan without OCR).
+    """
+    lines: List[str] = []
+    for paragraph in (text or "").split("\n\n"):
+        lines.extend(textwrap.wrap(paragraph, 95) + [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] if text else [[]]
+
+    objects: List[bytes] = []
+    font_id = 3
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects.append(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(pages))
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        stream = b"BT /F1 10 Tf 12 TL 50 750 Td\n" + b"".join(
+            b"(" + _pdf_escape(line) + b") Tj T*\n" for line in page_lines
+        ) + b"ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, page_id + 1)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n%stub-fixture:" + str(index).encode() + b"\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class StubGrobidServer:
+    """
+    A local stand-in for GROBID's REST API (processHeaderDocument, processFulltextDocument,
+    isalive). It answers every PDF with a TEI fixture: the one named by the PDF's
+    `%stub-fixture:<n>` marker, otherwise one picked by the request size. Latency, 500s and
+    503s can be injected, and `max_concurrency` answers 503 beyond that many parallel
+    requests, like GROBID's own pool.
+
+        with StubGrobidServer(fixtures, latency=0.2, overload_rate=0.05) as stub:
+            PdfTextExtractor(grobid_url=stub.url)...
+    """
+
+    def __init__(self, fixtures: Sequence[str], host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, overload_rate: float = 0.0,
+                 max_concurrency: Optional[int] = None, run_id: Optional[str] = None, seed: Optional[int] = None):
+        if not fixtures:
+            raise ValueError("StubGrobidServer needs at least one TEI fixture")
+        self.fixtures = list(fixtures)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.overload_rate = overload_rate
+        self.max_concurrency = max_concurrency
+        self.run_id = run_id
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "overloaded": 0}
+        self._rng = random.Random(seed)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubGrobidServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="grobid-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def response_for(self, body: bytes) -> str:
+        match = MARKER_RE.search(body)
+        index = int(match.group(1)) if match else len(body)
+        tei_xml = self.fixtures[index % len(self.fixtures)]
+        if self.run_id is not None:
+            tei_xml = uniquify_tei(tei_xml, index, self.run_id)
+        return tei_xml
+
+    def _outcome(self) -> int:
+        with self._lock:
+            self.stats["requests"] += 1
+            self._active += 1
+            busy = self.max_concurrency is not None and self._active > self.max_concurrency
+            draw = self._rng.random()
+        if busy or draw < self.overload_rate:
+            return 503
+        if draw < self.overload_rate + self.error_rate:
+            return 500
+        return 200
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug("grobid-stub: " + format, *args)
+
+            def _send(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/api/isalive":
+                    self._send(200, b"true")
+                else:
+                    self._send(404)
+
+            def do_POST(self):
+                service = self.path.rstrip("/").rsplit("/", 1)[-1]
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if service not in ("processHeaderDocument", "processFulltextDocument"):
+                    self._send(404)
+                    return
+                status = stub._outcome()
+                try:
+                    if stub.latency or stub.jitter:
+                        time.sleep(max(0.0, stub.latency + stub._rng.uniform(-stub.jitter, stub.jitter)))
+                    if status == 200:
+                        self._send(200, stub.response_for(body).encode("utf-8"), "application/xml")
+                    else:
+                        self._send(status, b"stub failure")
+                finally:
+                    with stub._lock:
+                        stub._active -= 1
+                        key = {200: "ok", 500: "errors", 503: "overloaded"}[status]
+                        stub.stats[key] += 1
+
+        return Handler
+
+
+def _serve(fixtures: List[str], ready, options: dict):
+    server = StubGrobidServer(fixtures, **options)
+    ready.put(server.url)
+    server.serve_forever()
+
+
+def start_stub_process(fixtures: Sequence[str], **options):
+    """
+    Run a StubGrobidServer in a child process, so its CPU and memory stay out of the client's
+    measurements. Returns (process, url); stop it with `process.terminate()`.
+    """
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    process = context.Process(target=_serve, args=(list(fixtures), ready, options), name="grobid-stub", daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from typing import Collection, Iterable, Optional, Sequence
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from PB_Assistant.models import ImportBatch, ImportRun, PlanetaryBoundary
+
+logger = logging.getLogger(__name__)
+
+
+def register_run(name: str, folder: str, pdf_paths: Iterable[str], boundary: PlanetaryBoundary | None,
+                 batch_size: int = 50) -> tuple[ImportRun, int]:
+    """
+    Create the run (or extend an existing one) and split its files into batches. Paths already
+    registered for the run are skipped, so the coordinator can be re-run when files are added.
+    Returns the run and the number of newly registered files.
+    """
+    folder = os.path.abspath(folder)
+    run, _ = ImportRun.objects.get_or_create(name=name, defaults={"folder": folder, "boundary": boundary})
+    known = set()
+    for paths in ImportBatch.objects.filter(run=run).values_list("paths", flat=True).iterator():
+        known.update(paths)
+    new_paths = [rel for rel in (os.path.relpath(p, folder) for p in pdf_paths) if rel not in known]
+
+    with transaction.atomic():
+        next_index = _next_index(run.pk)
+        iterator = iter(new_paths)
+        batches = []
+        while chunk := list(islice(iterator, batch_size)):
+            batches.append(ImportBatch(run=run, index=next_index + len(batches), paths=chunk))
+        ImportBatch.objects.bulk_create(batches, batch_size=1000)
+        ImportRun.objects.filter(pk=run.pk).update(total_files=F("total_files") + len(new_paths))
+    run.refresh_from_db()
+    return run, len(new_paths)
+
+
+def _next_index(run_id: int) -> int:
+    """Index for a new batch of the run; locks the run row until the caller's transaction ends."""
+    ImportRun.objects.select_for_update().filter(pk=run_id).first()
+    last_index = ImportBatch.objects.filter(run_id=run_id).order_by("-index").values_list("index", flat=True).first()
+    return 0 if last_index is None else last_index + 1
+
+
+def lease_batch(run: ImportRun, node: str, lease: timedelta, exclude: Collection[int] = ()) -> Optional[ImportBatch]:
+    """
+    Lease the next batch that is queued or whose lease expired (its node stopped heartbeating),
+    other than the batch ids in `exclude`. SKIP LOCKED lets all nodes ask at the same time
+    without handing out a batch twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = (
+            ImportBatch.objects
+            .select_for_update(skip_locked=True)
+            .filter(run=run)
+            .exclude(pk__in=exclude)
+            .filter(Q(status=ImportBatch.STATUS_QUEUED)
+                    | Q(status=ImportBatch.STATUS_LEASED, lease_expires_at__lt=now))
+            .order_by("index")
+            .first()
+        )
+        if batch is None:
+            return None
+        if batch.status == ImportBatch.STATUS_LEASED:
+            logger.warning(f"Batch {batch.index}: lease of {batch.node} expired, re-queued to {node}")
+        batch.status = ImportBatch.STATUS_LEASED
+        batch.node = node
+        batch.lease_expires_at = now + lease
+        batch.heartbeat_at = now
+        batch.started_at = now
+        batch.attempts = F("attempts") + 1
+        batch.files_done = 0
+        batch.counts = {}
+        batch.save(update_fields=[
+            "status", "node", "lease_expires_at", "heartbeat_at", "started_at", "attempts", "files_done", "counts",
+        ])
+    batch.refresh_from_db(fields=["attempts"])
+    return batch
+
+
+def heartbeat(batch: ImportBatch, lease: timedelta, files_done: int | None = None) -> bool:
+    """Extend the lease; False when the batch was meanwhile leased by another node."""
+    now = timezone.now()
+    values = {"lease_expires_at": now + lease, "heartbeat_at": now}
+    if files_done is not None:
+        values["files_done"] = files_done
+    return ImportBatch.objects.filter(
+        pk=batch.pk, status=ImportBatch.STATUS_LEASED, node=batch.node
+    ).update(**values) == 1
+
+
+def finish_batch(batch: ImportBatch, counts: dict,
+                 retry_paths: Sequence[str] = ()) -> tuple[bool, Optional[ImportBatch]]:
+    """
+    Mark the batch done; False when it was meanwhile leased by another node. Files GROBID could
+    not process (`retry_paths`, relative to the run folder, counted as "retry") are not done:
+    they move to a new queued batch, returned as the second value.
+    """
+    counts = {key: n for key, n in counts.items() if key != "retry"}
+    with transaction.atomic():
+        finished = ImportBatch.objects.filter(
+            pk=batch.pk, status=ImportBatch.STATUS_LEASED, node=batch.node
+        ).update(
+            status=ImportBatch.STATUS_DONE, files_done=sum(counts.values()), counts=counts,
+            finished_at=timezone.now(), lease_expires_at=None,
+        ) == 1
+        if not finished or not retry_paths:
+            return finished, None
+        requeued = ImportBatch.objects.create(
+            run_id=batch.run_id, index=_next_index(batch.run_id), paths=list(retry_paths)
+        )
+    logger.info(f"Batch {batch.index}: {len(retry_paths)} files waiting for GROBID re-queued as batch {requeued.index}")
+    return True, requeued
+
+
+class Heartbeat:
+    """
+    Extends a batch lease from a background thread every `lease / 3`, so a single slow PDF
+    (GROBID can take minutes) does not let the lease run out. `lost` is set when another node
+    took the batch over; the worker then stops after its current file.
+    """
+
+    def __init__(self, batch: ImportBatch, lease: timedelta):
+        self.batch = batch
+        self.lease = lease
+        self.files_done = 0
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{batch.pk}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.lease.total_seconds() / 3):
+                if not heartbeat(self.batch, self.lease, self.files_done):
+                    logger.warning(f"Lost the lease on batch {self.batch.index}")
+                    self.lost.set()
+                    return
+        finally:
+            connection.close()
+
+
+def node_stats(run: ImportRun, window: timedelta) -> list[dict]:
+    """Per node: batches and files finished, outcome counts, overall and recent files per minute."""
+    since = timezone.now() - window
+    stats: dict = defaultdict(lambda: {
+        "batches": 0, "files": 0, "recent_files": 0, "counts": defaultdict(int),
+        "first_start": None, "last_finish": None, "leased": 0,
+    })
+    rows = ImportBatch.objects.filter(run=run).exclude(node="").values(
+        "node", "status", "files_done", "counts", "started_at", "finished_at"
+    )
+    for row in rows.iterator():
+        s = stats[row["node"]]
+        if row["status"] == ImportBatch.STATUS_LEASED:
+            s["leased"] += 1
+            continue
+        if row["status"] != ImportBatch.STATUS_DONE:
+            continue
+        s["batches"] += 1
+        s["files"] += row["files_done"]
+        for key, n in row["counts"].items():
+            s["counts"][key] += n
+        if row["finished_at"] >= since:
+            s["recent_files"] += row["files_done"]
+        if s["first_start"] is None or row["started_at"] < s["first_start"]:
+            s["first_start"] = row["started_at"]
+        if s["last_finish"] is None or row["finished_at"] > s["last_finish"]:
+            s["last_finish"] = row["finished_at"]
+
+    result = []
+    for node, s in sorted(stats.items()):
+        elapsed = (s["last_finish"] - s["first_start"]).total_seconds() if s["first_start"] else 0
+        result.append({
+            "node": node,
+            "batches": s["batches"],
+            "leased": s["leased"],
+            "files": s["files"],
+            "counts": dict(s["counts"]),
+            "files_per_min": s["files"] / elapsed * 60 if elapsed else 0.0,
+            "recent_files_per_min": s["recent_files"] / window.total_seconds() * 60,
+        })
+    return result
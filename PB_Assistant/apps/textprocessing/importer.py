@@ -1,20 +1,40 @@
 import logging
 import dataclasses
+import re
+from itertools import islice
 from typing import Iterable, List
 from django.utils.text import slugify
+from django.db import IntegrityError, connection, transaction
 from django.db.models import Q
-from PB_Assistant.models import AcademicPaper, PlanetaryBoundary
+from PB_Assistant.models import AcademicPaper, AcademicPaperPlanetaryBoundary, PlanetaryBoundary
 from PB_Assistant.data_models import AcademicPaperData, AcademicAuthorData
+from PB_Assistant.apps.textprocessing.near_duplicates import BatchTitles, find_near_duplicate, normalize_title
 
 logger = logging.getLogger(__name__)
 
 IDENTIFIERS = ['doi'] # may be extended
 
+DOI_PREFIX_RE = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+
 def generate_title_slug(title: str | None) -> str | None:
     return slugify(title) if title else None
 
 
-def find_duplicate(paper: AcademicPaperData, threshold: int = 90) -> AcademicPaper | None:
+def normalize_doi(doi: str | None) -> str | None:
+    """DOIs are case-insensitive; store them lower-cased and without resolver prefix."""
+    if not doi:
+        return None
+    doi = DOI_PREFIX_RE.sub('', doi.strip()).strip().lower()
+    return doi or None
+
+
+def normalize_identifiers(paper: AcademicPaperData) -> AcademicPaperData:
+    paper.doi = normalize_doi(paper.doi)
+    paper.title_slug = generate_title_slug(paper.title)
+    return paper
+
+
+def find_duplicate(paper: AcademicPaperData, threshold: int = 90, near_duplicates: bool = False) -> AcademicPaper | None:
     # Build Q object for all known non-null identifiers
     filters = Q()
     if paper.doi:
@@ -32,13 +52,10 @@ def find_duplicate(paper: AcademicPaperData, threshold: int = 90) -> AcademicPap
         if match:
             return match
 
-        # I comment out fuzzy duplicate check because if it is an annual report, only year changes in the title such as Indicators of Global Climate Change 2022, 2023 etc..
-        # which is treated as a duplicate
-
-        # for existing in AcademicPaper.objects.exclude(title__isnull=True).iterator():
-        #     score = fuzz.token_sort_ratio(paper.title.lower(), existing.title.lower())
-        #     if score >= threshold:
-        #         return existing
+        # Fuzzy match is opt-in; it goes through the pg_trgm index and treats differing
+        # numbers (e.g. the year of an annual report) as distinct papers.
+        if near_duplicates:
+            return find_near_duplicate(paper.title, threshold / 100)
 
     return None
 
@@ -46,25 +63,44 @@ def serialize_authors(authors: List[AcademicAuthorData]) -> list[dict]:
     """Convert list of dataclass authors to list of dicts (JSON serializable)."""
     return [dataclasses.asdict(a) for a in authors]
 
-def insert_new_paper(data: AcademicPaperData) -> AcademicPaper:
-    paper = AcademicPaper(
+def build_paper(data: AcademicPaperData) -> AcademicPaper:
+    return AcademicPaper(
         paper_id=data.paper_id,
         doi=data.doi,
         time_edited=data.time_edited,
         text=data.text,
         title=data.title,
         title_slug=data.title_slug or (slugify(data.title) if data.title else None),
+        title_normalized=normalize_title(data.title),
         publication_year=data.publication_year,
         source=data.source,
         keywords=data.keywords,
         author_list=serialize_authors(data.author_list),
         meta=data.meta,
     )
+
+
+def insert_new_paper(data: AcademicPaperData) -> AcademicPaper:
+    paper = build_paper(data)
     paper.save()
 
     return paper
 
 
+def lock_identity(paper: AcademicPaperData):
+    """
+    Serialize concurrent imports of the same paper (same DOI or title slug) until the end of
+    the current transaction, so the duplicate check and the insert cannot interleave across
+    processes or nodes. Keys are locked in sorted order to avoid deadlocks.
+    """
+    keys = sorted(f"{field}:{value}" for field, value in (("doi", paper.doi), ("slug", paper.title_slug)) if value)
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        for key in keys:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+
+
 def safe_truncate(value, length=255):
     return value[:length] if value else ''
 
@@ -86,44 +122,126 @@ def add_planetary_boundary(paper: AcademicPaper, pb_input):
         paper.planetary_boundary.add(pb_input)
 
 
-def import_academic_paper(paperData: AcademicPaperData, planetary_boundary: PlanetaryBoundary):
+def import_academic_paper(paperData: AcademicPaperData, planetary_boundary: PlanetaryBoundary,
+                          near_duplicates: bool = False, fuzzy_threshold: int = 90):
     status = ''
     if not any(getattr(paperData, field) for field in IDENTIFIERS) and not getattr(paperData, 'title',
                                                                               None):  # skip record if no identifier or title provided where we can check duplicates
         status = 'skipped_empty'
         return status, None
 
-    paperData.title_slug = generate_title_slug(paperData.title)
+    normalize_identifiers(paperData)
+
+    with transaction.atomic():
+        lock_identity(paperData)
+        existing = find_duplicate(paperData, fuzzy_threshold, near_duplicates=near_duplicates)
+        if existing:
+            return status, None
+        try:
+            with transaction.atomic():
+                obj = insert_new_paper(paperData)
+        except IntegrityError:
+            # Inserted by a writer that does not take the identity lock (e.g. a batch import).
+            logger.info(f"Paper with DOI {paperData.doi} was inserted concurrently; treating as duplicate")
+            return status, None
+        add_planetary_boundary(obj, planetary_boundary)
+    status = 'new_record'
+    return status, obj
 
-    existing = find_duplicate(paperData)
 
-    if not existing:
-        obj = insert_new_paper(paperData)
-        add_planetary_boundary(obj, planetary_boundary)
-        status = 'new_record'
-        return status, obj
-    else:
-        return status, None
+def import_academic_paper_batch(
+        batch: List[AcademicPaperData], planetary_boundary: PlanetaryBoundary | None,
+        near_duplicates: bool = False, fuzzy_threshold: int = 90
+) -> tuple[list[AcademicPaper], int, int]:
+    """
+    Import one batch set-based: duplicates are resolved with one `IN` query per identifier
+    type (doi, title_slug; both indexed), and new papers plus their boundary links are
+    inserted with bulk_create. Returns (created papers, duplicates, skipped empty records).
+
+    With `near_duplicates` the remaining papers are also checked against existing titles
+    through the trigram index (one indexed query per paper, `fuzzy_threshold` is 0-100) and
+    against the titles accepted earlier in the same batch.
+
+    If another process inserts one of the DOIs between the lookup and the insert, the unique
+    DOI constraint rejects the batch and the lookup is repeated.
+    """
+    for attempt in range(3):
+        try:
+            return _import_batch_once(batch, planetary_boundary, near_duplicates, fuzzy_threshold)
+        except IntegrityError:
+            if attempt == 2:
+                raise
+            logger.info("Concurrent insert of a DOI in this batch; retrying duplicate lookup")
+
+
+def _import_batch_once(
+        batch: List[AcademicPaperData], planetary_boundary: PlanetaryBoundary | None,
+        near_duplicates: bool, fuzzy_threshold: int
+) -> tuple[list[AcademicPaper], int, int]:
+    candidates = []
+    skipped_empty = 0
+    for paper in batch:
+        normalize_identifiers(paper)
+        if not paper.doi and not paper.title_slug:
+            skipped_empty += 1
+            continue
+        candidates.append(paper)
+
+    dois = {p.doi for p in candidates if p.doi}
+    slugs = {p.title_slug for p in candidates if p.title_slug}
+    seen_dois = set(AcademicPaper.objects.filter(doi__in=dois).values_list('doi', flat=True)) if dois else set()
+    seen_slugs = set(AcademicPaper.objects.filter(title_slug__in=slugs).values_list('title_slug', flat=True)) if slugs else set()
+
+    to_create = []
+    duplicates = 0
+    batch_titles = BatchTitles(fuzzy_threshold / 100) if near_duplicates else None
+    for paper in candidates:
+        # Same precedence as find_duplicate: doi, then title slug; also catches repeats within the batch.
+        if (paper.doi and paper.doi in seen_dois) or (paper.title_slug and paper.title_slug in seen_slugs):
+            duplicates += 1
+            continue
+        if near_duplicates and (batch_titles.matches(paper.title)
+                                or find_near_duplicate(paper.title, fuzzy_threshold / 100)):
+            duplicates += 1
+            continue
+        if near_duplicates:
+            batch_titles.add(paper.title)
+        if paper.doi:
+            seen_dois.add(paper.doi)
+        if paper.title_slug:
+            seen_slugs.add(paper.title_slug)
+        to_create.append(build_paper(paper))
+
+    with transaction.atomic():
+        created = AcademicPaper.objects.bulk_create(to_create)
+        if planetary_boundary is not None:
+            AcademicPaperPlanetaryBoundary.objects.bulk_create([
+                AcademicPaperPlanetaryBoundary(academicpaper=paper, planetary_boundary=planetary_boundary)
+                for paper in created
+            ])
+    return created, duplicates, skipped_empty
 
 
 def import_academic_papers(
         new_papers: Iterable[AcademicPaperData], planetary_boundary: PlanetaryBoundary,
-        fuzzy_threshold: int = 90
+        fuzzy_threshold: int = 90, batch_size: int = 1000, near_duplicates: bool = False
 ) -> dict:
 
     new_count = 0
-    variant_count = 0
+    duplicate_count = 0
     skipped_empty_count = 0
 
-    for paper in new_papers:
-        status, paper = import_academic_paper(paper, planetary_boundary)
-        if status == 'skipped_empty':
-            skipped_empty_count += 1
-        elif status == 'new_record':
-            variant_count += 1
-            new_count += 1
+    iterator = iter(new_papers)
+    while batch := list(islice(iterator, batch_size)):
+        created, duplicates, skipped_empty = import_academic_paper_batch(
+            batch, planetary_boundary, near_duplicates, fuzzy_threshold
+        )
+        new_count += len(created)
+        duplicate_count += duplicates
+        skipped_empty_count += skipped_empty
 
     return {
         "empty_records_skipped": skipped_empty_count,
+        "duplicates": duplicate_count,
         "new_papers": new_count
     }
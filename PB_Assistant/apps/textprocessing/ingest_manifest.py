@@ -0,0 +1,83 @@
+from __future__ import annotations
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from PB_Assistant.models import AcademicPaper, PdfIngestManifest
+
+logger = logging.getLogger(__name__)
+
+# Outcomes after which a file does not need to be sent to GROBID again.
+COMPLETED_STATUSES = ("new_record", "duplicate", "skipped_empty", "attached_fulltext")
+
+
+@dataclass
+class FileFingerprint:
+    path: str
+    size: int
+    mtime: float
+    sha256: Optional[str] = None
+
+
+def file_sha256(pdf_path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(pdf_path: str) -> FileFingerprint:
+    st = os.stat(pdf_path)
+    return FileFingerprint(path=os.path.abspath(pdf_path), size=st.st_size, mtime=st.st_mtime)
+
+
+class IngestManifest:
+    """Tracks which PDFs were already ingested, keyed by path and SHA-256 of their content.
+
+    Rows are written after each file, so the manifest doubles as the checkpoint of an
+    interrupted run: completed files are skipped on the next invocation.
+    """
+
+    def __init__(self, force: bool = False):
+        self.force = force
+
+    def check(self, pdf_path: str) -> tuple[bool, FileFingerprint]:
+        """Return (unchanged, fingerprint). Hashing is skipped when size and mtime match."""
+        fp = fingerprint(pdf_path)
+        row = PdfIngestManifest.objects.filter(path=fp.path).first()
+        if row is not None and row.size == fp.size and row.mtime == fp.mtime:
+            fp.sha256 = row.sha256
+            if not self.force and row.status in COMPLETED_STATUSES:
+                return True, fp
+            return False, fp
+
+        fp.sha256 = file_sha256(pdf_path)
+        if self.force:
+            return False, fp
+
+        seen = (
+            PdfIngestManifest.objects
+            .filter(sha256=fp.sha256, status__in=COMPLETED_STATUSES)
+            .exclude(path=fp.path)
+            .first()
+        )
+        if seen is not None:
+            # Same content under another path (moved or copied file): remember it and skip.
+            self.record(fp, seen.status, seen.academicpaper)
+            return True, fp
+        return False, fp
+
+    def record(self, fp: FileFingerprint, status: str, academicpaper: AcademicPaper | None = None):
+        PdfIngestManifest.objects.update_or_create(
+            path=fp.path,
+            defaults={
+                "sha256": fp.sha256 or file_sha256(fp.path),
+                "size": fp.size,
+                "mtime": fp.mtime,
+                "status": status or "duplicate",
+                "academicpaper": academicpaper,
+            },
+        )
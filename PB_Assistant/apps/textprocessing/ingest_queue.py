@@ -0,0 +1,130 @@
+from __future__ import annotations
+import logging
+import os
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from PB_Assistant.models import IngestJob, PlanetaryBoundary
+from PB_Assistant.apps.textprocessing.importer import add_planetary_boundary
+from PB_Assistant.apps.textprocessing.ingest_manifest import IngestManifest
+from PB_Assistant.apps.textprocessing.pdf_ingest import PdfIngestService
+from PB_Assistant.apps.textprocessing.uploads import link_paper
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_upload(user_id: int, file_path: str, original_name: str,
+                   boundaries: Iterable[PlanetaryBoundary] = ()) -> IngestJob:
+    job = IngestJob.objects.create(
+        user_id=user_id,
+        file_path=os.path.abspath(file_path),
+        original_name=original_name,
+    )
+    job.planetary_boundaries.set(list(boundaries))
+    return job
+
+
+def claim_job(worker: str) -> Optional[IngestJob]:
+    """
+    Atomically take the oldest queued job. SKIP LOCKED lets any number of workers poll the
+    same table without blocking on, or double-claiming, each other's rows.
+    """
+    with transaction.atomic():
+        job = (
+            IngestJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=IngestJob.STATUS_QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = IngestJob.STATUS_RUNNING
+        job.stage = "extracting"
+        job.worker = worker
+        job.attempts = F("attempts") + 1
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=["status", "stage", "worker", "attempts", "started_at", "heartbeat_at"])
+    job.refresh_from_db(fields=["attempts"])
+    return job
+
+
+def requeue_stale(older_than: timedelta, max_attempts: int) -> int:
+    """
+    Put back jobs whose worker died mid-run: running jobs without a heartbeat for `older_than`.
+    Jobs that keep failing are marked failed instead.
+    """
+    cutoff = timezone.now() - older_than
+    # Jobs claimed before heartbeats existed only have started_at.
+    stale = IngestJob.objects.filter(status=IngestJob.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=IngestJob.STATUS_FAILED, stage="", message="Worker stopped responding", finished_at=timezone.now()
+    )
+    requeued = stale.update(status=IngestJob.STATUS_QUEUED, stage="")
+    if failed or requeued:
+        logger.warning(f"Stale ingest jobs: {requeued} requeued, {failed} failed")
+    return requeued
+
+
+def heartbeat(job_ids: Iterable[int]):
+    """Mark these running jobs as alive, so requeue_stale leaves them to their worker."""
+    ids = list(job_ids)
+    if ids:
+        IngestJob.objects.filter(pk__in=ids, status=IngestJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+
+def set_stage(job: IngestJob, stage: str):
+    IngestJob.objects.filter(pk=job.pk).update(stage=stage, heartbeat_at=timezone.now())
+
+
+def finish_job(job: IngestJob, result: str, paper=None, message: str = ""):
+    job.status = IngestJob.STATUS_FAILED if result == "error" else IngestJob.STATUS_DONE
+    job.stage = ""
+    job.result = result
+    job.academicpaper = paper
+    job.message = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "stage", "result", "academicpaper", "message", "finished_at"])
+    link_paper(job, paper)
+
+
+def retry_job(job: IngestJob):
+    """Put the job back in the queue without counting the attempt (GROBID, not the PDF, failed)."""
+    IngestJob.objects.filter(pk=job.pk).update(
+        status=IngestJob.STATUS_QUEUED, stage="", attempts=F("attempts") - 1, message="Waiting for GROBID"
+    )
+
+
+def run_job(job: IngestJob, service: PdfIngestService, manifest: IngestManifest) -> tuple[str, object | None]:
+    """
+    Ingest one job's PDF (GROBID header + fulltext + import). The paper is linked to every
+    boundary selected at upload time. Returns the ingest status and the new paper, if any;
+    status "retry" means GROBID was unavailable and nothing was stored.
+    """
+    if not os.path.isfile(job.file_path):
+        raise FileNotFoundError(f"Uploaded file is missing: {job.original_name}")
+    unchanged, fp = manifest.check(job.file_path)
+    if unchanged:
+        return "duplicate", None
+
+    boundaries = list(job.planetary_boundaries.all())
+    status, paper = service.ingest_file(job.file_path, boundary=boundaries[0] if boundaries else None)
+    manifest.record(fp, status, paper)
+    if paper is not None:
+        for boundary in boundaries[1:]:
+            add_planetary_boundary(paper, boundary)
+    return status or "duplicate", paper
+
+
+def job_counts(user_id: int) -> dict:
+    counts = {
+        row["status"]: row["n"]
+        for row in IngestJob.objects.filter(user_id=user_id).values("status").annotate(n=Count("id"))
+    }
+    return {status: counts.get(status, 0) for status, _ in IngestJob.STATUS_CHOICES}
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import logging
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pypdfium2 as pdfium
+
+from PB_Assistant.apps.textprocessing import tei_text
+
+logger = logging.getLogger(__name__)
+
+PAGE_NUMBER_RE = re.compile(r'^\s*(?:page\s+)?\d{1,4}(?:\s*(?:/|of)\s*\d{1,4})?\s*$', re.IGNORECASE)
+HYPHEN_BREAK_RE = re.compile(r'(\w)-\n(\w)')
+DOT_LEADER_RE = re.compile(r'(?:\s*\.){4,}')
+REFERENCES_HEADING_RE = re.compile(
+    r'^\s*(?:\d+\.?\s*)?(?:references|bibliography|literature cited|works cited)\s*$', re.IGNORECASE | re.MULTILINE
+)
+WORD_RE = re.compile(r'\w+')
+# PDFium is not thread-safe and import_pdfs / run_ingest_worker extract from a thread pool:
+# every pdfium call (open, text pages, close) happens under this lock.
+_PDFIUM_LOCK = threading.Lock()
+
+
+@dataclass
+class TextLayerQuality:
+    """How usable a PDF's embedded text layer is; `reason` is "ok" or why GROBID should be used."""
+    pages: int
+    chars_per_page: float
+    empty_page_share: float
+    clean_char_share: float
+    mean_word_length: float
+    reason: str
+
+    @property
+    def usable(self) -> bool:
+        return self.reason == "ok"
+
+
+def assess_text_layer(page_texts: List[str], min_chars_per_page: int = 500, max_empty_page_share: float = 0.2,
+                      min_clean_char_share: float = 0.9) -> TextLayerQuality:
+    """
+    Scanned PDFs have no (or an OCR-garbage) text layer; broken encodings produce replacement
+    characters or spaced-out letters; both are sent to GROBID instead.
+    """
+    pages = len(page_texts)
+    chars = [len(text.strip()) for text in page_texts]
+    total = sum(chars)
+    text = "".join(page_texts)
+    clean = sum(1 for c in text if c.isalnum() or c.isspace() or c in ".,;:()[]-'\"%/") if text else 0
+    words = WORD_RE.findall(text)
+    quality = TextLayerQuality(
+        pages=pages,
+        chars_per_page=total / pages if pages else 0.0,
+        empty_page_share=sum(1 for n in chars if n < 50) / pages if pages else 1.0,
+        clean_char_share=clean / len(text) if text else 0.0,
+        mean_word_length=sum(map(len, words)) / len(words) if words else 0.0,
+        reason="ok",
+    )
+    if not pages or total == 0:
+        quality.reason = "no_text_layer"
+    elif quality.chars_per_page < min_chars_per_page or quality.empty_page_share > max_empty_page_share:
+        quality.reason = "sparse_text"
+    elif quality.clean_char_share < min_clean_char_share or not 3.0 <= quality.mean_word_length <= 12.0:
+        quality.reason = "garbled"
+    return quality
+
+
+def _strip_running_lines(page_texts: List[str]) -> List[str]:
+    """Drop page numbers and header/footer lines that repeat on at least half of the pages."""
+    pages_lines = [[line.strip() for line in text.splitlines()] for text in page_texts]
+    running = set()
+    if len(pages_lines) >= 4:
+        seen = Counter(
+            line for lines in pages_lines
+            for line in set(lines[:2] + lines[-2:]) if line and not PAGE_NUMBER_RE.match(line)
+        )
+        running = {line for line, n in seen.items() if n >= len(pages_lines) / 2}
+    return [
+        "\n".join(line for line in lines if line not in running and not PAGE_NUMBER_RE.match(line))
+        for lines in pages_lines
+    ]
+
+
+def clean_text_layer(page_texts: List[str]) -> str:
+    """
+    Turn pdfium page texts into the same shape as GROBID fulltext: running headers, page
+    numbers and the reference list removed, hyphenation at line ends undone, then cleaned with
+    the TEI cleaner (soft line breaks merged, whitespace collapsed).
+    """
+    text = "\n".join(_strip_running_lines(page_texts))
+    text = HYPHEN_BREAK_RE.sub(r'\1\2', text)
+    text = DOT_LEADER_RE.sub(' ', text)
+    # The reference list is in the TEI <back>, which the GROBID path leaves out too.
+    headings = [m for m in REFERENCES_HEADING_RE.finditer(text) if m.start() > len(text) * 0.5]
+    if headings:
+        text = text[:headings[-1].start()]
+    return tei_text.clean_text(text)
+
+
+class LocalTextExtractor:
+    """Read the embedded text layer of born-digital PDFs with pdfium, in milliseconds per document."""
+
+    def __init__(self, max_pages: Optional[int] = None):
+        self.max_pages = max_pages
+
+    def page_texts(self, pdf_path: str) -> List[str]:
+        """Text of each page. Serialized process-wide; a page takes about a millisecond."""
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                texts = []
+                for index in range(min(len(pdf), self.max_pages or len(pdf))):
+                    page = pdf[index]
+                    textpage = page.get_textpage()
+                    try:
+                        texts.append(textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n"))
+                    finally:
+                        textpage.close()
+                        page.close()
+                return texts
+            finally:
+                pdf.close()
+
+    def extract_fulltext_document(self, pdf_path: str) -> tuple[str, Optional[list], TextLayerQuality]:
+        """(text, None, quality); the text is empty unless the text layer is usable. No sections are derived."""
+        try:
+            page_texts = self.page_texts(pdf_path)
+        except pdfium.PdfiumError as e:
+            logger.debug(f"pdfium could not open {pdf_path}: {e}")
+            return "", None, assess_text_layer([])
+        quality = assess_text_layer(page_texts)
+        if not quality.usable:
+            return "", None, quality
+        return clean_text_layer(page_texts), None, quality
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import logging
+from typing import Iterator, List, Optional, Tuple
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection, transaction
+from PB_Assistant.models import AcademicPaper
+from PB_Assistant.text_normalization import normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+def numeric_tokens(normalized_title: str | None) -> frozenset:
+    """Tokens containing digits (years, editions, volume numbers) must match exactly."""
+    if not normalized_title:
+        return frozenset()
+    return frozenset(t for t in normalized_title.split() if any(c.isdigit() for c in t))
+
+
+def _set_similarity_threshold(cursor, threshold: float):
+    # The `%` operator (and therefore the GIN index) uses this threshold. Local to the current
+    # transaction, so it never leaks to other users of a pooled connection.
+    cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(threshold)])
+
+
+def trigrams(normalized_title: str | None) -> frozenset:
+    """pg_trgm's trigram set of a normalized title (each word padded with two spaces before, one after)."""
+    if not normalized_title:
+        return frozenset()
+    grams = set()
+    for word in normalized_title.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class BatchTitles:
+    """
+    Titles accepted so far in one import batch. Papers of the same batch are not in the table
+    yet, so find_near_duplicate cannot see them; they are matched here the same way (trigram
+    similarity >= threshold and the same numeric tokens).
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._titles: List[Tuple[frozenset, frozenset]] = []
+
+    def _key(self, title: str | None) -> Optional[Tuple[frozenset, frozenset]]:
+        normalized = normalize_title(title)
+        return (trigrams(normalized), numeric_tokens(normalized)) if normalized else None
+
+    def matches(self, title: str | None) -> bool:
+        key = self._key(title)
+        if key is None:
+            return False
+        grams, numbers = key
+        for other_grams, other_numbers in self._titles:
+            if numbers == other_numbers and len(grams & other_grams) / len(grams | other_grams) >= self.threshold:
+                return True
+        return False
+
+    def add(self, title: str | None):
+        key = self._key(title)
+        if key is not None:
+            self._titles.append(key)
+
+
+def find_near_duplicate(title: str | None, threshold: float = 0.9) -> Optional[AcademicPaper]:
+    """
+    Most similar existing paper whose normalized title has trigram similarity >= threshold
+    and the same numeric tokens, so "Indicators of Global Climate Change 2022" and "... 2023"
+    stay distinct. Candidates come from the pg_trgm GIN index, not a table scan.
+    """
+    normalized = normalize_title(title)
+    if not normalized:
+        return None
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _set_similarity_threshold(cursor, threshold)
+        candidates = list(
+            AcademicPaper.objects
+            .filter(title_normalized__trigram_similar=normalized)
+            .annotate(similarity=TrigramSimilarity("title_normalized", normalized))
+            .order_by("-similarity")[:10]
+        )
+    wanted = numeric_tokens(normalized)
+    for candidate in candidates:
+        if numeric_tokens(candidate.title_normalized) == wanted:
+            return candidate
+    return None
+
+
+def near_duplicate_pairs(threshold: float = 0.9) -> Iterator[Tuple[int, int, float]]:
+    """
+    Yield (paper_id, other_paper_id, similarity) for every near-duplicate title pair in the
+    library. Each paper probes the trigram index, so the report stays far from O(N^2).
+    """
+    table = AcademicPaper._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        _set_similarity_threshold(cursor, threshold)
+        cursor.execute(
+            f'SELECT a.id, b.id, a.title_normalized, b.title_normalized, '
+            f'similarity(a.title_normalized, b.title_normalized) AS sim '
+            f'FROM "{table}" a JOIN "{table}" b '
+            f'ON a.id < b.id AND a.title_normalized %% b.title_normalized '
+            f'WHERE similarity(a.title_normalized, b.title_normalized) >= %s '
+            f'ORDER BY sim DESC',
+            [threshold],
+        )
+        rows = cursor.fetchall()
+    for a_id, b_id, a_title, b_title, sim in rows:
+        if numeric_tokens(a_title) == numeric_tokens(b_title):
+            yield a_id, b_id, sim
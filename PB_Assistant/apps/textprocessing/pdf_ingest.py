@@ -6,7 +6,10 @@ from typing import Optional, Dict
 
 from PB_Assistant.data_models import AcademicPaperData, AcademicAuthorData, AffiliationData
 from PB_Assistant.models import PlanetaryBoundary, AcademicPaperText
-from PB_Assistant.apps.textprocessing.importer import import_academic_paper
+from PB_Assistant.apps.textprocessing.importer import (
+    add_planetary_boundary, find_duplicate, import_academic_paper, normalize_identifiers,
+)
+from PB_Assistant.apps.textprocessing.grobid.errors import GrobidError
 from PB_Assistant.apps.textprocessing.grobid.parser import parse_tei_header
 from PB_Assistant.apps.textprocessing.grobid.types import ParsedHeader
 
@@ -24,35 +27,106 @@ def get_boundary(boundary_name: Optional[str]):
 class PdfIngestService:
     """Service that coordinates parsing, importing, and fulltext handling for one PDF."""
 
-    def __init__(self, text_client, embedder=None):
+    def __init__(self, text_client, embedder=None, embed_batch_size: int = 1,
+                 near_duplicate_threshold: int | None = None, local_consolidation: bool = False):
         self.text_client = text_client
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.local_consolidation = local_consolidation
         self.embedder = embedder
+        self.embed_batch_size = max(1, embed_batch_size)
+        self._pending_texts: list[AcademicPaperText] = []
+
+    def flush_embeddings(self) -> int:
+        """Embed all texts queued by `ingest_file` in one cross-document batch."""
+        if self.embedder is None or not self._pending_texts:
+            return 0
+        pending, self._pending_texts = self._pending_texts, []
+        return self.embedder.embed_academic_papers(pending)
 
     def ingest_file(self, pdf_path: str, boundary=None) -> tuple[str, object | None]:
+        """
+        Returns (status, new paper or None). Status "retry" means GROBID was overloaded or
+        unreachable: nothing was stored and the file should be tried again later.
+
+        With local consolidation a header matching an existing record that has no fulltext
+        yet (e.g. imported from metadata only) gives that record this PDF's text; the status
+        is then "attached_fulltext" and the existing paper is returned.
+        """
         try:
             tei_header = self.text_client.process_header(pdf_path)
             parsed_header = parse_tei_header(tei_header)
             ac = self._translate_record_from_grobid(parsed_header)
 
-            status, academicpaper = import_academic_paper(ac, boundary)
+            fulltext = None
+            if ac.doi or ac.title:
+                existing = self._find_existing(normalize_identifiers(ac))
+                if existing is not None:
+                    if self.local_consolidation:
+                        return self._attach_fulltext(existing, pdf_path, boundary)
+                    return "", None
+                # Fetch the fulltext before inserting, so a GROBID failure never leaves a paper without text.
+                fulltext = self.text_client.extract_fulltext_document(pdf_path=pdf_path)
+
+            if self.near_duplicate_threshold:
+                status, academicpaper = import_academic_paper(
+                    ac, boundary, near_duplicates=True, fuzzy_threshold=self.near_duplicate_threshold
+                )
+            else:
+                status, academicpaper = import_academic_paper(ac, boundary)
             if status != 'new_record':
                 return status, None
 
             ait = AcademicPaperText.objects.filter(academicpaper=academicpaper).first()
             if ait is None or not ait.hasfulltext:
-                fulltext_str = self.text_client.extract_fulltext(pdf_path=pdf_path)
+                fulltext_str, sections = fulltext or ("", None)
                 if fulltext_str:
                     obj, created = AcademicPaperText.objects.update_or_create(
                         academicpaper=academicpaper,
-                        defaults={"text": fulltext_str, "hasfulltext": True},
+                        defaults={"text": fulltext_str, "hasfulltext": True, "sections": sections},
                     )
-                    if self.embedder is not None:
-                        self.embedder.embed_academic_paper(obj)
+                    self._queue_embedding(obj)
             return status, academicpaper
+        except GrobidError as e:
+            if e.retryable:
+                logger.warning("GROBID unavailable for %s, will retry: %s", pdf_path, e)
+                return "retry", None
+            logger.warning("GROBID could not process %s: %s", pdf_path, e)
+            return "error", None
         except Exception:
             logger.exception("Failed to ingest %s", pdf_path)
             return "error", None
 
+    def _find_existing(self, ac: AcademicPaperData):
+        """
+        The library record this header describes, by DOI and title slug (both indexed) and, with
+        near-duplicate detection or local consolidation, by trigram title similarity (GIN index).
+        This is what replaces GROBID's per-PDF round-trip to its consolidation service.
+        """
+        threshold = self.near_duplicate_threshold or (90 if self.local_consolidation else None)
+        if threshold:
+            return find_duplicate(ac, threshold, near_duplicates=True)
+        return find_duplicate(ac)
+
+    def _attach_fulltext(self, paper, pdf_path: str, boundary) -> tuple[str, object | None]:
+        if AcademicPaperText.objects.filter(academicpaper=paper, hasfulltext=True).exists():
+            return "", None
+        fulltext_str, sections = self.text_client.extract_fulltext_document(pdf_path=pdf_path)
+        if not fulltext_str:
+            return "", None
+        obj, created = AcademicPaperText.objects.update_or_create(
+            academicpaper=paper,
+            defaults={"text": fulltext_str, "hasfulltext": True, "sections": sections},
+        )
+        add_planetary_boundary(paper, boundary)
+        self._queue_embedding(obj)
+        return "attached_fulltext", paper
+
+    def _queue_embedding(self, paper_text: AcademicPaperText):
+        if self.embedder is not None:
+            self._pending_texts.append(paper_text)
+            if len(self._pending_texts) >= self.embed_batch_size:
+                self.flush_embeddings()
+
     def _translate_record_from_grobid(self, parsed: ParsedHeader) -> AcademicPaperData:
         identifiers: Dict[str, str] = parsed.identifiers or {}
         doi = identifiers.get("doi")
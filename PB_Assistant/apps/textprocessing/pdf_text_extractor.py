@@ -1,31 +1,84 @@
 import os
 import logging
 import io
+import hashlib
+import random
 import requests
 import re
+import time
 from typing import Optional
-from bs4 import BeautifulSoup
 from django.conf import settings
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from PB_Assistant.apps.textprocessing.tei_cache import TeiCache
+from PB_Assistant.apps.textprocessing import tei_text
+from PB_Assistant.apps.textprocessing.grobid.errors import (
+    GrobidError, GrobidOverloaded, GrobidRejected, GrobidUnavailable,
+)
+from PB_Assistant.apps.textprocessing.grobid.limiter import shared_guards
 
 logger = logging.getLogger(__name__)
 
+HEADER_SERVICE = "processHeaderDocument"
+FULLTEXT_SERVICE = "processFulltextDocument"
+HEADER_OPTIONS = {"consolidateHeader": 1, "consolidateCitations": 0}
+FULLTEXT_OPTIONS = {"consolidateHeader": "1"}
+# GROBID's consolidateHeader value per consolidation mode. "grobid" (full record) and "grobid-doi"
+# make GROBID query its consolidation service (CrossRef/biblio-glutton) for every PDF; "local"
+# matches headers against our own library instead (see PdfIngestService), "none" skips it.
+CONSOLIDATION_MODES = {"grobid": 1, "grobid-doi": 2, "local": 0, "none": 0}
+
+
+def header_options(consolidation: str) -> dict:
+    return {**HEADER_OPTIONS, "consolidateHeader": CONSOLIDATION_MODES[consolidation]}
+
+
+def fulltext_options(consolidation: str) -> dict:
+    # Part of the TEI cache key, so responses of different modes are cached separately.
+    return {**FULLTEXT_OPTIONS, "consolidateHeader": str(CONSOLIDATION_MODES[consolidation])}
+# GROBID answers 503 when its worker pool is full; the limiter backs off on these itself.
+OVERLOAD_STATUSES = (429, 503)
+
+
 class PdfTextExtractor:
-    """Extract text via GROBID with retries and guardrails."""
-    def __init__(self, grobid_url: Optional[str] = None, max_retries: int = 2, timeout: int = 60):
+    """
+    Extract text via GROBID with retries and guardrails.
+
+    Requests go through a limiter and circuit breaker shared by all extractors of the process
+    (see grobid.limiter). Failed requests raise a GrobidError; check `retryable` to tell a
+    busy or unreachable GROBID from a PDF it cannot process.
+    """
+    def __init__(self, grobid_url: Optional[str] = None, max_retries: int = 2, timeout: int = 60,
+                 tei_cache: Optional[TeiCache] = None, consolidation: Optional[str] = None):
         self.grobid_url = grobid_url or settings.GROBID_URL
+        self.consolidation = consolidation or getattr(settings, "GROBID_CONSOLIDATION", "grobid")
+        if self.consolidation not in CONSOLIDATION_MODES:
+            raise ValueError(f"Unknown consolidation mode '{self.consolidation}', expected one of {tuple(CONSOLIDATION_MODES)}")
+        self.header_options = header_options(self.consolidation)
+        self.fulltext_options = fulltext_options(self.consolidation)
+        self.max_retries = max_retries
+        self.limiter, self.breaker = shared_guards(
+            self.grobid_url,
+            maximum=getattr(settings, "GROBID_MAX_CONCURRENCY", 8),
+            latency_target=getattr(settings, "GROBID_LATENCY_TARGET", None),
+            failure_threshold=getattr(settings, "GROBID_FAILURE_THRESHOLD", 5),
+            reset_timeout=getattr(settings, "GROBID_RESET_TIMEOUT", 30.0),
+        )
         self.max_pages = getattr(settings, "PDF_MAX_PAGES", None)
         self.max_bytes = getattr(settings, "PDF_MAX_BYTES", 20 * 1024 * 1024)
         self.timeout = timeout
+        if tei_cache is None and getattr(settings, "TEI_CACHE_DIR", None):
+            tei_cache = TeiCache()
+        self.tei_cache = tei_cache
 
         self.session = requests.Session()
+        # Transport-level retries only; 503/429 are handled by _post so the limiter sees them.
         retry = Retry(
             total=max_retries,
             connect=max_retries,
-            read=max_retries,
+            read=0,
             backoff_factor=1.5,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[502, 504],
             allowed_methods=["POST"],
             raise_on_status=False,
         )
@@ -33,19 +86,93 @@ class PdfTextExtractor:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
+    def _cached(self, pdf_sha256: str, service: str, options: dict) -> Optional[str]:
+        if self.tei_cache is None:
+            return None
+        return self.tei_cache.get(pdf_sha256, service, options)
+
+    def _store(self, pdf_sha256: str, service: str, options: dict, tei_xml: str):
+        if self.tei_cache is None:
+            return
+        try:
+            self.tei_cache.put(pdf_sha256, service, options, tei_xml)
+        except OSError as e:
+            logger.warning(f"Could not write TEI cache entry: {e}")
+
+    def _post(self, service: str, filename: str, pdf_bytes: bytes, options: dict) -> Optional[str]:
+        """
+        POST a PDF to a GROBID service; return the TEI, or None when GROBID found no content (204).
+        Overload answers are retried with jittered exponential back-off and shrink the
+        shared concurrency limit; the outcome of the whole call feeds the circuit breaker.
+        """
+        url = f"{self.grobid_url}/api/{service}"
+        for attempt in range(self.max_retries + 1):
+            probe = self.breaker.before_call()
+            with self.limiter.slot():
+                start = time.monotonic()
+                try:
+                    resp = self.session.post(
+                        url, files={"input": (filename, io.BytesIO(pdf_bytes), "application/pdf")},
+                        data=options, timeout=self.timeout,
+                    )
+                except requests.Timeout as e:
+                    self.limiter.on_overload("timeout")
+                    self.breaker.record_failure()
+                    raise GrobidUnavailable(f"GROBID timed out after {self.timeout}s") from e
+                except requests.RequestException as e:
+                    self.breaker.record_failure()
+                    raise GrobidUnavailable(f"GROBID unreachable: {e}") from e
+                except BaseException:
+                    # Never leave a half-open probe without an outcome, or the circuit stays open for good.
+                    if probe:
+                        self.breaker.record_failure()
+                    raise
+                latency = time.monotonic() - start
+
+            if resp.status_code in OVERLOAD_STATUSES:
+                self.limiter.on_overload(str(resp.status_code))
+                # A half-open probe is not retried: GROBID is still busy, so the circuit opens again.
+                if attempt < self.max_retries and not probe:
+                    time.sleep(min(30.0, 1.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+                    continue
+                self.breaker.record_failure()
+                raise GrobidOverloaded(f"GROBID busy ({resp.status_code}) for {filename}", resp.status_code)
+            if resp.status_code > 500:
+                self.breaker.record_failure()
+                raise GrobidUnavailable(f"GROBID returned {resp.status_code} for {filename}", resp.status_code)
+
+            # GROBID answered: the service is healthy even if this PDF is not.
+            self.breaker.record_success()
+            if resp.status_code == 200:
+                self.limiter.on_success(latency)
+                return resp.text
+            if resp.status_code == 204:
+                return None
+            raise GrobidRejected(f"GROBID returned {resp.status_code} for {filename}", resp.status_code)
+
     def process_header(self, pdf_path: str) -> str:
-        """Return TEI XML string from processHeaderDocument."""
-        url = f"{self.grobid_url}/api/processHeaderDocument"
+        """Return TEI XML string from processHeaderDocument; raises GrobidError on failure."""
         with open(pdf_path, "rb") as f:
             pdf_bytes = f.read()
-        files = {"input": ("document.pdf", io.BytesIO(pdf_bytes), "application/pdf")}
-        data = {"consolidateHeader": 1, "consolidateCitations": 0}
-        resp = requests.post(url, files=files, data=data, timeout=self.timeout)
-        resp.raise_for_status()
-        return resp.text
+        pdf_sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+        cached = self._cached(pdf_sha256, HEADER_SERVICE, self.header_options)
+        if cached is not None:
+            return cached
+
+        tei_xml = self._post(HEADER_SERVICE, "document.pdf", pdf_bytes, self.header_options)
+        if tei_xml is None:
+            raise GrobidRejected("GROBID found no header in this PDF", 204)
+        self._store(pdf_sha256, HEADER_SERVICE, self.header_options, tei_xml)
+        return tei_xml
 
     def extract_fulltext(self,  pdf_path: str=None, filename: str=None) -> str:
-        url = f"{self.grobid_url}/api/processFulltextDocument"
+        return self.extract_fulltext_document(pdf_path=pdf_path, filename=filename)[0]
+
+    def extract_fulltext_document(self, pdf_path: str = None, filename: str = None) -> tuple[str, Optional[list]]:
+        """
+        Cleaned fulltext plus its TEI sections (see tei_text.extract_tei_divisions); ("", None) when
+        the PDF is missing, too large or has no text. GROBID failures raise GrobidError.
+        """
         if not pdf_path:
             pdf_path = os.path.join(settings.PDF_PATH, filename)
         if not filename:
@@ -53,36 +180,49 @@ class PdfTextExtractor:
 
         if not os.path.exists(pdf_path):
             logger.warning(f"File not found: {pdf_path}")
-            return ""
+            return "", None
 
         try:
             size = os.path.getsize(pdf_path)
             if size > self.max_bytes:
                 logger.debug(f"Skipping large PDF {filename} > {self.max_bytes} bytes")
-                return ""
+                return "", None
         except OSError:
             logger.debug(f"Stat failed for {filename}")
-            return ""
+            return "", None
 
         try:
             with open(pdf_path, "rb") as f:
-                resp = self.session.post(
-                    url,
-                    files={"input": (filename, f)},
-                    data={"consolidateHeader": "1"},
-                    timeout=self.timeout,
-                )
-            if resp.status_code != 200:
-                logger.debug(f"GROBID returned {resp.status_code} for {filename}")
-                return ""
-
-            return self.clean_text(self.parse_tei_fulltext(resp.text))
+                pdf_bytes = f.read()
+            pdf_sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+            tei_xml = self._cached(pdf_sha256, FULLTEXT_SERVICE, self.fulltext_options)
+            if tei_xml is None:
+                tei_xml = self._post(FULLTEXT_SERVICE, filename, pdf_bytes, self.fulltext_options)
+                if tei_xml is None:
+                    return "", None
+                self._store(pdf_sha256, FULLTEXT_SERVICE, self.fulltext_options, tei_xml)
+
+            return self.clean_text(self.parse_tei_fulltext(tei_xml)), tei_text.extract_tei_divisions(tei_xml)
 
+        except GrobidError:
+            raise
         except Exception as e:
             logger.error(f"Error extracting text from {filename}: {e}", exc_info=True)
-            return ""
+            return "", None
+
+    @staticmethod
+    def parse_tei_fulltext(tei_xml: str) -> str:
+        return tei_text.extract_tei_fulltext(tei_xml)
+
+    @staticmethod
+    def clean_text(text: str) -> str:
+        return tei_text.clean_text(text)
 
-    def parse_tei_fulltext(self, tei_xml: str) -> str:
+    # Reference implementations; parse_tei_fulltext/clean_text must produce identical output
+    # (see the bench_tei_parser command).
+    @staticmethod
+    def parse_tei_fulltext_soup(tei_xml: str) -> str:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(tei_xml, "xml")
         abstract = soup.find("abstract")
         body = soup.find("body")
@@ -95,7 +235,8 @@ class PdfTextExtractor:
 
         return "\n\n".join(parts)
 
-    def clean_text(self, text: str) -> str:
+    @staticmethod
+    def clean_text_multipass(text: str) -> str:
         # Fix broken Figure/Table references: "Figure \n 1" → "Figure 1"
         text = re.sub(r'(Figure|Table)\s*\n\s*(\d+)', r'\1 \2', text)
 
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TeiCache:
+    """Content-addressed, gzip-compressed on-disk cache of GROBID TEI responses.
+
+    Entries are keyed by the SHA-256 of the source PDF plus the GROBID service name and
+    request options, so text can be re-derived from TEI without calling GROBID again.
+    """
+
+    suffix = ".tei.xml.gz"
+
+    def __init__(self, cache_dir: Optional[str] = None, compresslevel: int = 6):
+        self.cache_dir = Path(cache_dir or settings.TEI_CACHE_DIR)
+        self.compresslevel = compresslevel
+
+    @staticmethod
+    def make_key(pdf_sha256: str, service: str, options: Dict) -> str:
+        normalized = json.dumps({k: str(v) for k, v in (options or {}).items()}, sort_keys=True)
+        return hashlib.sha256(f"{pdf_sha256}|{service}|{normalized}".encode("utf-8")).hexdigest()
+
+    def path_for(self, pdf_sha256: str, service: str, options: Dict) -> Path:
+        key = self.make_key(pdf_sha256, service, options)
+        return self.cache_dir / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, pdf_sha256: str, service: str, options: Dict) -> Optional[str]:
+        return read_tei(self.path_for(pdf_sha256, service, options))
+
+    def put(self, pdf_sha256: str, service: str, options: Dict, tei_xml: str) -> Path:
+        path = self.path_for(pdf_sha256, service, options)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see partial entries.
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.compresslevel) as gz:
+                gz.write(tei_xml.encode("utf-8"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+
+def read_tei(path: Path | str) -> Optional[str]:
+    try:
+        with gzip.open(path, "rb") as f:
+            return f.read().decode("utf-8")
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError) as e:
+        logger.warning(f"Corrupt TEI cache entry {path}: {e}")
+        return None
@@ -0,0 +1,246 @@
+from __future__ import annotations
+import io
+import itertools
+import re
+from typing import IO, Union
+from lxml import etree
+
+TEI_SECTIONS = ("abstract", "body")
+
+# Whitespace-only strings are collapsed the same way BeautifulSoup's tree builder does.
+_ASCII_SPACES = " \n\t\x0c\r"
+
+_INLINE_FIXES_RE = re.compile(
+    # "Figure \n 1" → "Figure 1", "Equation \n 5" → "Equation 5"
+    r'(?P<label>Figure|Table|Equation|Eq\.?)\s*\n\s*(?P<number>\d+)'
+    # "(Smith et al., 2021)\n." → "(Smith et al., 2021)."
+    r'|\)\s*\n\s*\.'
+    # "FIGURE 3\n3\nFIGURE 3 Description..." → "FIGURE 3 Description..."
+    r'|(?P<caption>FIGURE|TABLE)\s*\d+\s*\n\s*\d+\s*\n\s*(?P<repeat>(?P=caption)\s*\d+)'
+)
+# Soft line breaks become spaces and whitespace runs collapse; paragraph breaks are runs too.
+_WHITESPACE_RE = re.compile(r'\s{2,}|\n')
+
+
+def _localname(tag) -> str | None:
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit("}", 1)[-1]
+
+
+def _normalize_string(value: str | None) -> str | None:
+    if not value:
+        return None
+    if not value.strip(_ASCII_SPACES):
+        return "\n" if "\n" in value else " "
+    return value
+
+
+class _Section:
+    def __init__(self, root):
+        self.root = root
+        self.strings: list[str] = []
+
+
+def extract_tei_sections(source: Union[str, bytes, IO[bytes]], sections=TEI_SECTIONS) -> dict[str, str]:
+    """
+    Stream a TEI document with lxml `iterparse` and return the text of the first element of each
+    requested section, joined like BeautifulSoup's `get_text("\\n").strip()`. Processed elements
+    are removed as soon as their text has been emitted, so memory stays flat on very long documents.
+    Sections that are absent are missing from the result; present but empty sections map to "".
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    found: dict[str, _Section] = {}
+    active: list[_Section] = []
+
+    def emit(value):
+        value = _normalize_string(value)
+        if value is not None:
+            for section in active:
+                section.strings.append(value)
+
+    def flush_children(element, upto=None):
+        """Emit tails of finished children before `upto` (text of comments/PIs is skipped) and drop them."""
+        while True:
+            # Only look at the first child: the parser may already have read far ahead.
+            child = next(element.iterchildren(), None)
+            if child is None or child is upto:
+                break
+            emit(child.tail)
+            element.remove(child)
+
+    context = etree.iterparse(source, events=("start", "end"), recover=True, huge_tree=True)
+    for event, element in context:
+        name = _localname(element.tag)
+        if event == "start":
+            if active:
+                parent = element.getparent()
+                emit(parent.text)
+                parent.text = None
+                flush_children(parent, upto=element)
+            if name in sections and name not in found:
+                section = _Section(element)
+                found[name] = section
+                active.append(section)
+            continue
+
+        if active:
+            emit(element.text)
+            element.text = None
+            flush_children(element)
+            if active[-1].root is element:
+                active.pop()
+            continue
+
+        # Outside any requested section: nothing to emit, free the subtree.
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    del context
+    return {name: "\n".join(section.strings).strip() for name, section in found.items()}
+
+
+def extract_tei_fulltext(source: Union[str, bytes, IO[bytes]]) -> str:
+    """Abstract and body text of a GROBID TEI document, separated by a blank line."""
+    sections = extract_tei_sections(source)
+    return "\n\n".join(sections[name] for name in TEI_SECTIONS if name in sections)
+
+
+# Canonical section labels, matched in order against the lower-cased section title.
+SECTION_LABELS = (
+    ("acknowledgements", r"\backnowledge?ments?\b"),
+    ("references", r"\b(references|bibliography|literature cited)\b"),
+    ("funding", r"\b(funding|financial support)\b"),
+    ("contributions", r"\b(author contributions?|credit authorship)\b"),
+    ("competing_interests", r"\b(competing|conflicts?) of interests?\b|\bdeclaration of (competing )?interests?\b|\bcompeting interests?\b"),
+    ("data_availability", r"\b(data|code) availability\b|\bavailability of data\b"),
+    ("appendix", r"\b(appendix|appendices|supplementary)\b"),
+    ("conclusion", r"\b(conclusions?|concluding|summary and|outlook)\b"),
+    ("abstract", r"\b(abstract|summary)\b"),
+    ("introduction", r"\bintroduction\b"),
+    ("background", r"\b(background|related work|literature review|state of the art)\b"),
+    ("methods", r"\b(methods?|methodology|materials|data and|study area|experimental)\b"),
+    ("results", r"\b(results?|findings)\b"),
+    ("discussion", r"\bdiscussion\b"),
+)
+_SECTION_LABEL_RES = [(label, re.compile(pattern)) for label, pattern in SECTION_LABELS]
+# Sections that rarely answer a research question but add many chunks.
+LOW_VALUE_SECTIONS = ("acknowledgements", "references", "funding", "contributions", "competing_interests", "data_availability")
+
+
+def section_label(title: str | None) -> str:
+    """Map a section heading like "2.1 Materials and Methods" to a canonical label."""
+    if not title:
+        return "other"
+    title = title.lower()
+    for label, pattern in _SECTION_LABEL_RES:
+        if pattern.search(title):
+            return label
+    return "other"
+
+
+def _element_text(element) -> str:
+    strings = (_normalize_string(value) for value in element.itertext())
+    return "\n".join(value for value in strings if value is not None)
+
+
+def extract_tei_divisions(source: Union[str, bytes, IO[bytes]]) -> list[dict]:
+    """
+    Stream a TEI document and return its abstract and body divisions in document order as
+    {"title", "label", "text"} dicts (text cleaned with `clean_text`). Every `div` of the body
+    becomes its own section with its `head` as title; body-level figures and tables become
+    "figure" sections. Each division is dropped from the tree once it has been read.
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    sections: list[tuple[int, str | None, str, str]] = []
+    order: dict = {}
+    positions = itertools.count()
+    region = None
+    seen = set()
+
+    def add(element, title, label, text):
+        text = clean_text(text)
+        position = order.pop(element, 0)
+        if text:
+            sections.append((position, title, label, text))
+
+    context = etree.iterparse(source, events=("start", "end"), recover=True, huge_tree=True)
+    for event, element in context:
+        name = _localname(element.tag)
+        if event == "start":
+            if region is None and name in TEI_SECTIONS and name not in seen:
+                region = element
+                seen.add(name)
+            if region is not None and (name == "div" or element is region or element.getparent() is region):
+                order[element] = next(positions)
+            continue
+
+        if region is None:
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+            continue
+
+        if element is region:
+            if name == "abstract":
+                add(element, "Abstract", "abstract", _element_text(element))
+            else:
+                # Whatever is left directly under <body>: figures/tables and stray paragraphs.
+                stray = []
+                for child in element:
+                    if _localname(child.tag) == "figure":
+                        head = child.find("{*}head")
+                        title = " ".join(_element_text(head).split()) if head is not None else None
+                        add(child, title or None, "figure", _element_text(child))
+                    else:
+                        stray.append(child)
+                if stray:
+                    add(stray[0], None, "other", "\n".join(_element_text(child) for child in stray))
+            element.clear(keep_tail=True)
+            order.clear()
+            region = None
+            continue
+
+        if _localname(region.tag) == "body" and name == "div":
+            head = None
+            parts = []
+            for child in element:
+                if head is None and _localname(child.tag) == "head":
+                    head = child
+                else:
+                    parts.append(_element_text(child))
+            title = " ".join(_element_text(head).split()) if head is not None else None
+            add(element, title or None, section_label(title), "\n".join(parts))
+            # Nested divs are emitted on their own and must not be repeated by their parent.
+            element.getparent().remove(element)
+
+    del context
+    sections.sort(key=lambda section: section[0])
+    return [{"title": title, "label": label, "text": text} for _, title, label, text in sections]
+
+
+def _inline_fix(match: re.Match) -> str:
+    if match.group("label"):
+        return f"{match.group('label')} {match.group('number')}"
+    if match.group("caption"):
+        return match.group("repeat")
+    return ")."
+
+
+def clean_text(text: str) -> str:
+    """Fix GROBID line-break artefacts and normalize whitespace in two passes."""
+    text = _INLINE_FIXES_RE.sub(_inline_fix, text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
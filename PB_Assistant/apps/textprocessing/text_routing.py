@@ -0,0 +1,82 @@
+from __future__ import annotations
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+
+from django.conf import settings
+
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import PdfTextExtractor
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTRACTION_MODES = ("grobid", "auto")
+
+
+class RouteCounter:
+    """Thread-safe tally of routing decisions ("local", "grobid:<reason>"), shared by all extractors of a run."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, route: str):
+        with self._lock:
+            self._counts[route] += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            counts = dict(self._counts)
+        local = counts.pop("local", 0)
+        grobid = sum(counts.values())
+        reasons = ", ".join(f"{route.split(':', 1)[1]} {n}" for route, n in sorted(counts.items()))
+        return f"local {local}, GROBID {grobid}" + (f" ({reasons})" if reasons else "")
+
+
+class RoutingTextExtractor:
+    """
+    Same interface as PdfTextExtractor. Headers always come from GROBID; the fulltext comes
+    from the PDF's own text layer when it passes the quality checks in
+    `local_text_extractor.assess_text_layer`, and from GROBID otherwise (scans, broken
+    encodings, files pdfium cannot open). Locally extracted texts have no TEI sections.
+    """
+
+    def __init__(self, grobid: Optional[PdfTextExtractor] = None, local=None, routes: Optional[RouteCounter] = None,
+                 consolidation: Optional[str] = None):
+        # pypdfium2 is only needed when routing is enabled.
+        from PB_Assistant.apps.textprocessing.local_text_extractor import LocalTextExtractor
+        self.grobid = grobid or PdfTextExtractor(consolidation=consolidation)
+        self.local = local or LocalTextExtractor(max_pages=getattr(settings, "PDF_MAX_PAGES", None))
+        self.routes = routes or RouteCounter()
+
+    @property
+    def breaker(self):
+        return self.grobid.breaker
+
+    def process_header(self, pdf_path: str) -> str:
+        return self.grobid.process_header(pdf_path)
+
+    def extract_fulltext(self, pdf_path: str = None, filename: str = None) -> str:
+        return self.extract_fulltext_document(pdf_path=pdf_path, filename=filename)[0]
+
+    def extract_fulltext_document(self, pdf_path: str = None, filename: str = None) -> tuple[str, Optional[list]]:
+        if pdf_path:
+            text, sections, quality = self.local.extract_fulltext_document(pdf_path)
+            if text:
+                self.routes.add("local")
+                return text, sections
+            reason = quality.reason if not quality.usable else "empty"
+            logger.debug(f"{pdf_path}: text layer not usable ({reason}), using GROBID")
+            self.routes.add(f"grobid:{reason}")
+        return self.grobid.extract_fulltext_document(pdf_path=pdf_path, filename=filename)
+
+
+def make_text_extractor(mode: Optional[str] = None, routes: Optional[RouteCounter] = None,
+                        consolidation: Optional[str] = None):
+    """The fulltext extractor for `mode` (default: settings.PDF_TEXT_EXTRACTION) and GROBID `consolidation`."""
+    mode = mode or getattr(settings, "PDF_TEXT_EXTRACTION", "grobid")
+    if mode not in TEXT_EXTRACTION_MODES:
+        raise ValueError(f"Unknown text extraction mode '{mode}', expected one of {TEXT_EXTRACTION_MODES}")
+    if mode == "grobid":
+        return PdfTextExtractor(consolidation=consolidation)
+    return RoutingTextExtractor(routes=routes, consolidation=consolidation)
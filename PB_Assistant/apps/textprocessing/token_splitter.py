@@ -0,0 +1,134 @@
+from __future__ import annotations
+import logging
+import re
+import statistics
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cleaned text has no line breaks left, so sentences are the natural packing unit.
+SENTENCE_RE = re.compile(r'\S.*?(?:[.!?](?=\s|$)|$)', re.DOTALL)
+
+
+class TokenTextSplitter:
+    """
+    Split text into chunks of at most `chunk_size` tokens of the embedding model's own
+    tokenizer, with about `chunk_overlap` tokens shared between neighbouring chunks.
+
+    Sentences are packed greedily; all sentences of a call are tokenized in one batch by the
+    (fast) tokenizer. A sentence longer than the budget is cut on token offsets. Chunks are
+    slices of the original text, so nothing is re-joined or re-spaced. With BPE/SentencePiece
+    tokenizers a chunk may tokenize a token or two longer than its sentences did separately.
+    """
+
+    def __init__(self, tokenizer, chunk_size: int, chunk_overlap: int = 0):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._sizes: Optional[Dict[str, int]] = None
+
+    @contextmanager
+    def recording_sizes(self) -> Iterator[Dict[str, int]]:
+        """Within the block, record the token count (without special tokens) of every chunk produced."""
+        self._sizes = sizes = {}
+        try:
+            yield sizes
+        finally:
+            self._sizes = None
+
+    def _emit(self, chunks: List[str], chunk: str, tokens: int):
+        if chunk:
+            chunks.append(chunk)
+            if self._sizes is not None:
+                self._sizes[chunk] = tokens
+
+    def split_text(self, text: str) -> List[str]:
+        return self.split_texts([text])[0]
+
+    def split_texts(self, texts: Sequence[str]) -> List[List[str]]:
+        spans = [[m.span() for m in SENTENCE_RE.finditer(text)] for text in texts]
+        sentences = [text[start:end] for text, doc_spans in zip(texts, spans) for start, end in doc_spans]
+        if not sentences:
+            return [[] for _ in texts]
+        encoded = self.tokenizer(
+            sentences, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )
+        offsets = iter(encoded["offset_mapping"])
+        return [self._pack(text, [(start, end, next(offsets)) for start, end in doc_spans])
+                for text, doc_spans in zip(texts, spans)]
+
+    def _pack(self, text: str, sentences: List[Tuple[int, int, list]]) -> List[str]:
+        chunks: List[str] = []
+        i, n = 0, len(sentences)
+        while i < n:
+            start, _, offsets = sentences[i]
+            if len(offsets) > self.chunk_size:
+                chunks.extend(self._cut(text, start, offsets))
+                i += 1
+                continue
+            j, total = i, 0
+            while j < n and len(sentences[j][2]) <= self.chunk_size and total + len(sentences[j][2]) <= self.chunk_size:
+                total += len(sentences[j][2])
+                j += 1
+            self._emit(chunks, text[start:sentences[j - 1][1]].strip(), total)
+            if j >= n:
+                break
+            # Step back over trailing sentences that fit in the overlap (and still leave room for the
+            # next sentence, so no chunk is overlap only), but always move forward.
+            k, overlap, following = j, 0, len(sentences[j][2])
+            while (k - 1 > i and overlap + len(sentences[k - 1][2]) <= self.chunk_overlap
+                   and overlap + len(sentences[k - 1][2]) + following <= self.chunk_size):
+                overlap += len(sentences[k - 1][2])
+                k -= 1
+            i = k
+        return chunks
+
+    def _cut(self, text: str, base: int, offsets: list) -> List[str]:
+        """Token windows over one over-long sentence; offsets are relative to the sentence."""
+        step = self.chunk_size - self.chunk_overlap
+        pieces = []
+        for first in range(0, len(offsets), step):
+            window = offsets[first:first + self.chunk_size]
+            self._emit(pieces, text[base + window[0][0]:base + window[-1][1]].strip(), len(window))
+            if first + self.chunk_size >= len(offsets):
+                break
+        return pieces
+
+
+def token_budget(model) -> int:
+    """Largest chunk (in tokens, without special tokens) the model encodes without truncation."""
+    return model.max_seq_length - model.tokenizer.num_special_tokens_to_add(pair=False)
+
+
+def log_chunk_stats(model, chunks_by_document: dict, level: int = logging.INFO,
+                    token_counts: Optional[Dict[str, int]] = None):
+    """
+    Log per document how many chunks it has, their token-size distribution and how many are
+    truncated by the model (tokens beyond `max_seq_length` never reach the vector).
+
+    `token_counts` are the sizes recorded by TokenTextSplitter.recording_sizes; only chunks
+    missing from it (e.g. from a character splitter) are tokenized here.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    documents = [(key, chunks) for key, chunks in chunks_by_document.items() if chunks]
+    if not documents:
+        return
+    special = model.tokenizer.num_special_tokens_to_add(pair=False)
+    counts = {chunk: size + special for chunk, size in (token_counts or {}).items()}
+    unknown = list({chunk for _, chunks in documents for chunk in chunks if chunk not in counts})
+    if unknown:
+        input_ids = model.tokenizer(unknown, add_special_tokens=True, verbose=False)["input_ids"]
+        counts.update(zip(unknown, map(len, input_ids)))
+    limit = model.max_seq_length
+    for key, chunks in documents:
+        sizes = [counts[chunk] for chunk in chunks]
+        truncated = [size - limit for size in sizes if size > limit]
+        logger.log(
+            level,
+            f"{key}: {len(sizes)} chunks, tokens min/median/max {min(sizes)}/{int(statistics.median(sizes))}/{max(sizes)} "
+            f"(limit {limit}), {len(truncated)} truncated, {sum(truncated)} tokens lost"
+        )
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from PB_Assistant.models import IngestJob, UploadedDocument
+
+logger = logging.getLogger(__name__)
+
+# ?sort= keys of the Knowledge Library listing; date, name and size are served by (user_id, ...) indexes.
+SORT_FIELDS = {
+    "-modified": ("-modified_at", "-id"),
+    "modified": ("modified_at", "id"),
+    "name": ("name",),
+    "-name": ("-name",),
+    "-size": ("-size", "-id"),
+    "size": ("size", "id"),
+    "status": ("job__status", "-modified_at"),
+}
+DEFAULT_SORT = "-modified"
+
+
+def user_upload_dir(user_id: int) -> str:
+    return os.path.join(settings.UPLOAD_DIR, str(user_id))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _mtime(stat: os.stat_result) -> datetime:
+    return datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+
+
+def record_upload(user_id: int, file_path: str, name: str, sha256: str,
+                  job: Optional[IngestJob] = None) -> UploadedDocument:
+    """Add or update the index row of a file just written to the user's upload folder."""
+    stat = os.stat(file_path)
+    document, _ = UploadedDocument.objects.update_or_create(
+        user_id=user_id,
+        name=name,
+        defaults={
+            "file_path": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "sha256": sha256,
+            "modified_at": _mtime(stat),
+            "job": job,
+            "academicpaper": None,
+        },
+    )
+    return document
+
+
+def link_paper(job: IngestJob, paper):
+    """A finished ingest job's paper becomes the linked paper of its uploaded document."""
+    if paper is not None:
+        UploadedDocument.objects.filter(job=job).update(academicpaper=paper)
+
+
+def forget_upload(user_id: int, name: str):
+    UploadedDocument.objects.filter(user_id=user_id, name=name).delete()
+
+
+def list_uploads(user_id: int, sort: str = DEFAULT_SORT):
+    """The user's documents with their latest job, in the order of a SORT_FIELDS key."""
+    return (
+        UploadedDocument.objects.filter(user_id=user_id)
+        .select_related("job")
+        .order_by(*SORT_FIELDS.get(sort, SORT_FIELDS[DEFAULT_SORT]))
+    )
+
+
+def reconcile(user_ids: Optional[Iterable[int]] = None, rehash: bool = False, dry_run: bool = False) -> dict:
+    """
+    Sync UploadedDocument with the upload folders (UPLOAD_DIR/<user_id>/): add files the table
+    does not know, update rows whose size or mtime changed (rehashing them) and delete rows whose
+    file is gone. Unchanged files are only stat'ed, unless `rehash`. Returns counts per action.
+    """
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    root = settings.UPLOAD_DIR
+    if user_ids is None:
+        user_ids = set(UploadedDocument.objects.values_list("user_id", flat=True).distinct())
+        if os.path.isdir(root):
+            user_ids |= {int(entry.name) for entry in os.scandir(root) if entry.is_dir() and entry.name.isdigit()}
+
+    for user_id in sorted(user_ids):
+        folder = user_upload_dir(user_id)
+        on_disk = {}
+        if os.path.isdir(folder):
+            on_disk = {entry.name: entry for entry in os.scandir(folder) if entry.is_file()}
+        known = {doc.name: doc for doc in UploadedDocument.objects.filter(user_id=user_id)}
+        # Latest job per file, to link files that were uploaded before the table existed
+        latest_jobs = {}
+        for job in IngestJob.objects.filter(user_id=user_id).order_by("-created_at"):
+            latest_jobs.setdefault(job.file_path, job)
+
+        for name, entry in on_disk.items():
+            stat = entry.stat()
+            doc = known.get(name)
+            sha256 = None
+            if doc is not None and doc.size == stat.st_size and doc.modified_at == _mtime(stat):
+                if rehash:
+                    sha256 = file_sha256(entry.path)
+                if sha256 is None or sha256 == doc.sha256:
+                    counts["unchanged"] += 1
+                    continue
+            counts["added" if doc is None else "updated"] += 1
+            if dry_run:
+                continue
+            path = os.path.abspath(entry.path)
+            if doc is None:
+                job = latest_jobs.get(path)
+                doc = UploadedDocument(
+                    user_id=user_id, name=name, job=job,
+                    academicpaper_id=job.academicpaper_id if job is not None else None,
+                )
+            doc.file_path = path
+            doc.size = stat.st_size
+            doc.modified_at = _mtime(stat)
+            doc.sha256 = sha256 or file_sha256(entry.path)
+            doc.save()
+
+        gone = [doc.pk for name, doc in known.items() if name not in on_disk]
+        counts["removed"] += len(gone)
+        if gone and not dry_run:
+            UploadedDocument.objects.filter(pk__in=gone).delete()
+        logger.info(f"User {user_id}: {len(on_disk)} files, {len(known)} indexed, {len(gone)} gone")
+    return counts
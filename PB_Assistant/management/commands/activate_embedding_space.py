@@ -0,0 +1,31 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedding_spaces import activate_space
+
+
+class Command(BaseCommand):
+    help = "Switch search to another (ready) embedding space, e.g. to roll back. Without a name, list spaces."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", default=None, help="Slug of the embedding space to activate")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        if not name:
+            for space in EmbeddingSpace.objects.order_by("created_at"):
+                marker = "*" if space.is_active else " "
+                count = space.embeddings.count()
+                self.stdout.write(f"{marker} {space.name:<32} {space.model_name:<40} {space.dimensions:>5}d "
+                                  f"{space.status:<9} {count} chunks")
+            return
+
+        space = EmbeddingSpace.objects.filter(name=name).first()
+        if space is None:
+            raise CommandError(f"Embedding space not found: {name}")
+        try:
+            activate_space(space)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Search now uses embedding space '{space.name}'."))
@@ -0,0 +1,213 @@
+from __future__ import annotations
+import io
+import logging
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from PB_Assistant.models import (
+    AcademicPaper, AcademicPaperText, AcademicPaperTextEmbedding, AcademicPaperVector, EmbeddingCache,
+    PdfIngestManifest,
+)
+from PB_Assistant.apps.textprocessing import pdf_ingest, tei_text
+from PB_Assistant.apps.textprocessing.grobid.stub_server import (
+    STUB_DOI_PREFIX, start_stub_process, synthetic_pdf, synthetic_tei,
+)
+from PB_Assistant.apps.textprocessing.ingest_manifest import IngestManifest
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import PdfTextExtractor
+from PB_Assistant.apps.textprocessing.tei_cache import read_tei
+from PB_Assistant.apps.textprocessing.text_routing import TEXT_EXTRACTION_MODES
+
+COUNTED_MODELS = (AcademicPaper, AcademicPaperText, AcademicPaperTextEmbedding, PdfIngestManifest, EmbeddingCache)
+
+
+class StageTimer:
+    """Wall time per pipeline stage, summed over all worker threads."""
+
+    def __init__(self):
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def wrap(self, stack: ExitStack, owner, name: str, stage):
+        """Patch `owner.name` for the lifetime of `stack`; `stage` is a label or a function of the call's args."""
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage(*args, **kwargs) if callable(stage) else stage, time.perf_counter() - start)
+
+        stack.enter_context(mock.patch.object(owner, name, timed))
+
+
+class _ProgressFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not str(record.msg).startswith("[%d/%d]")
+
+
+def _load_fixtures(path: str | None, count: int) -> list[str]:
+    if not path:
+        return [synthetic_tei(i) for i in range(min(count, 50))]
+    root = Path(path)
+    files = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.name.endswith((".tei.xml", ".tei.xml.gz")))
+    fixtures = [read_tei(p) if p.suffix == ".gz" else p.read_text(encoding="utf-8") for p in files]
+    return [tei_xml for tei_xml in fixtures if tei_xml]
+
+
+def remove_benchmark_rows(run_id: str, folder: Path, started_at) -> int:
+    """
+    Delete the papers of one benchmark run, their manifest entries and the chunk/abstract vectors
+    this run added to the embedding cache. Cache rows of other imports, and rows that existed
+    before the run, are kept. Returns the number of deleted rows.
+    """
+    papers = AcademicPaper.objects.filter(doi__startswith=f"{STUB_DOI_PREFIX}.{run_id}.")
+    hashes = set(
+        AcademicPaperTextEmbedding.objects.filter(academicpaper_text__academicpaper__in=papers)
+        .values_list("content_hash", flat=True)
+    )
+    hashes |= set(AcademicPaperVector.objects.filter(academicpaper__in=papers).values_list("content_hash", flat=True))
+    hashes -= {None, ""}
+    deleted, _ = papers.delete()
+    PdfIngestManifest.objects.filter(path__startswith=str(folder)).delete()
+    # Identical text imported for real after the benchmark started shares these hashes; the
+    # cache only saves encoding time, so such a row is simply encoded again.
+    hash_list = sorted(hashes)
+    for start in range(0, len(hash_list), 1000):
+        EmbeddingCache.objects.filter(
+            content_hash__in=hash_list[start:start + 1000], created_at__gte=started_at
+        ).delete()
+    return deleted
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark import_pdfs end to end against a local stub GROBID server that replays recorded "
+        "(or synthetic) TEI with configurable latency and failures, on a synthetic PDF corpus. Reports "
+        "docs/sec, time per stage, peak RSS and rows written; the benchmark's papers are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=200, help="Number of synthetic PDFs")
+        parser.add_argument("--tei", default=None,
+                            help="TEI file or directory (*.tei.xml, *.tei.xml.gz, e.g. the TEI cache) to replay; "
+                                 "defaults to generated TEI")
+        parser.add_argument("--scanned-share", type=float, default=0.2,
+                            help="Share of PDFs without a text layer (matters for --text-extraction auto)")
+        parser.add_argument("--latency", type=float, default=0.5, help="Stub response time in seconds")
+        parser.add_argument("--jitter", type=float, default=0.2, help="Random +/- seconds added to --latency")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+        parser.add_argument("--overload-rate", type=float, default=0.0, help="Share of requests answered with 503")
+        parser.add_argument("--stub-concurrency", type=int, default=8,
+                            help="The stub answers 503 beyond this many parallel requests, like GROBID's pool")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--text-extraction", choices=TEXT_EXTRACTION_MODES, default="grobid")
+        parser.add_argument("--no-embed", action="store_true", help="Leave out the embedding stage")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="Keep the imported papers and the PDF folder")
+
+    def handle(self, *args, **options):
+        docs: int = options["docs"]
+        no_embed: bool = options["no_embed"]
+        fixtures = _load_fixtures(options["tei"], docs)
+        if not fixtures:
+            raise CommandError(f"No TEI files found in {options['tei']}")
+        run_id = uuid.uuid4().hex[:8]
+        rng = random.Random(options["seed"])
+
+        folder = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+        for i in range(docs):
+            # The text layer is the fixture's own fulltext, so local extraction and GROBID agree.
+            text = None
+            if rng.random() >= options["scanned_share"]:
+                text = tei_text.clean_text(tei_text.extract_tei_fulltext(fixtures[i % len(fixtures)]))
+            (folder / f"bench_{i:05d}.pdf").write_bytes(synthetic_pdf(i, text))
+        self.stdout.write(f"{docs} synthetic PDFs in {folder}, {len(fixtures)} TEI fixtures, run {run_id}")
+
+        process, url = start_stub_process(
+            fixtures, run_id=run_id, latency=options["latency"], jitter=options["jitter"],
+            error_rate=options["error_rate"], overload_rate=options["overload_rate"],
+            max_concurrency=options["stub_concurrency"], seed=options["seed"],
+        )
+        before = {model: model.objects.count() for model in COUNTED_MODELS}
+        started_at = timezone.now()
+        rss_before = _peak_rss_mb()
+        timer = StageTimer()
+        # Per-file progress lines of import_pdfs only with -v 2
+        import_logger = logging.getLogger("PB_Assistant.management.commands.import_pdfs")
+        progress_filter = _ProgressFilter()
+        if options["verbosity"] < 2:
+            import_logger.addFilter(progress_filter)
+        output = io.StringIO()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(GROBID_URL=url, TEI_CACHE_DIR=""))
+                timer.wrap(stack, PdfTextExtractor, "_post", lambda extractor, service, *a, **kw: f"GROBID {service}")
+                timer.wrap(stack, pdf_ingest, "parse_tei_header", "TEI header parse")
+                timer.wrap(stack, tei_text, "extract_tei_fulltext", "TEI fulltext parse")
+                timer.wrap(stack, tei_text, "extract_tei_divisions", "TEI sections parse")
+                if options["text_extraction"] == "auto":
+                    from PB_Assistant.apps.textprocessing.local_text_extractor import LocalTextExtractor
+                    timer.wrap(stack, LocalTextExtractor, "extract_fulltext_document", "local text layer")
+                timer.wrap(stack, pdf_ingest.PdfIngestService, "_find_existing", "duplicate lookup")
+                timer.wrap(stack, pdf_ingest, "import_academic_paper", "paper insert")
+                timer.wrap(stack, IngestManifest, "check", "manifest")
+                timer.wrap(stack, IngestManifest, "record", "manifest")
+                if not no_embed:
+                    from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+                    timer.wrap(stack, TextEmbedder, "embed_academic_papers", "embedding")
+                start = time.perf_counter()
+                call_command(
+                    "import_pdfs", folder=str(folder), workers=options["workers"], no_embed=no_embed,
+                    text_extraction=options["text_extraction"], stdout=output,
+                )
+                elapsed = time.perf_counter() - start
+
+            self.stdout.write(output.getvalue().strip())
+            self.stdout.write(f"{docs} PDFs in {elapsed:.1f}s: {docs / elapsed:.2f} docs/s with {options['workers']} workers")
+            self.stdout.write("Stage time, summed over workers:")
+            for stage, seconds in sorted(timer.seconds.items(), key=lambda item: -item[1]):
+                calls = timer.calls[stage]
+                self.stdout.write(f"  {stage:<32} {seconds:8.1f}s  {calls:6d} calls  {1000 * seconds / calls:8.1f} ms/call")
+            self.stdout.write(f"Peak RSS: {_peak_rss_mb():.0f} MB (before the import: {rss_before:.0f} MB)")
+            self.stdout.write("Rows written:")
+            for model in COUNTED_MODELS:
+                self.stdout.write(f"  {model.__name__:<32} {model.objects.count() - before[model]:+d}")
+        finally:
+            import_logger.removeFilter(progress_filter)
+            process.terminate()
+            process.join()
+            # Also after a failed import, so a broken run leaves no benchmark papers in the library.
+            if not options["keep"]:
+                papers = remove_benchmark_rows(run_id, folder, started_at)
+                shutil.rmtree(folder, ignore_errors=True)
+
+        if options["keep"]:
+            self.stdout.write(self.style.SUCCESS(f"Done. Kept papers with DOI prefix {STUB_DOI_PREFIX}.{run_id}. and {folder}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Done. Removed the benchmark's papers and files ({papers} rows)"))
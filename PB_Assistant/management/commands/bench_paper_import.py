@@ -0,0 +1,79 @@
+from __future__ import annotations
+import random
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from PB_Assistant.data_models import AcademicPaperData, AcademicAuthorData
+from PB_Assistant.models import AcademicPaper, PlanetaryBoundary
+from PB_Assistant.apps.textprocessing.importer import import_academic_papers, import_academic_paper
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_papers(count: int, duplicate_ratio: float, seed: int) -> list[AcademicPaperData]:
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    papers = []
+    for i in range(count):
+        # A share of records repeats an earlier DOI (with different casing/prefix) to exercise dedup.
+        n = rng.randrange(i) if i and rng.random() < duplicate_ratio else i
+        papers.append(AcademicPaperData(
+            doi=(f"https://doi.org/10.9999/BENCH.{run}.{n}" if n != i else f"10.9999/bench.{run}.{n}"),
+            title=f"Synthetic benchmark paper {run} number {n}",
+            publication_year=2000 + n % 25,
+            author_list=[AcademicAuthorData(name=f"Author {n % 997}")],
+        ))
+    return papers
+
+
+class Command(BaseCommand):
+    help = "Measure paper import throughput (set-based batches vs. per-record) on synthetic records; rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000, help="Number of synthetic records")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+        parser.add_argument("--legacy-sample", type=int, default=2000,
+                            help="Records to run through the per-record path for comparison (0 to skip)")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        boundary = PlanetaryBoundary.objects.first()
+        papers = synthetic_papers(count, options["duplicate_ratio"], options["seed"])
+
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                stats = import_academic_papers(papers, boundary, batch_size=options["batch_size"])
+                elapsed = time.perf_counter() - start
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(
+            f"Batch import of {count} records (batch size {options['batch_size']}): {elapsed:.2f}s, "
+            f"{count / elapsed:,.0f} records/s -> {stats}"
+        )
+
+        sample = min(options["legacy_sample"], count)
+        if sample:
+            legacy = synthetic_papers(sample, options["duplicate_ratio"], options["seed"])
+            try:
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    for paper in legacy:
+                        import_academic_paper(paper, boundary)
+                    legacy_elapsed = time.perf_counter() - start
+                    raise _Rollback()
+            except _Rollback:
+                pass
+            self.stdout.write(
+                f"Per-record import of {sample} records: {legacy_elapsed:.2f}s, "
+                f"{sample / legacy_elapsed:,.0f} records/s (extrapolated {count} records: "
+                f"{legacy_elapsed * count / sample:.0f}s)"
+            )
+        self.stdout.write(f"Papers in database (unchanged): {AcademicPaper.objects.count()}")
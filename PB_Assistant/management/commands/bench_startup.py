@@ -0,0 +1,84 @@
+from __future__ import annotations
+import json
+import os
+import re
+import subprocess
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+# Packages that must only load on first use (search, embedding), never at process start.
+HEAVY_PACKAGES = ("torch", "sentence_transformers", "transformers", "langchain_classic", "langchain_community",
+                  "langchain_core", "onnxruntime", "openvino", "pypdfium2")
+DEFAULT_MODULES = ("PB_Assistant.urls",)
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+# Runs in a fresh interpreter: set up Django, import the targets, report RSS and what got loaded.
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "heavy": heavy}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self us, cumulative us) for top-level imports of a `python -X importtime` run."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3))))
+    return [(name, own, cumulative) for name, own, cumulative, depth in modules if depth <= 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure process startup: import time (python -X importtime) and RSS of a fresh interpreter that "
+        "sets up Django and imports the web modules. Fails if ML/LangChain packages are loaded at import "
+        "time or a --max-seconds / --max-rss-mb budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", action="append", default=None,
+                            help=f"Module to import (repeatable; default: {', '.join(DEFAULT_MODULES)})")
+        parser.add_argument("--top", type=int, default=15, help="Show the N slowest top-level imports")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs; the fastest one is reported")
+        parser.add_argument("--max-seconds", type=float, default=None, help="Fail if startup takes longer")
+        parser.add_argument("--max-rss-mb", type=float, default=None, help="Fail if startup RSS is higher")
+
+    def handle(self, *args, **options):
+        modules = tuple(options["module"] or DEFAULT_MODULES)
+        code = CHILD.format(modules=modules, heavy=HEAVY_PACKAGES)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "PB_Assistant.settings"))
+
+        best = None
+        for _ in range(max(1, options["repeat"])):
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env)
+            if proc.returncode != 0:
+                raise CommandError(f"Import failed:\n{proc.stderr[-2000:]}")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            if best is None or result["seconds"] < best[0]["seconds"]:
+                best = (result, proc.stderr)
+        result, stderr = best
+
+        self.stdout.write(f"Slowest top-level imports ({', '.join(modules)}):")
+        for name, own, cumulative in sorted(parse_importtime(stderr), key=lambda m: -m[2])[:options["top"]]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+        rss_mb = result["maxrss_kb"] / 1024
+        self.stdout.write(f"Startup: {result['seconds']:.2f}s, RSS {rss_mb:.0f} MB")
+
+        problems = []
+        if result["heavy"]:
+            problems.append(f"heavy packages imported at startup: {', '.join(result['heavy'])}")
+        if options["max_seconds"] is not None and result["seconds"] > options["max_seconds"]:
+            problems.append(f"startup {result['seconds']:.2f}s exceeds {options['max_seconds']}s")
+        if options["max_rss_mb"] is not None and rss_mb > options["max_rss_mb"]:
+            problems.append(f"RSS {rss_mb:.0f} MB exceeds {options['max_rss_mb']} MB")
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Done. No heavy packages loaded at startup"))
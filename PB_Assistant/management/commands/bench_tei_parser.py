@@ -0,0 +1,100 @@
+from __future__ import annotations
+import time
+import tracemalloc
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import PdfTextExtractor
+from PB_Assistant.apps.textprocessing.tei_cache import read_tei
+
+
+def _load(path: Path) -> str | None:
+    if path.suffix == ".gz":
+        return read_tei(path)
+    return path.read_text(encoding="utf-8")
+
+
+def _measure(func, tei_xml: str, repeat: int, memory: bool):
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        func(tei_xml)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(tei_xml)
+    return result, (time.perf_counter() - start) / repeat, peak
+
+
+def streaming(tei_xml: str) -> str:
+    return PdfTextExtractor.clean_text(PdfTextExtractor.parse_tei_fulltext(tei_xml))
+
+
+def legacy(tei_xml: str) -> str:
+    return PdfTextExtractor.clean_text_multipass(PdfTextExtractor.parse_tei_fulltext_soup(tei_xml))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the streaming lxml TEI parser + single-pass cleaner against the BeautifulSoup "
+        "implementation on TEI files (speed, peak memory) and verify the output is identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.TEI_CACHE_DIR,
+                            help="TEI file or directory (*.tei.xml, *.tei.xml.gz); defaults to the TEI cache")
+        parser.add_argument("--max-files", type=int, default=None, help="Use only the largest N files")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per file and implementation")
+        parser.add_argument("--memory", action="store_true", help="Also report peak Python memory (slower)")
+
+    def handle(self, *args, **options):
+        root = Path(options["path"])
+        repeat = max(1, options["repeat"])
+        memory: bool = options["memory"]
+        if root.is_file():
+            paths = [root]
+        elif root.is_dir():
+            paths = [p for p in root.rglob("*") if p.name.endswith((".tei.xml", ".tei.xml.gz"))]
+        else:
+            raise CommandError(f"Path not found: {root}")
+        paths.sort(key=lambda p: p.stat().st_size, reverse=True)
+        if options["max_files"] is not None:
+            paths = paths[:options["max_files"]]
+        if not paths:
+            raise CommandError(f"No TEI files found in {root}")
+
+        total_bytes = legacy_time = streaming_time = 0.0
+        legacy_peak = streaming_peak = 0
+        mismatches = []
+        for path in paths:
+            tei_xml = _load(path)
+            if tei_xml is None:
+                continue
+            expected, l_time, l_peak = _measure(legacy, tei_xml, repeat, memory)
+            actual, s_time, s_peak = _measure(streaming, tei_xml, repeat, memory)
+            total_bytes += len(tei_xml)
+            legacy_time += l_time
+            streaming_time += s_time
+            legacy_peak = max(legacy_peak, l_peak)
+            streaming_peak = max(streaming_peak, s_peak)
+            if actual != expected:
+                mismatches.append(path)
+
+        mb = total_bytes / 1e6
+        self.stdout.write(f"{len(paths)} TEI files, {mb:.1f} MB")
+        self.stdout.write(f"  BeautifulSoup + multi-pass: {legacy_time:8.2f}s ({mb / legacy_time:6.1f} MB/s)")
+        self.stdout.write(
+            f"  lxml iterparse + one-pass : {streaming_time:8.2f}s ({mb / streaming_time:6.1f} MB/s, "
+            f"{legacy_time / streaming_time:.1f}x)"
+        )
+        if memory:
+            self.stdout.write(
+                f"  peak memory: {legacy_peak / 1e6:.1f} MB -> {streaming_peak / 1e6:.1f} MB (largest file)"
+            )
+        if mismatches:
+            for path in mismatches[:20]:
+                self.stdout.write(self.style.ERROR(f"  output differs: {path}"))
+            raise CommandError(f"{len(mismatches)} file(s) produced different text")
+        self.stdout.write(self.style.SUCCESS("Done. Output identical on all files."))
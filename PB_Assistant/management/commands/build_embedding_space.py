@@ -0,0 +1,96 @@
+from __future__ import annotations
+import sys
+import logging
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+from PB_Assistant.apps.textprocessing.embedding_spaces import create_space_index, activate_space
+from PB_Assistant.apps.textprocessing.tei_text import LOW_VALUE_SECTIONS
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build (or resume building) a named embedding space next to the active one, index it, "
+        "and optionally switch search to it once complete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", required=True, help="Slug of the embedding space")
+        parser.add_argument("--model", default=None, help="SentenceTransformer model name (required for a new space)")
+        parser.add_argument("--chunk-unit", choices=[u for u, _ in EmbeddingSpace.CHUNK_UNIT_CHOICES],
+                            default=EmbeddingSpace.CHUNK_UNIT_CHARS,
+                            help="'tokens' measures chunks with the model's tokenizer")
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="Default: 800 characters, or the model's full token budget")
+        parser.add_argument("--chunk-overlap", type=int, default=None, help="Default: 100 characters or 50 tokens")
+        parser.add_argument("--chunker", choices=[c for c, _ in EmbeddingSpace.CHUNKER_CHOICES],
+                            default=EmbeddingSpace.CHUNKER_RECURSIVE,
+                            help="'sections' splits each TEI section separately and stores its label on every chunk")
+        parser.add_argument("--skip-low-value-sections", action="store_true",
+                            help=f"With --chunker sections, leave out {', '.join(LOW_VALUE_SECTIONS)}")
+        parser.add_argument("--embed-batch", type=int, default=32, help="Number of papers whose chunks are embedded together")
+        parser.add_argument("--embed-window", type=int, default=None,
+                            help="Embed texts longer than this many chunks window by window (default: EMBEDDING_STREAM_WINDOW, 0 disables)")
+        parser.add_argument("--activate", action="store_true", help="Switch search to this space when the build completes")
+
+    def handle(self, *args, **options):
+        name: str = options["name"]
+        embed_batch: int = max(1, options["embed_batch"])
+
+        space = EmbeddingSpace.objects.filter(name=name).first()
+        if space is None:
+            if not options["model"]:
+                raise CommandError("--model is required to create a new embedding space")
+            # Dimension is checked against the model by TextEmbedder; probe it once here.
+            from sentence_transformers import SentenceTransformer
+            from PB_Assistant.apps.textprocessing.token_splitter import token_budget
+            model = SentenceTransformer(options["model"], trust_remote_code=True)
+            dimensions = model.get_sentence_embedding_dimension()
+            if options["chunk_unit"] == EmbeddingSpace.CHUNK_UNIT_TOKENS:
+                chunk_size = options["chunk_size"] or token_budget(model)
+                chunk_overlap = 50 if options["chunk_overlap"] is None else options["chunk_overlap"]
+            else:
+                chunk_size = options["chunk_size"] or 800
+                chunk_overlap = 100 if options["chunk_overlap"] is None else options["chunk_overlap"]
+            space = EmbeddingSpace.objects.create(
+                name=name,
+                model_name=options["model"],
+                dimensions=dimensions,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                chunk_unit=options["chunk_unit"],
+                chunker=options["chunker"],
+                skip_sections=list(LOW_VALUE_SECTIONS) if options["skip_low_value_sections"] else [],
+                status=EmbeddingSpace.STATUS_BUILDING,
+            )
+            logger.info("Created embedding space %s", space)
+        else:
+            logger.info("Resuming embedding space %s (status: %s)", space, space.status)
+
+        embedder = TextEmbedder(space=space, stream_window=options["embed_window"])
+        embedded, _ = embedder.embed_missing(embed_batch=embed_batch)
+        # Second pass catches up on texts imported into the active space while this build ran.
+        caught_up, _ = embedder.embed_missing(embed_batch=embed_batch)
+        missing = embedder.texts_without_embeddings().count()
+        # Abstracts and chunk centroids for two-stage retrieval
+        embedder.embed_missing_paper_vectors()
+
+        logger.info("Building index %s", space.index_name)
+        create_space_index(space)
+        space.status = EmbeddingSpace.STATUS_READY
+        space.save(update_fields=["status"])
+
+        if options["activate"]:
+            activate_space(space)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Space '{space.name}' ready{' and active' if space.is_active else ''}. "
+            f"Embedded: {embedded + caught_up}, Texts not fully embedded: {missing}"
+        ))
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import json
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import AcademicPaperText, EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedder import chunk_paper_text, chunk_hash, make_splitter
+from PB_Assistant.apps.textprocessing.embedding_backends import load_sentence_transformer
+from PB_Assistant.apps.textprocessing.tei_text import LOW_VALUE_SECTIONS
+from PB_Assistant.apps.textprocessing.token_splitter import token_budget
+
+CONFIGS = (
+    ("recursive", EmbeddingSpace.CHUNKER_RECURSIVE, (), EmbeddingSpace.CHUNK_UNIT_CHARS),
+    ("sections", EmbeddingSpace.CHUNKER_SECTIONS, (), EmbeddingSpace.CHUNK_UNIT_CHARS),
+    ("sections, skip low-value", EmbeddingSpace.CHUNKER_SECTIONS, LOW_VALUE_SECTIONS, EmbeddingSpace.CHUNK_UNIT_CHARS),
+    ("recursive, tokens", EmbeddingSpace.CHUNKER_RECURSIVE, (), EmbeddingSpace.CHUNK_UNIT_TOKENS),
+    ("sections, skip, tokens", EmbeddingSpace.CHUNKER_SECTIONS, LOW_VALUE_SECTIONS, EmbeddingSpace.CHUNK_UNIT_TOKENS),
+)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the recursive splitter with the TEI section chunker, in characters and in model tokens, "
+        "on a sample of papers: chunk count/size, truncation and retrieval quality (recall@k, MRR) with "
+        "the active space's model. Writes nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=200, help="Number of papers with TEI sections to use")
+        parser.add_argument("--queries", default=None,
+                            help="Optional JSONL of {\"query\", \"academicpaper_id\"}; default: paper titles as queries")
+        parser.add_argument("--k", type=int, default=5, help="Cut-off for recall@k")
+        parser.add_argument("--batch-size", type=int, default=getattr(settings, "EMBEDDING_BATCH_SIZE", 64))
+
+    def handle(self, *args, **options):
+        space = EmbeddingSpace.get_active()
+        k: int = options["k"]
+        texts = list(
+            AcademicPaperText.objects
+            .filter(sections__isnull=False)
+            .select_related("academicpaper")
+            .order_by("?")[:options["sample"]]
+        )
+        if not texts:
+            raise CommandError("No texts with TEI sections; run import_pdfs or reprocess_text first")
+        paper_ids = {t.academicpaper_id for t in texts}
+        owner_ids = sorted(paper_ids)
+        owner_pos = {pid: i for i, pid in enumerate(owner_ids)}
+
+        if options["queries"]:
+            with open(options["queries"], "r", encoding="utf-8") as f:
+                queries = [json.loads(line) for line in f if line.strip()]
+            queries = [(q["query"], q["academicpaper_id"]) for q in queries if q["academicpaper_id"] in paper_ids]
+        else:
+            queries = [(t.academicpaper.title, t.academicpaper_id) for t in texts if t.academicpaper.title]
+        if not queries:
+            raise CommandError("No queries refer to the sampled papers")
+
+        model = load_sentence_transformer(space.model_name, backend=settings.EMBEDDING_BACKEND,
+                                          quantize=settings.EMBEDDING_QUANTIZE, threads=settings.EMBEDDING_THREADS)
+        # Character configs use the active space's parameters; token configs the model's full budget.
+        splitters = {
+            EmbeddingSpace.CHUNK_UNIT_CHARS: make_splitter(EmbeddingSpace(
+                name=space.name, chunk_size=space.chunk_size, chunk_overlap=space.chunk_overlap,
+                chunk_unit=EmbeddingSpace.CHUNK_UNIT_CHARS), model),
+            EmbeddingSpace.CHUNK_UNIT_TOKENS: make_splitter(EmbeddingSpace(
+                name=space.name, chunk_size=token_budget(model), chunk_overlap=50,
+                chunk_unit=EmbeddingSpace.CHUNK_UNIT_TOKENS), model),
+        }
+
+        def encode(chunks):
+            return _normalize(model.encode(
+                chunks, batch_size=options["batch_size"], convert_to_numpy=True, show_progress_bar=False
+            ))
+
+        query_vectors = encode([q for q, _ in queries])
+        cache: dict[str, np.ndarray] = {}
+
+        self.stdout.write(
+            f"Model: {space.model_name}, {len(texts)} papers, {len(queries)} queries, "
+            f"chunk size {space.chunk_size}/{space.chunk_overlap}"
+        )
+        self.stdout.write(f"  {'chunker':<26}{'chunks':>8}{'avg chars':>11}{'low-value':>11}{'truncated':>11}"
+                          f"{'recall@1':>10}{f'recall@{k}':>10}{'MRR':>8}{'encode s':>10}")
+        for label, chunker, skip, unit in CONFIGS:
+            chunk_texts, owners, low_value = [], [], 0
+            for paper_text in texts:
+                for chunk, section, _ in chunk_paper_text(paper_text, splitters[unit], chunker, skip):
+                    chunk_texts.append(chunk)
+                    owners.append(paper_text.academicpaper_id)
+                    low_value += section in LOW_VALUE_SECTIONS
+            token_counts = [len(ids) for ids in model.tokenizer(chunk_texts, verbose=False)["input_ids"]]
+            truncated = sum(count > model.max_seq_length for count in token_counts)
+            hashes = [chunk_hash(c) for c in chunk_texts]
+            todo = {h: c for h, c in zip(hashes, chunk_texts) if h not in cache}
+            start = time.perf_counter()
+            if todo:
+                cache.update(zip(todo, encode(list(todo.values()))))
+            elapsed = time.perf_counter() - start
+
+            # Papers are ranked by their best-matching chunk.
+            scores = query_vectors @ np.stack([cache[h] for h in hashes]).T
+            columns = np.array([owner_pos[o] for o in owners])
+            paper_scores = np.full((len(queries), len(owner_ids)), -np.inf)
+            np.maximum.at(paper_scores, (slice(None), columns), scores)
+            targets = np.array([owner_pos[pid] for _, pid in queries])
+            target_scores = paper_scores[np.arange(len(queries)), targets]
+            ranks = (paper_scores > target_scores[:, None]).sum(axis=1) + 1
+
+            self.stdout.write(
+                f"  {label:<26}{len(chunk_texts):>8}{np.mean([len(c) for c in chunk_texts]):>11.0f}"
+                f"{low_value / max(1, len(chunk_texts)):>10.1%} {truncated / max(1, len(chunk_texts)):>10.1%} "
+                f"{np.mean(ranks == 1):>9.3f}"
+                f"{np.mean(ranks <= k):>10.3f}{np.mean(1 / ranks):>8.3f}{elapsed:>10.1f}"
+            )
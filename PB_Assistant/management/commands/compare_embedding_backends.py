@@ -0,0 +1,64 @@
+from __future__ import annotations
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import AcademicPaperTextEmbedding, EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedding_backends import load_sentence_transformer, BACKENDS
+
+
+def _encode(model, chunks, batch_size):
+    start = time.perf_counter()
+    vectors = model.encode(chunks, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    elapsed = time.perf_counter() - start
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    return vectors, elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare an embedding backend (e.g. ONNX int8) against the fp32 PyTorch baseline on a sample "
+        "of stored chunks: throughput and cosine agreement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=BACKENDS, default="onnx")
+        parser.add_argument("--quantize", action="store_true", help="Use the dynamic int8 ONNX model")
+        parser.add_argument("--threads", type=int, default=None, help="Inference threads for both runs")
+        parser.add_argument("--sample", type=int, default=500, help="Number of chunks to encode")
+        parser.add_argument("--batch-size", type=int, default=getattr(settings, "EMBEDDING_BATCH_SIZE", 64))
+
+    def handle(self, *args, **options):
+        space = EmbeddingSpace.get_active()
+        chunks = list(
+            AcademicPaperTextEmbedding.objects
+            .filter(space=space)
+            .order_by("?")
+            .values_list("content", flat=True)[:options["sample"]]
+        )
+        if not chunks:
+            raise CommandError(f"No chunks stored in embedding space '{space.name}'")
+        threads = options["threads"] or settings.EMBEDDING_THREADS
+        batch_size = options["batch_size"]
+
+        baseline = load_sentence_transformer(space.model_name, backend="torch", threads=threads)
+        candidate = load_sentence_transformer(
+            space.model_name, backend=options["backend"], quantize=options["quantize"], threads=threads
+        )
+        # Warm up both models so one-off graph/session initialisation is not measured.
+        _encode(baseline, chunks[:8], batch_size)
+        _encode(candidate, chunks[:8], batch_size)
+
+        base_vecs, base_time = _encode(baseline, chunks, batch_size)
+        cand_vecs, cand_time = _encode(candidate, chunks, batch_size)
+        cosine = np.sum(base_vecs * cand_vecs, axis=1)
+
+        label = options["backend"] + (" int8" if options["quantize"] else "")
+        n = len(chunks)
+        self.stdout.write(f"Model: {space.model_name}, {n} chunks, batch size {batch_size}, threads {threads or 'default'}")
+        self.stdout.write(f"  torch fp32 : {n / base_time:8.1f} chunks/s")
+        self.stdout.write(f"  {label:<11}: {n / cand_time:8.1f} chunks/s ({base_time / cand_time:.2f}x)")
+        self.stdout.write(
+            f"  cosine agreement: mean {cosine.mean():.5f}, p1 {np.percentile(cosine, 1):.5f}, min {cosine.min():.5f}"
+        )
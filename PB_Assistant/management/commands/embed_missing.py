@@ -0,0 +1,45 @@
+from __future__ import annotations
+import sys
+import logging
+from typing import Optional
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+from PB_Assistant.apps.textprocessing.embedding_spaces import get_space
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+class Command(BaseCommand):
+    help = "Embed every AcademicPaperText that is not (completely) embedded yet, in cross-document batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--space", default=None, help="Embedding space name (default: the active space)")
+        parser.add_argument("--embed-batch", type=int, default=32, help="Number of papers whose chunks are embedded together")
+        parser.add_argument("--embed-window", type=int, default=None,
+                            help="Embed texts longer than this many chunks window by window (default: EMBEDDING_STREAM_WINDOW, 0 disables)")
+        parser.add_argument("--max-papers", type=int, default=None, help="Optional cap on number of papers to embed")
+
+    def handle(self, *args, **options):
+        embed_batch: int = max(1, options["embed_batch"])
+        max_papers: Optional[int] = options["max_papers"]
+
+        try:
+            space = get_space(options["space"])
+        except EmbeddingSpace.DoesNotExist:
+            raise CommandError(f"Embedding space not found: {options['space'] or '(active)'}")
+
+        embedder = TextEmbedder(space=space, stream_window=options["embed_window"])
+        if not embedder.texts_without_embeddings().exists():
+            logger.info("All texts already have embeddings in space '%s'.", space.name)
+            return
+
+        embedded, processed = embedder.embed_missing(embed_batch=embed_batch, max_papers=max_papers)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Embedded: {embedded}, Failed: {processed - embedded}"
+        ))
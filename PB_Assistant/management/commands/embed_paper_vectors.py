@@ -0,0 +1,43 @@
+from __future__ import annotations
+import sys
+import logging
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+from PB_Assistant.apps.textprocessing.embedding_spaces import get_space
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute paper-level vectors (abstract and mean of chunk vectors) for two-stage retrieval, "
+        "including papers imported from metadata only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--space", default=None, help="Embedding space name (default: the active space)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Papers per batch")
+        parser.add_argument("--all", action="store_true", help="Recompute every paper, not only those without vectors")
+
+    def handle(self, *args, **options):
+        batch_size: int = max(1, options["batch_size"])
+        everything: bool = options["all"]
+
+        try:
+            space = get_space(options["space"])
+        except EmbeddingSpace.DoesNotExist:
+            raise CommandError(f"Embedding space not found: {options['space'] or '(active)'}")
+
+        embedder = TextEmbedder(space=space)
+        if not everything and not embedder.papers_without_vectors().exists():
+            logger.info("All papers already have vectors in space '%s'.", space.name)
+            return
+
+        written = embedder.embed_missing_paper_vectors(batch_size=batch_size, everything=everything)
+        self.stdout.write(self.style.SUCCESS(f"Done. Paper vectors written: {written}"))
@@ -0,0 +1,45 @@
+from __future__ import annotations
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.corpus_snapshot import MANIFEST, VECTOR_DTYPES, SnapshotError, export_snapshot
+from PB_Assistant.apps.textprocessing.embedding_spaces import get_space
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the library (papers, texts) and one embedding space's chunk and paper vectors to a snapshot "
+        "directory (gzipped JSONL + .npy, with checksums) that import_corpus loads on another node."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", required=True, help="Snapshot directory to create")
+        parser.add_argument("--space", default=None, help="Embedding space name (default: the active space)")
+        parser.add_argument("--dtype", choices=VECTOR_DTYPES, default="float16",
+                            help="Vector precision in the snapshot; float16 halves its size")
+        parser.add_argument("--overwrite", action="store_true", help="Replace an existing snapshot in --output")
+
+    def handle(self, *args, **options):
+        output: str = options["output"]
+        if os.path.exists(os.path.join(output, MANIFEST)) and not options["overwrite"]:
+            raise CommandError(f"{output} already contains a snapshot (use --overwrite)")
+        try:
+            space = get_space(options["space"])
+        except EmbeddingSpace.DoesNotExist:
+            raise CommandError(f"Embedding space not found: {options['space'] or '(active)'}")
+
+        start = time.perf_counter()
+        try:
+            manifest = export_snapshot(space, output, dtype=options["dtype"])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+        files = manifest["files"]
+        size = sum(info["bytes"] for info in files.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Exported {files['papers.jsonl.gz']['rows']} papers, {files['texts.jsonl.gz']['rows']} texts and "
+            f"{files['chunks.jsonl.gz']['rows']} chunks of '{space.name}' to {output} "
+            f"({size / 2 ** 20:.0f} MB) in {elapsed:.1f}s"
+        ))
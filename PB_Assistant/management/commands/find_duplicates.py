@@ -0,0 +1,78 @@
+from __future__ import annotations
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from PB_Assistant.models import AcademicPaper
+from PB_Assistant.apps.textprocessing.near_duplicates import near_duplicate_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Report near-duplicate paper titles using the pg_trgm index. Titles that differ in a "
+        "number (e.g. the year of an annual report) are never reported. With --doi, list papers "
+        "sharing a DOI instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=int, default=90, help="Trigram similarity 0-100 (default 90)")
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many pairs")
+        parser.add_argument("--csv", default=None, help="Write the pairs to this CSV file instead of stdout")
+        parser.add_argument("--doi", action="store_true",
+                            help="List papers that share a DOI (these block the unique DOI constraint)")
+
+    def handle(self, *args, **options):
+        if options["doi"]:
+            return self.report_doi_duplicates(options["csv"])
+
+        threshold: int = options["threshold"]
+        limit = options["limit"]
+        if not 0 < threshold <= 100:
+            raise CommandError("--threshold must be between 1 and 100")
+
+        pairs = []
+        for pair in near_duplicate_pairs(threshold / 100):
+            pairs.append(pair)
+            if limit is not None and len(pairs) >= limit:
+                break
+
+        ids = {pid for a, b, _ in pairs for pid in (a, b)}
+        papers = AcademicPaper.objects.in_bulk(ids)
+        rows = [
+            (a, b, f"{sim:.3f}", papers[a].doi or "", papers[b].doi or "", papers[a].title, papers[b].title)
+            for a, b, sim in pairs
+        ]
+
+        if options["csv"]:
+            with open(options["csv"], "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["paper_id", "other_paper_id", "similarity", "doi", "other_doi", "title", "other_title"])
+                writer.writerows(rows)
+        else:
+            for a, b, sim, _, _, title, other_title in rows:
+                self.stdout.write(f"{sim}  #{a} {title}\n       #{b} {other_title}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Near-duplicate pairs: {len(rows)}"))
+
+    def report_doi_duplicates(self, csv_path):
+        dois = (
+            AcademicPaper.objects.filter(doi__isnull=False).values("doi")
+            .annotate(papers=Count("id")).filter(papers__gt=1).values_list("doi", flat=True)
+        )
+        # Only the columns needed, so this also works on a database that is not fully migrated.
+        rows = list(
+            AcademicPaper.objects.filter(doi__in=dois).order_by("doi", "id").values_list("doi", "id", "title")
+        )
+
+        if csv_path:
+            with open(csv_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["doi", "paper_id", "title"])
+                writer.writerows(rows)
+        else:
+            for doi, paper_id, title in rows:
+                self.stdout.write(f"{doi}  #{paper_id} {title}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. DOIs shared by several papers: {len({doi for doi, _, _ in rows})}, papers: {len(rows)}"
+        ))
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import sys
+import time
+import logging
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.corpus_snapshot import SnapshotError, import_snapshot
+from PB_Assistant.apps.textprocessing.embedding_spaces import activate_space, create_space_index
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore a snapshot written by export_corpus: bulk-load papers, texts and vectors with COPY, then "
+        "build the embedding space's indexes. Papers that already exist are left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--input", required=True, help="Snapshot directory")
+        parser.add_argument("--space", default=None, help="Load the vectors into this space (default: the snapshot's space name)")
+        parser.add_argument("--no-verify", action="store_true", help="Skip the checksum verification")
+        parser.add_argument("--activate", action="store_true", help="Switch search to the space afterwards")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            space, counts = import_snapshot(options["input"], space_name=options["space"], verify=not options["no_verify"])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        loaded = time.perf_counter() - start
+        logger.info(
+            "Loaded %d papers, %d texts, %d chunks in %.1fs",
+            counts["papers"], counts["texts"], counts["chunks"], loaded,
+        )
+
+        # Built after the load: one index build is much faster than maintaining HNSW per inserted row.
+        logger.info("Building indexes of space %s", space.name)
+        create_space_index(space)
+        if space.status != EmbeddingSpace.STATUS_READY:
+            space.status = EmbeddingSpace.STATUS_READY
+            space.save(update_fields=["status"])
+        if options["activate"]:
+            activate_space(space)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Space '{space.name}' ready{' and active' if space.is_active else ''}. Papers: {counts['papers']}, "
+            f"Texts: {counts['texts']}, Chunks: {counts['chunks']}, Paper vectors: {counts['paper_vectors']} "
+            f"({time.perf_counter() - start:.1f}s)"
+        ))
@@ -1,14 +1,26 @@
 from __future__ import annotations
 import os
 import glob
+import socket
 import sys
+import time
 import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from typing import Optional
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
 
+from PB_Assistant.models import AcademicPaperText, ImportRun
 from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
-from PB_Assistant.apps.textprocessing.pdf_text_extractor import PdfTextExtractor
+from PB_Assistant.apps.textprocessing.import_runs import Heartbeat, finish_batch, lease_batch, register_run
+from PB_Assistant.apps.textprocessing.ingest_manifest import IngestManifest
 from PB_Assistant.apps.textprocessing.pdf_ingest import PdfIngestService, get_boundary
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import CONSOLIDATION_MODES
+from PB_Assistant.apps.textprocessing.text_routing import TEXT_EXTRACTION_MODES, RouteCounter, make_text_extractor
 
 logger = logging.getLogger(__name__)
 handler = logging.StreamHandler(sys.stdout)
@@ -16,48 +28,210 @@ handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+# How often a file whose GROBID requests failed (overload, outage) is retried in place before
+# it is left for the next run (the manifest records it as "retry").
+RETRY_ROUNDS = 3
+
 
 class Command(BaseCommand):
-    help = "Import PDFs from a folder using GROBID (metadata + fulltext)."
+    help = (
+        "Import PDFs from a folder using GROBID (metadata + fulltext). With --run, several nodes share "
+        "the work: register the files once with --register, then start import_pdfs --run NAME on each node."
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("--folder", required=True, help="Folder containing PDF files")
+        parser.add_argument("--folder", default=None, help="Folder containing PDF files (in --run mode: defaults to the run's folder)")
         parser.add_argument("--boundary", default=None, help="Planetary boundary name or short_name to link new items to")
         parser.add_argument("--max-files", type=int, default=None, help="Optional cap on number of PDFs to process")
         parser.add_argument("--no-embed", action="store_true", help="Do not run embedding after fulltext insert")
+        parser.add_argument("--embed-batch", type=int, default=16, help="Number of papers whose chunks are embedded together")
+        parser.add_argument("--embed-window", type=int, default=None,
+                            help="Embed texts longer than this many chunks window by window (default: EMBEDDING_STREAM_WINDOW, 0 disables)")
+        parser.add_argument("--force", action="store_true", help="Re-process PDFs even if the ingest manifest marks them as done")
+        parser.add_argument("--near-duplicates", type=int, nargs="?", const=90, default=None, metavar="THRESHOLD",
+                            help="Also skip papers whose title is a near-duplicate of an existing one (trigram similarity 0-100, default 90)")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="PDFs processed in parallel; requests to GROBID are further limited adaptively")
+        parser.add_argument("--text-extraction", choices=TEXT_EXTRACTION_MODES, default=settings.PDF_TEXT_EXTRACTION,
+                            help="'auto' reads born-digital PDFs locally and sends only scans/poor text layers to GROBID")
+        parser.add_argument("--consolidation", choices=tuple(CONSOLIDATION_MODES), default=settings.GROBID_CONSOLIDATION,
+                            help="Header consolidation: GROBID's remote service, 'local' (match against the library) or 'none'")
+        parser.add_argument("--run", default=None, help="Name of a distributed import run")
+        parser.add_argument("--register", action="store_true", help="Coordinator: register the folder's PDFs for --run and exit")
+        parser.add_argument("--batch-size", type=int, default=50, help="Files per leased batch (with --register)")
+        parser.add_argument("--node", default=socket.gethostname(), help="Name of this node in --run mode")
+        parser.add_argument("--lease-seconds", type=int, default=600,
+                            help="A batch is handed to another node when its lease is not renewed for this long")
 
     def handle(self, *args, **options):
-        folder: str = options["folder"]
+        folder: Optional[str] = options["folder"]
         boundary_name: Optional[str] = options["boundary"]
         max_files: Optional[int] = options["max_files"]
         no_embed: bool = options["no_embed"]
+        force: bool = options["force"]
+        embed_batch: int = options["embed_batch"]
+        near_duplicates: Optional[int] = options["near_duplicates"]
+        run_name: Optional[str] = options["run"]
+
+        if options["register"]:
+            if not run_name:
+                raise CommandError("--register needs --run")
+            self._register(run_name, folder, boundary_name, max_files, options["batch_size"])
+            return
 
-        if not os.path.isdir(folder):
+        run = None
+        if run_name:
+            run = ImportRun.objects.filter(name=run_name).first()
+            if run is None:
+                raise CommandError(f"Unknown import run: {run_name} (register it with --register first)")
+            folder = folder or run.folder
+        if not folder or not os.path.isdir(folder):
             raise CommandError(f"Directory not found: {folder}")
 
-        boundary = get_boundary(boundary_name)
-        text_client = PdfTextExtractor()
-        embedder = None if no_embed else TextEmbedder()
-        service = PdfIngestService(text_client=text_client, embedder=embedder)
+        boundary = get_boundary(boundary_name) if boundary_name else (run.boundary if run else None)
+        self.embedder = None if no_embed else TextEmbedder(stream_window=options["embed_window"])
+        self.embed_batch = max(1, embed_batch)
+        self.pending_texts: list[AcademicPaperText] = []
+        self.manifest = IngestManifest(force=force)
+        self.workers = max(1, options["workers"])
+        text_extraction: str = options["text_extraction"]
+        consolidation: str = options["consolidation"]
+        routes = RouteCounter()
+        local = threading.local()
 
-        pdf_paths = sorted(glob.glob(os.path.join(folder, "**", "*.pdf"), recursive=True))
-        if max_files is not None:
-            pdf_paths = pdf_paths[:max_files]
-        if not pdf_paths:
-            logger.warning("No PDFs found.")
+        def service() -> PdfIngestService:
+            # One GROBID client per thread; they share the process-wide limiter and circuit breaker.
+            if not hasattr(local, "service"):
+                local.service = PdfIngestService(
+                    text_client=make_text_extractor(text_extraction, routes, consolidation), embedder=None,
+                    near_duplicate_threshold=near_duplicates, local_consolidation=consolidation == "local",
+                )
+            return local.service
+
+        self.service = service
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import") as self.pool:
+            if run is not None:
+                counts = self._work(run, folder, options["node"], timedelta(seconds=options["lease_seconds"]), boundary)
+            else:
+                pdf_paths = sorted(glob.glob(os.path.join(folder, "**", "*.pdf"), recursive=True))
+                if max_files is not None:
+                    pdf_paths = pdf_paths[:max_files]
+                if not pdf_paths:
+                    logger.warning("No PDFs found.")
+                    return
+                counts = Counter()
+                self._import_files(pdf_paths, boundary, counts)
+                self._flush_embeddings()
+
+        if text_extraction != "grobid":
+            logger.info("Fulltext extraction: %s", routes.summary())
+        others = sum(n for status, n in counts.items()
+                     if status not in ("new_record", "attached_fulltext", "skipped_empty", "unchanged", "retry"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Created: {counts['new_record']}, Text added to existing: {counts['attached_fulltext']}, "
+            f"Skipped parse error: {counts['skipped_empty']}, "
+            f"Unchanged: {counts['unchanged']}, GROBID unavailable (run again): {counts['retry']}, Other: {others}"
+        ))
+
+    def _process(self, pdf_path: str, boundary) -> tuple[str, AcademicPaperText | None]:
+        close_old_connections()
+        try:
+            is_unchanged, fp = self.manifest.check(pdf_path)
+            if is_unchanged:
+                return "unchanged", None
+            service = self.service()
+            status, item = service.ingest_file(pdf_path, boundary=boundary)
+            for rounds in range(1, RETRY_ROUNDS + 1):
+                if status != "retry":
+                    break
+                # Wait until the circuit breaker lets requests through again, at least a few seconds.
+                time.sleep(max(service.text_client.breaker.retry_after(), 5.0 * rounds))
+                status, item = service.ingest_file(pdf_path, boundary=boundary)
+            self.manifest.record(fp, status, item)
+            text = None
+            if item is not None and self.embedder is not None:
+                text = AcademicPaperText.objects.filter(academicpaper=item, hasfulltext=True).first()
+            return status or "duplicate", text
+        finally:
+            connections.close_all()
+
+    def _flush_embeddings(self):
+        if self.embedder is None or not self.pending_texts:
             return
+        pending, self.pending_texts = self.pending_texts, []
+        self.embedder.embed_academic_papers(pending)
+
+    def _import_files(self, pdf_paths, boundary, counts: Counter, heartbeat: Heartbeat | None = None,
+                      retries: list | None = None) -> bool:
+        """
+        Process files on the thread pool, at most 2 x workers submitted ahead; results are
+        collected in order and new papers are embedded in batches on this thread. Paths still
+        waiting for GROBID are appended to `retries`.
+        """
+        in_flight = deque()
+        completed = True
+
+        def collect():
+            idx, pdf_path, future = in_flight.popleft()
+            status, text = future.result()
+            logger.info("[%d/%d] %s (%s)", idx, len(pdf_paths), pdf_path, status)
+            counts[status] += 1
+            if status == "retry" and retries is not None:
+                retries.append(pdf_path)
+            if text is not None:
+                self.pending_texts.append(text)
+            if heartbeat is not None:
+                heartbeat.files_done += 1
+            if len(self.pending_texts) >= self.embed_batch:
+                self._flush_embeddings()
 
-        created = skipped = others = 0
         for idx, pdf_path in enumerate(pdf_paths, 1):
-            logger.info("[%d/%d] %s", idx, len(pdf_paths), pdf_path)
-            status, item = service.ingest_file(pdf_path, boundary=boundary)
-            if status == "new_record":
-                created += 1
-            elif status == "skipped_empty":
-                skipped += 1
-            else:
-                others += 1
+            if heartbeat is not None and heartbeat.lost.is_set():
+                completed = False
+                break
+            in_flight.append((idx, pdf_path, self.pool.submit(self._process, pdf_path, boundary)))
+            if len(in_flight) >= 2 * self.workers:
+                collect()
+        while in_flight:
+            collect()
+        return completed
 
+    def _register(self, run_name, folder, boundary_name, max_files, batch_size):
+        if not folder or not os.path.isdir(folder):
+            raise CommandError(f"Directory not found: {folder}")
+        pdf_paths = sorted(glob.glob(os.path.join(folder, "**", "*.pdf"), recursive=True))
+        if max_files is not None:
+            pdf_paths = pdf_paths[:max_files]
+        run, added = register_run(run_name, folder, pdf_paths, get_boundary(boundary_name), max(1, batch_size))
         self.stdout.write(self.style.SUCCESS(
-            f"Done. Created: {created}, Skipped parse error: {skipped}, Other: {others}"
+            f"Done. Registered {added} new PDFs for run '{run.name}' ({run.total_files} in total)"
         ))
+
+    def _work(self, run, folder, node, lease, boundary) -> Counter:
+        """
+        Lease batches until none are left; files are idempotent through the manifest. Files GROBID
+        could not process go back to the queue in a new batch, which this node leaves to other
+        nodes (or to its next run).
+        """
+        totals = Counter()
+        requeued = set()
+        while (batch := lease_batch(run, node, lease, exclude=requeued)) is not None:
+            logger.info("Batch %d (%d files, attempt %d)", batch.index, len(batch.paths), batch.attempts)
+            counts = Counter()
+            paths = [os.path.join(folder, rel) for rel in batch.paths]
+            retries = []
+            with Heartbeat(batch, lease) as heartbeat:
+                completed = self._import_files(paths, boundary, counts, heartbeat, retries)
+                self._flush_embeddings()
+            totals.update(counts)
+            finished, retry_batch = False, None
+            if completed:
+                finished, retry_batch = finish_batch(
+                    batch, dict(counts), [os.path.relpath(path, folder) for path in retries]
+                )
+            if not finished:
+                logger.warning("Batch %d was taken over by another node", batch.index)
+            if retry_batch is not None:
+                requeued.add(retry_batch.pk)
+        return totals
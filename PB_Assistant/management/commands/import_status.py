@@ -0,0 +1,61 @@
+from __future__ import annotations
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from PB_Assistant.models import ImportBatch, ImportRun
+from PB_Assistant.apps.textprocessing.import_runs import node_stats
+
+
+class Command(BaseCommand):
+    help = "Show progress of distributed import_pdfs runs: batches per state and throughput per node."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--run", default=None, help="Run name; default: all runs")
+        parser.add_argument("--window", type=int, default=15, help="Minutes used for the recent throughput column")
+
+    def handle(self, *args, **options):
+        runs = ImportRun.objects.order_by("created_at")
+        if options["run"]:
+            runs = runs.filter(name=options["run"])
+            if not runs.exists():
+                raise CommandError(f"Unknown import run: {options['run']}")
+        minutes: int = options["window"]
+        window = timedelta(minutes=minutes)
+        now = timezone.now()
+
+        for run in runs:
+            batches = ImportBatch.objects.filter(run=run).aggregate(
+                total=Count("id"),
+                queued=Count("id", filter=Q(status=ImportBatch.STATUS_QUEUED)),
+                leased=Count("id", filter=Q(status=ImportBatch.STATUS_LEASED, lease_expires_at__gte=now)),
+                expired=Count("id", filter=Q(status=ImportBatch.STATUS_LEASED, lease_expires_at__lt=now)),
+                done=Count("id", filter=Q(status=ImportBatch.STATUS_DONE)),
+                retried=Count("id", filter=Q(attempts__gt=1)),
+                files_done=Sum("files_done", filter=Q(status=ImportBatch.STATUS_DONE)),
+            )
+            files_done = batches["files_done"] or 0
+            self.stdout.write(
+                f"Run '{run.name}' ({run.folder}): {files_done}/{run.total_files} files "
+                f"({files_done / max(1, run.total_files):.1%})"
+            )
+            self.stdout.write(
+                f"  batches: {batches['done']} done, {batches['leased']} leased, {batches['expired']} expired "
+                f"(will be re-queued), {batches['queued']} queued, {batches['retried']} retried"
+            )
+
+            stats = node_stats(run, window)
+            if not stats:
+                continue
+            self.stdout.write(f"  {'node':<24}{'batches':>9}{'files':>9}{'created':>9}{'dup':>7}{'errors':>8}"
+                              f"{'files/min':>11}{f'last {minutes}m':>11}")
+            for s in stats:
+                counts = s["counts"]
+                name = s["node"] + (" *" if s["leased"] else "")
+                self.stdout.write(
+                    f"  {name:<24}{s['batches']:>9}{s['files']:>9}{counts.get('new_record', 0):>9}"
+                    f"{counts.get('duplicate', 0):>7}{counts.get('error', 0):>8}"
+                    f"{s['files_per_min']:>11.1f}{s['recent_files_per_min']:>11.1f}"
+                )
+            self.stdout.write("  (* = currently working on a batch)")
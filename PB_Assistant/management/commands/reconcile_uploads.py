@@ -0,0 +1,37 @@
+from __future__ import annotations
+import sys
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from PB_Assistant.apps.textprocessing.uploads import reconcile
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync the UploadedDocument table (the Knowledge Library listing) with the files in UPLOAD_DIR: "
+        "add files copied there by hand or uploaded before the table existed, update changed files "
+        "and remove rows of deleted files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", default=None,
+                            help="Only this user's folder (repeatable; default: every folder and user in the table)")
+        parser.add_argument("--rehash", action="store_true",
+                            help="Recompute the SHA-256 of every file, not only of new and changed ones")
+        parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+
+    def handle(self, *args, **options):
+        dry_run: bool = options["dry_run"]
+        logger.info("Reconciling uploads in %s%s", settings.UPLOAD_DIR, " (dry run)" if dry_run else "")
+        counts = reconcile(user_ids=options["user"], rehash=options["rehash"], dry_run=dry_run)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Added: {counts['added']}, Updated: {counts['updated']}, "
+            f"Removed: {counts['removed']}, Unchanged: {counts['unchanged']}"
+        ))
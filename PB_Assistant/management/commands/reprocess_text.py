@@ -0,0 +1,103 @@
+from __future__ import annotations
+import os
+import sys
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import AcademicPaperText, PdfIngestManifest
+from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import (
+    PdfTextExtractor, CONSOLIDATION_MODES, FULLTEXT_SERVICE, fulltext_options,
+)
+from PB_Assistant.apps.textprocessing.tei_cache import TeiCache, read_tei
+from PB_Assistant.apps.textprocessing.tei_text import extract_tei_divisions
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+def tei_file_to_text(tei_path: str) -> Tuple[Optional[str], Optional[list]]:
+    """Worker: read one cached TEI entry and return cleaned fulltext and its sections (no Django/DB access)."""
+    tei_xml = read_tei(tei_path)
+    if tei_xml is None:
+        return None, None
+    return PdfTextExtractor.clean_text(PdfTextExtractor.parse_tei_fulltext(tei_xml)), extract_tei_divisions(tei_xml)
+
+
+class Command(BaseCommand):
+    help = "Rebuild AcademicPaperText (and embeddings) from the TEI cache, without calling GROBID."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel TEI parsing processes")
+        parser.add_argument("--max-papers", type=int, default=None, help="Optional cap on number of papers to process")
+        parser.add_argument("--no-embed", action="store_true", help="Only rebuild texts, do not re-embed")
+        parser.add_argument("--embed-batch", type=int, default=32, help="Number of papers whose chunks are embedded together")
+
+    def handle(self, *args, **options):
+        workers: int = options["workers"]
+        max_papers: Optional[int] = options["max_papers"]
+        no_embed: bool = options["no_embed"]
+        embed_batch: int = options["embed_batch"]
+
+        cache = TeiCache()
+        if not cache.cache_dir.is_dir():
+            raise CommandError(f"TEI cache directory not found: {cache.cache_dir}")
+
+        rows = (
+            PdfIngestManifest.objects
+            .filter(academicpaper__isnull=False)
+            .order_by("academicpaper_id", "-updated_at")
+            .distinct("academicpaper_id")
+            .values_list("academicpaper_id", "sha256")
+        )
+        if max_papers is not None:
+            rows = rows[:max_papers]
+
+        # A PDF may have been processed with any consolidation mode; each is cached under its own key.
+        variants = list({value: fulltext_options(mode) for mode, value in CONSOLIDATION_MODES.items()}.values())
+        jobs = []
+        missing = 0
+        for paper_id, sha256 in rows:
+            tei_path = next(
+                (path for path in (cache.path_for(sha256, FULLTEXT_SERVICE, o) for o in variants) if path.exists()), None
+            )
+            if tei_path is not None:
+                jobs.append((paper_id, str(tei_path)))
+            else:
+                missing += 1
+        if not jobs:
+            logger.warning("No cached TEI found for any ingested paper.")
+            return
+
+        embedder = None if no_embed else TextEmbedder()
+        updated = empty = 0
+        pending = []
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            texts = pool.map(tei_file_to_text, [path for _, path in jobs], chunksize=8)
+            for idx, ((paper_id, _), (fulltext_str, sections)) in enumerate(zip(jobs, texts), 1):
+                if not fulltext_str:
+                    empty += 1
+                    continue
+                obj, created = AcademicPaperText.objects.update_or_create(
+                    academicpaper_id=paper_id,
+                    defaults={"text": fulltext_str, "hasfulltext": True, "sections": sections},
+                )
+                if embedder is not None:
+                    pending.append(obj)
+                    if len(pending) >= embed_batch:
+                        embedder.embed_academic_papers(pending)
+                        pending = []
+                updated += 1
+                if idx % 100 == 0:
+                    logger.info("[%d/%d] texts rebuilt", idx, len(jobs))
+        if embedder is not None and pending:
+            embedder.embed_academic_papers(pending)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Rebuilt: {updated}, Empty text: {empty}, Not in cache: {missing}"
+        ))
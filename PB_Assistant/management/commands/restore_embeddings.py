@@ -0,0 +1,43 @@
+from __future__ import annotations
+import os
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from PB_Assistant.models import EmbeddingSpace
+from PB_Assistant.apps.textprocessing.copy_loader import copy_embeddings, rows_from_files
+from PB_Assistant.apps.textprocessing.embedding_spaces import get_space
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load chunk embeddings into a space with binary COPY, from a JSONL file of chunk metadata "
+        "and a parallel .npy vector matrix."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunks", required=True, help="JSONL with academicpaper_text_id, chunk_index, content, content_hash (optional: section, section_title)")
+        parser.add_argument("--vectors", required=True, help=".npy matrix, one row per JSONL line")
+        parser.add_argument("--space", default=None, help="Embedding space name (default: the active space)")
+
+    def handle(self, *args, **options):
+        for key in ("chunks", "vectors"):
+            if not os.path.isfile(options[key]):
+                raise CommandError(f"File not found: {options[key]}")
+        try:
+            space = get_space(options["space"])
+        except EmbeddingSpace.DoesNotExist:
+            raise CommandError(f"Embedding space not found: {options['space'] or '(active)'}")
+        shape = np.load(options["vectors"], mmap_mode="r").shape
+        if shape[1:] != (space.dimensions,):
+            raise CommandError(
+                f"Vectors in {options['vectors']} have shape {shape}, "
+                f"embedding space '{space.name}' expects {space.dimensions} dimensions"
+            )
+
+        start = time.perf_counter()
+        merged = copy_embeddings(space, rows_from_files(options["chunks"], options["vectors"]), mark_complete=True)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Loaded {merged} embeddings into '{space.name}' in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import os
+import signal
+import socket
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from PB_Assistant.models import AcademicPaperText, EmbeddedText
+from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
+from PB_Assistant.apps.textprocessing.ingest_manifest import IngestManifest
+from PB_Assistant.apps.textprocessing.ingest_queue import (
+    claim_job, finish_job, heartbeat, requeue_stale, retry_job, run_job, set_stage,
+)
+from PB_Assistant.apps.textprocessing.pdf_ingest import PdfIngestService
+from PB_Assistant.apps.textprocessing.text_routing import make_text_extractor
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# Seconds between heartbeats of the jobs this worker holds; keep well below --stale-minutes.
+HEARTBEAT_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued PDF uploads. Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several "
+        "workers can run side by side; each runs at most --concurrency GROBID/import jobs at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.INGEST_WORKER_CONCURRENCY,
+                            help="PDFs processed in parallel by this worker")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls when idle")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument("--no-embed", action="store_true", help="Do not embed new papers (use embed_missing later)")
+        parser.add_argument("--embed-batch", type=int, default=8, help="Number of papers whose chunks are embedded together")
+        parser.add_argument("--stale-minutes", type=int, default=30,
+                            help="Requeue running jobs without a heartbeat for this long (their worker is assumed dead)")
+        parser.add_argument("--max-attempts", type=int, default=3)
+
+    def handle(self, *args, **options):
+        concurrency: int = max(1, options["concurrency"])
+        poll_interval: float = options["poll_interval"]
+        once: bool = options["once"]
+        embed_batch: int = max(1, options["embed_batch"])
+        stale_after = timedelta(minutes=options["stale_minutes"])
+        max_attempts: int = options["max_attempts"]
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        embedder = None if options["no_embed"] else TextEmbedder()
+        local = threading.local()
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            logger.info("Stopping after running jobs finish...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # Jobs claimed by this worker and not finished yet, kept alive by the heartbeat thread even
+        # while the main thread is busy embedding.
+        held = set()
+        held_lock = threading.Lock()
+        exiting = threading.Event()
+
+        def beat():
+            while not exiting.wait(HEARTBEAT_INTERVAL):
+                with held_lock:
+                    job_ids = list(held)
+                try:
+                    heartbeat(job_ids)
+                except Exception as e:
+                    logger.warning(f"Heartbeat failed: {e}")
+                finally:
+                    close_old_connections()
+            connections.close_all()
+
+        def release(job):
+            with held_lock:
+                held.discard(job.pk)
+
+        threading.Thread(target=beat, name="ingest-heartbeat", daemon=True).start()
+
+        def work(job):
+            # One GROBID client and manifest per thread; embedding is batched in the main thread.
+            if not hasattr(local, "service"):
+                local.service = PdfIngestService(
+                    text_client=make_text_extractor(), embedder=None,
+                    local_consolidation=settings.GROBID_CONSOLIDATION == "local",
+                )
+                local.manifest = IngestManifest()
+            close_old_connections()
+            try:
+                status, paper = run_job(job, local.service, local.manifest)
+                return status, paper, "Could not process this PDF; see the worker log" if status == "error" else ""
+            except Exception as e:
+                logger.exception("Ingest job %s failed", job.pk)
+                return "error", None, str(e)
+            finally:
+                connections.close_all()
+
+        pending = []  # (job, status, paper, text) waiting for embedding
+
+        def flush():
+            if not pending:
+                return
+            started = timezone.now()
+            embedder.embed_academic_papers([text for _, _, _, text in pending])
+            # A text counts as embedded only if this run wrote its completion marker.
+            embedded = set(EmbeddedText.objects.filter(
+                space=embedder.space,
+                academicpaper_text_id__in=[text.pk for _, _, _, text in pending],
+                updated_at__gte=started,
+            ).values_list("academicpaper_text_id", flat=True))
+            for job, status, paper, text in pending:
+                if text.pk in embedded:
+                    finish_job(job, status, paper)
+                else:
+                    finish_job(job, "error", paper, "Imported, but embedding failed; run embed_missing")
+                    logger.warning("Job %s: embedding failed", job.pk)
+                release(job)
+            pending.clear()
+
+        processed = 0
+        paused_until = 0.0
+        last_stale_check = 0.0
+        in_flight = {}
+        logger.info("Ingest worker %s started (concurrency %d)", worker, concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest") as pool:
+            while True:
+                if time.monotonic() - last_stale_check > 60:
+                    requeue_stale(stale_after, max_attempts)
+                    last_stale_check = time.monotonic()
+
+                idle = False
+                while not stopping.is_set() and len(in_flight) < concurrency and time.monotonic() >= paused_until:
+                    job = claim_job(worker)
+                    if job is None:
+                        idle = True
+                        break
+                    logger.info("Job %s: %s", job.pk, job.original_name)
+                    with held_lock:
+                        held.add(job.pk)
+                    in_flight[pool.submit(work, job)] = job
+
+                if not in_flight:
+                    flush()
+                    if stopping.is_set() or once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    status, paper, message = future.result()
+                    if status == "retry":
+                        # GROBID is overloaded or down: requeue and give it time before claiming more.
+                        retry_job(job)
+                        release(job)
+                        paused_until = time.monotonic() + settings.GROBID_RESET_TIMEOUT
+                        logger.info("Job %s: GROBID unavailable, requeued", job.pk)
+                        continue
+                    processed += 1
+                    text = None
+                    if embedder is not None and paper is not None:
+                        text = AcademicPaperText.objects.filter(academicpaper=paper, hasfulltext=True).first()
+                    if text is None:
+                        finish_job(job, status, paper, message)
+                        release(job)
+                        logger.info("Job %s: %s", job.pk, status)
+                    else:
+                        set_stage(job, "embedding")
+                        pending.append((job, status, paper, text))
+                if len(pending) >= embed_batch or idle:
+                    flush()
+
+        exiting.set()
+        self.stdout.write(self.style.SUCCESS(f"Done. Processed jobs: {processed}"))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0004_searchfolder_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfIngestManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('mtime', models.FloatField()),
+                ('status', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academicpaper', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingest_manifest', to='PB_Assistant.academicpaper')),
+            ],
+        ),
+    ]
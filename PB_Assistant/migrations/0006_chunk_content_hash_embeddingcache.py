@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:01
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0005_pdfingestmanifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicpapertextembedding',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('vector', pgvector.django.vector.VectorField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model_name', 'content_hash')},
+            },
+        ),
+        # Hash existing chunks and seed the cache with the vectors they already have, so the
+        # first re-embedding after this migration only encodes chunks whose text changed.
+        migrations.RunSQL(
+            sql=[
+                """
+                UPDATE "PB_Assistant_academicpapertextembedding"
+                SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+                WHERE content_hash IS NULL;
+                """,
+                """
+                INSERT INTO "PB_Assistant_embeddingcache" (model_name, content_hash, vector, created_at)
+                SELECT DISTINCT ON (content_hash) 'BAAI/bge-base-en-v1.5', content_hash, vector, now()
+                FROM "PB_Assistant_academicpapertextembedding"
+                ORDER BY content_hash
+                ON CONFLICT (model_name, content_hash) DO NOTHING;
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:04
+
+import django.db.models.deletion
+import django.utils.timezone
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+def create_default_space(apps, schema_editor):
+    """Register the existing 768-d bge-base vectors as the active space and index them."""
+    EmbeddingSpace = apps.get_model('PB_Assistant', 'EmbeddingSpace')
+    AcademicPaperTextEmbedding = apps.get_model('PB_Assistant', 'AcademicPaperTextEmbedding')
+    space = EmbeddingSpace.objects.create(
+        name='bge-base-en-v1-5',
+        model_name='BAAI/bge-base-en-v1.5',
+        dimensions=768,
+        chunk_size=800,
+        chunk_overlap=100,
+        status='ready',
+        is_active=True,
+        activated_at=django.utils.timezone.now(),
+    )
+    AcademicPaperTextEmbedding.objects.update(space=space)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS pb_embedding_space_{space.pk}_hnsw '
+        f'ON "PB_Assistant_academicpapertextembedding" '
+        f'USING hnsw ((vector::vector({space.dimensions})) vector_cosine_ops) '
+        f'WHERE space_id = {space.pk}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0006_chunk_content_hash_embeddingcache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='academicpapertextembedding',
+            name='vector',
+            field=pgvector.django.vector.VectorField(),
+        ),
+        migrations.CreateModel(
+            name='EmbeddingSpace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=64, unique=True)),
+                ('model_name', models.CharField(max_length=255)),
+                ('dimensions', models.IntegerField()),
+                ('chunk_size', models.IntegerField(default=800)),
+                ('chunk_overlap', models.IntegerField(default=100)),
+                ('status', models.CharField(default='building', max_length=16)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_embedding_space')],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='academicpapertextembedding',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='academicpapertextembedding',
+            name='space',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='PB_Assistant.embeddingspace'),
+        ),
+        migrations.RunPython(create_default_space, migrations.RunPython.noop),
+    ]
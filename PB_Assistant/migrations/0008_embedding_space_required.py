@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0007_embedding_spaces'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='academicpapertextembedding',
+            name='space',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='PB_Assistant.embeddingspace'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='academicpapertextembedding',
+            unique_together={('space', 'academicpaper_text', 'chunk_index')},
+        ),
+    ]
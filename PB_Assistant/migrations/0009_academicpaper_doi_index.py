@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0008_embedding_space_required'),
+    ]
+
+    operations = [
+        # Batch duplicate detection compares normalized DOIs, so normalize stored ones too.
+        migrations.RunSQL(
+            sql="""
+                UPDATE "PB_Assistant_academicpaper"
+                SET doi = NULLIF(lower(btrim(regexp_replace(btrim(doi), '^(https?://(dx\\.)?doi\\.org/|doi:\\s*)', '', 'i'))), '')
+                WHERE doi IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='academicpaper',
+            name='doi',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:10
+
+import re
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def backfill_title_normalized(apps, schema_editor):
+    """Same normalization as text_normalization.normalize_title, frozen here."""
+    AcademicPaper = apps.get_model('PB_Assistant', 'AcademicPaper')
+    non_word = re.compile(r'[\W_]+')
+    batch = []
+    for paper in AcademicPaper.objects.exclude(title__isnull=True).only('id', 'title').iterator(chunk_size=2000):
+        paper.title_normalized = non_word.sub(' ', paper.title.lower()).strip() or None
+        batch.append(paper)
+        if len(batch) >= 2000:
+            AcademicPaper.objects.bulk_update(batch, ['title_normalized'])
+            batch = []
+    if batch:
+        AcademicPaper.objects.bulk_update(batch, ['title_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0009_academicpaper_doi_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='academicpaper',
+            name='title_normalized',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+        migrations.RunPython(backfill_title_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='academicpaper',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title_normalized'], name='academicpaper_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
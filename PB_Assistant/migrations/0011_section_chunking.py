@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0010_academicpaper_title_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicpapertext',
+            name='sections',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='academicpapertextembedding',
+            name='section',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='academicpapertextembedding',
+            name='section_title',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='embeddingspace',
+            name='chunker',
+            field=models.CharField(choices=[('recursive', 'Recursive character splitter'), ('sections', 'TEI sections')], default='recursive', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='embeddingspace',
+            name='skip_sections',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0011_section_chunking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='embeddingspace',
+            name='chunk_unit',
+            field=models.CharField(choices=[('chars', 'Characters'), ('tokens', 'Model tokens')], default='chars', max_length=8),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_unique_dois(apps, schema_editor):
+    AcademicPaper = apps.get_model("PB_Assistant", "AcademicPaper")
+    duplicates = list(
+        AcademicPaper.objects.filter(doi__isnull=False).values("doi")
+        .annotate(papers=Count("id")).filter(papers__gt=1).order_by("doi")
+        .values_list("doi", "papers")
+    )
+    if duplicates:
+        listed = "\n".join(f"  {doi} ({papers} papers)" for doi, papers in duplicates[:50])
+        more = f"\n  ... and {len(duplicates) - 50} more" if len(duplicates) > 50 else ""
+        raise RuntimeError(
+            f"{len(duplicates)} DOIs belong to more than one paper, so the unique DOI constraint cannot be "
+            f"added:\n{listed}{more}\nList them with `python manage.py find_duplicates --doi`, delete or "
+            "correct the extra copies, then run migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0013_ingestjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('paths', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('leased', 'Leased'), ('done', 'Done')], default='queued', max_length=16)),
+                ('node', models.CharField(blank=True, default='', max_length=255)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('files_done', models.IntegerField(default=0)),
+                ('counts', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=64, unique=True)),
+                ('folder', models.CharField(max_length=1024)),
+                ('total_files', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        # Papers imported twice under the same DOI must be resolved by hand before the constraint
+        # can be added; nothing is changed here.
+        migrations.RunPython(check_unique_dois, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='academicpaper',
+            constraint=models.UniqueConstraint(condition=models.Q(('doi__isnull', False)), fields=('doi',), name='academicpaper_unique_doi'),
+        ),
+        migrations.AddField(
+            model_name='importrun',
+            name='boundary',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='PB_Assistant.planetaryboundary'),
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='PB_Assistant.importrun'),
+        ),
+        migrations.AddIndex(
+            model_name='importbatch',
+            index=models.Index(fields=['run', 'status', 'index'], name='importbatch_claim_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='importbatch',
+            unique_together={('run', 'index')},
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:37
+
+import django.db.models.deletion
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+def create_paper_indexes(apps, schema_editor):
+    """The table is empty, so the per-space indexes are cheap to build now; vectors come from embed_paper_vectors."""
+    EmbeddingSpace = apps.get_model('PB_Assistant', 'EmbeddingSpace')
+    for space in EmbeddingSpace.objects.all():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS pb_paper_vectors_{space.pk}_hnsw '
+            f'ON "PB_Assistant_academicpapervector" '
+            f'USING hnsw ((vector::vector({space.dimensions})) vector_cosine_ops) '
+            f'WHERE space_id = {space.pk}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0014_import_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicPaperVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('abstract', 'Abstract'), ('centroid', 'Mean of chunk vectors')], max_length=16)),
+                ('vector', pgvector.django.vector.VectorField()),
+                ('content_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academicpaper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paper_vectors', to='PB_Assistant.academicpaper')),
+                ('space', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='paper_vectors', to='PB_Assistant.embeddingspace')),
+            ],
+            options={
+                'unique_together': {('space', 'academicpaper', 'kind')},
+            },
+        ),
+        migrations.RunPython(create_paper_indexes, migrations.RunPython.noop),
+    ]
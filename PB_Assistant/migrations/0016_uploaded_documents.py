@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0015_paper_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('file_path', models.CharField(max_length=1024)),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('modified_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('academicpaper', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_documents', to='PB_Assistant.academicpaper')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='PB_Assistant.ingestjob')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', '-modified_at'], name='uploadeddoc_user_modified_idx'), models.Index(fields=['user_id', 'size'], name='uploadeddoc_user_size_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_id', 'name'), name='uploadeddocument_user_name_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_embedded_texts(apps, schema_editor):
+    # Texts embedded before the markers existed count as complete; their chunk sets cannot be checked.
+    EmbeddedText = apps.get_model("PB_Assistant", "EmbeddedText")
+    Embedding = apps.get_model("PB_Assistant", "AcademicPaperTextEmbedding")
+    schema_editor.execute(
+        f'INSERT INTO "{EmbeddedText._meta.db_table}" (space_id, academicpaper_text_id, chunk_count, updated_at) '
+        f'SELECT space_id, academicpaper_text_id, count(*), now() FROM "{Embedding._meta.db_table}" '
+        "GROUP BY space_id, academicpaper_text_id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PB_Assistant', '0016_uploaded_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddedText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_count', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academicpaper_text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedded_in', to='PB_Assistant.academicpapertext')),
+                ('space', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedded_texts', to='PB_Assistant.embeddingspace')),
+            ],
+            options={
+                'unique_together': {('space', 'academicpaper_text')},
+            },
+        ),
+        migrations.RunPython(mark_embedded_texts, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,14 @@
 from django.db import models
 from pgvector.django import VectorField
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.utils import timezone
 from django.utils.text import slugify
 import uuid
 import logging
 
+from PB_Assistant.text_normalization import normalize_title
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,11 +47,12 @@ class SearchHistory(models.Model):
 
 class AcademicPaper(models.Model):
     paper_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
-    doi = models.CharField(max_length=255, null=True, blank=True)
+    doi = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     time_edited = models.DateTimeField(null=True, blank=True)
     text = models.TextField(null=True, blank=True)
     title = models.CharField(max_length=512, null=True, blank=True)
     title_slug = models.SlugField(max_length=512, null=True, blank=True)
+    title_normalized = models.CharField(max_length=512, null=True, blank=True)
 
     publication_year = models.IntegerField(null=True, blank=True)
     source = models.CharField(max_length=255, null=True, blank=True)
@@ -57,9 +61,19 @@ class AcademicPaper(models.Model):
     meta = models.JSONField(null=True, blank=True)
     planetary_boundary = models.ManyToManyField(PlanetaryBoundary, through='AcademicPaperPlanetaryBoundary')
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["title_normalized"], opclasses=["gin_trgm_ops"], name="academicpaper_title_trgm"),
+        ]
+        constraints = [
+            # Concurrent importers (several import_pdfs nodes) must not insert the same DOI twice.
+            models.UniqueConstraint(fields=["doi"], condition=models.Q(doi__isnull=False), name="academicpaper_unique_doi"),
+        ]
+
     def save(self, *args, **kwargs):
         if self.title and not self.title_slug:
             self.title_slug = slugify(self.title)
+        self.title_normalized = normalize_title(self.title)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -73,21 +87,284 @@ class AcademicPaperText(models.Model):
     )
     text= models.TextField()
     hasfulltext = models.BooleanField(default=False)
+    # TEI divisions as [{"title", "label", "text"}], used by the section-aware chunker.
+    sections = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class EmbeddingSpace(models.Model):
+    """
+    A named embedding configuration (model, dimension, chunking). Each space keeps its own
+    chunk vectors and its own HNSW index; search reads from the single active space.
+    """
+    STATUS_BUILDING = "building"
+    STATUS_READY = "ready"
+    CHUNKER_RECURSIVE = "recursive"
+    CHUNKER_SECTIONS = "sections"
+    CHUNKER_CHOICES = [(CHUNKER_RECURSIVE, "Recursive character splitter"), (CHUNKER_SECTIONS, "TEI sections")]
+    CHUNK_UNIT_CHARS = "chars"
+    CHUNK_UNIT_TOKENS = "tokens"
+    CHUNK_UNIT_CHOICES = [(CHUNK_UNIT_CHARS, "Characters"), (CHUNK_UNIT_TOKENS, "Model tokens")]
+
+    name = models.SlugField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=255)
+    dimensions = models.IntegerField()
+    chunk_size = models.IntegerField(default=800)
+    chunk_overlap = models.IntegerField(default=100)
+    # Unit of chunk_size/chunk_overlap; "tokens" measures with the model's own tokenizer.
+    chunk_unit = models.CharField(max_length=8, choices=CHUNK_UNIT_CHOICES, default=CHUNK_UNIT_CHARS)
+    chunker = models.CharField(max_length=16, choices=CHUNKER_CHOICES, default=CHUNKER_RECURSIVE)
+    # Section labels (see tei_text.SECTION_LABELS) that the sections chunker leaves out.
+    skip_sections = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, default=STATUS_BUILDING)
+    is_active = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["is_active"],
+                condition=models.Q(is_active=True),
+                name="single_active_embedding_space",
+            ),
+        ]
+
+    @classmethod
+    def get_active(cls) -> "EmbeddingSpace":
+        return cls.objects.get(is_active=True)
+
+    @property
+    def index_name(self) -> str:
+        return f"pb_embedding_space_{self.pk}_hnsw"
+
+    @property
+    def paper_index_name(self) -> str:
+        return f"pb_paper_vectors_{self.pk}_hnsw"
+
+    def __str__(self):
+        return f"{self.name} ({self.model_name}, {self.dimensions}d)"
 
 class AcademicPaperTextEmbedding(models.Model):
+    space = models.ForeignKey(
+        EmbeddingSpace,
+        related_name="embeddings",
+        on_delete=models.CASCADE,
+    )
     academicpaper_text = models.ForeignKey(
         AcademicPaperText,
         related_name="academicpaper_embeddings",
         on_delete=models.CASCADE,
     )
-    vector = VectorField(dimensions=768)
+    # Dimension varies per space; each space has a partial index on vector::vector(dimensions).
+    vector = VectorField()
     chunk_index = models.IntegerField()
     content     = models.TextField()
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    section = models.CharField(max_length=32, null=True, blank=True)
+    section_title = models.CharField(max_length=512, null=True, blank=True)
 
     class Meta:
-        unique_together = (("academicpaper_text", "chunk_index"),)
+        unique_together = (("space", "academicpaper_text", "chunk_index"),)
+
+class EmbeddedText(models.Model):
+    """
+    Completion marker: every chunk of the text is stored in the space. Written in the same
+    transaction as the text's last chunk rows, so a text whose write failed halfway has rows
+    but no marker and is picked up again by `embed_missing`.
+    """
+    space = models.ForeignKey(EmbeddingSpace, related_name="embedded_texts", on_delete=models.CASCADE)
+    academicpaper_text = models.ForeignKey(AcademicPaperText, related_name="embedded_in", on_delete=models.CASCADE)
+    chunk_count = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("space", "academicpaper_text"),)
+
+class AcademicPaperVector(models.Model):
+    """
+    Paper-level vectors of one embedding space, for the first stage of two-stage retrieval:
+    the abstract (also for papers imported from metadata only) and the mean of the paper's
+    chunk vectors. Each space has a partial HNSW index on vector::vector(dimensions).
+    """
+    KIND_ABSTRACT = "abstract"
+    KIND_CENTROID = "centroid"
+    KIND_CHOICES = [(KIND_ABSTRACT, "Abstract"), (KIND_CENTROID, "Mean of chunk vectors")]
+
+    space = models.ForeignKey(EmbeddingSpace, related_name="paper_vectors", on_delete=models.CASCADE)
+    academicpaper = models.ForeignKey(AcademicPaper, related_name="paper_vectors", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    vector = VectorField()
+    # Hash of the abstract, so unchanged abstracts are not encoded again
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("space", "academicpaper", "kind"),)
+
+class EmbeddingCache(models.Model):
+    """Content-addressed chunk vectors, so unchanged chunk text is never encoded twice by the same model."""
+    model_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64)
+    vector = VectorField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (("model_name", "content_hash"),)
 
 class AcademicPaperPlanetaryBoundary(models.Model):
     academicpaper = models.ForeignKey(AcademicPaper, on_delete=models.CASCADE)
     planetary_boundary = models.ForeignKey(PlanetaryBoundary, on_delete=models.CASCADE)
+
+class PdfIngestManifest(models.Model):
+    """One row per source PDF seen by `import_pdfs`, used to skip unchanged files on re-runs."""
+    path = models.CharField(max_length=1024, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    status = models.CharField(max_length=32)
+    academicpaper = models.ForeignKey(
+        AcademicPaper,
+        related_name="ingest_manifest",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.status})"
+
+
+class IngestJob(models.Model):
+    """A PDF waiting to be ingested; claimed by `run_ingest_worker` with SELECT ... FOR UPDATE SKIP LOCKED."""
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user_id = models.IntegerField()
+    file_path = models.CharField(max_length=1024)
+    original_name = models.CharField(max_length=255)
+    planetary_boundaries = models.ManyToManyField(PlanetaryBoundary, blank=True, related_name="ingest_jobs")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Current step while running ("extracting", "embedding"), shown as progress in the library.
+    stage = models.CharField(max_length=32, blank=True, default="")
+    # Outcome of PdfIngestService.ingest_file ("new_record", "duplicate", "skipped_empty", "error").
+    result = models.CharField(max_length=32, blank=True, default="")
+    message = models.TextField(blank=True, default="")
+    academicpaper = models.ForeignKey(
+        AcademicPaper,
+        related_name="ingest_jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a running job without a recent heartbeat is requeued.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], condition=models.Q(status="queued"), name="ingestjob_queued_idx"),
+            models.Index(fields=["user_id", "-created_at"], name="ingestjob_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"IngestJob({self.id}, {self.original_name}, {self.status})"
+
+
+class UploadedDocument(models.Model):
+    """
+    A file in a user's upload folder, recorded at upload time so the Knowledge Library is listed
+    from the database instead of the disk. `reconcile_uploads` syncs it with files changed outside the app.
+    """
+    user_id = models.IntegerField()
+    name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    # File modification time, shown as the upload time.
+    modified_at = models.DateTimeField()
+    # Latest ingest job for the file; its status is the document's ingest status.
+    job = models.ForeignKey(IngestJob, related_name="documents", on_delete=models.SET_NULL, null=True, blank=True)
+    academicpaper = models.ForeignKey(
+        AcademicPaper,
+        related_name="uploaded_documents",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "name"], name="uploadeddocument_user_name_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user_id", "-modified_at"], name="uploadeddoc_user_modified_idx"),
+            models.Index(fields=["user_id", "size"], name="uploadeddoc_user_size_idx"),
+        ]
+
+    def __str__(self):
+        return f"UploadedDocument({self.user_id}, {self.name})"
+
+
+class ImportRun(models.Model):
+    """A distributed `import_pdfs` run: the coordinator splits a folder into batches that nodes lease."""
+    name = models.SlugField(max_length=64, unique=True)
+    # Folder as seen by the coordinator; batch paths are relative to it so nodes may mount it elsewhere.
+    folder = models.CharField(max_length=1024)
+    boundary = models.ForeignKey(PlanetaryBoundary, on_delete=models.SET_NULL, null=True, blank=True)
+    total_files = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"ImportRun({self.name}, {self.total_files} files)"
+
+
+class ImportBatch(models.Model):
+    """
+    A slice of an ImportRun's files. A node leases a batch until `lease_expires_at` and extends
+    the lease while it works; a batch whose lease expired is handed to the next node that asks.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_LEASED = "leased"
+    STATUS_DONE = "done"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_LEASED, "Leased"),
+        (STATUS_DONE, "Done"),
+    ]
+
+    run = models.ForeignKey(ImportRun, related_name="batches", on_delete=models.CASCADE)
+    index = models.IntegerField()
+    paths = models.JSONField(default=list)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    node = models.CharField(max_length=255, blank=True, default="")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    files_done = models.IntegerField(default=0)
+    # Outcome counts of the last attempt: {"new_record": n, "duplicate": n, "unchanged": n, ...}
+    counts = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (("run", "index"),)
+        indexes = [
+            models.Index(fields=["run", "status", "index"], name="importbatch_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"ImportBatch({self.run_id}#{self.index}, {self.status})"
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'PB_Assistant.apps.textprocessing',
     'PB_Assistant.apps.textprocessing.grobid',
     'PB_Assistant',
@@ -141,4 +142,74 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 GROBID_URL = os.getenv("GROBID_URL")
+# Client-side GROBID concurrency adapts between 1 and GROBID_MAX_CONCURRENCY (keep it at or below
+# GROBID's own concurrency setting). Optionally treat responses slower than GROBID_LATENCY_TARGET seconds as overload.
+GROBID_MAX_CONCURRENCY = int(os.getenv("GROBID_MAX_CONCURRENCY", "8"))
+GROBID_LATENCY_TARGET = float(os.getenv("GROBID_LATENCY_TARGET", "0")) or None
+# Consecutive failed requests before pausing all requests for GROBID_RESET_TIMEOUT seconds.
+GROBID_FAILURE_THRESHOLD = int(os.getenv("GROBID_FAILURE_THRESHOLD", "5"))
+GROBID_RESET_TIMEOUT = float(os.getenv("GROBID_RESET_TIMEOUT", "30"))
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+# Seconds the installed model list (/api/tags) and the list of models loaded in memory (/api/ps) are cached.
+OLLAMA_MODELS_TTL = float(os.getenv("OLLAMA_MODELS_TTL", "60"))
+OLLAMA_PS_TTL = float(os.getenv("OLLAMA_PS_TTL", "10"))
+
+# News feed on the start page. It is kept in memory for RSS_FEED_TTL seconds, then served stale (up to
+# RSS_FEED_MAX_STALE seconds) while it is refreshed in the background with a conditional request.
+RSS_FEED_URL = os.getenv("RSS_FEED_URL", "https://news.mongabay.com/?feed=custom&s=&post_type=posts&topic=planetary-boundaries")
+RSS_FEED_TTL = float(os.getenv("RSS_FEED_TTL", "900"))
+RSS_FEED_MAX_STALE = float(os.getenv("RSS_FEED_MAX_STALE", "86400"))
+
+# Header consolidation: "grobid" / "grobid-doi" (GROBID calls CrossRef/biblio-glutton for every PDF),
+# "local" (match headers against our own library, no network) or "none".
+GROBID_CONSOLIDATION = os.getenv("GROBID_CONSOLIDATION", "grobid")
+
+# "grobid": GROBID extracts every fulltext. "auto": use the PDF's own text layer when it is good
+# enough (born-digital PDFs) and GROBID only for scans and broken text layers; headers always come from GROBID.
+PDF_TEXT_EXTRACTION = os.getenv("PDF_TEXT_EXTRACTION", "grobid")
+
+# Compressed GROBID TEI responses, keyed by PDF hash. Set to an empty string to disable.
+TEI_CACHE_DIR = os.getenv("TEI_CACHE_DIR", str(BASE_DIR / "tei_cache"))
+
+# Embedding inference: "torch", "onnx" or "openvino". ONNX/OpenVINO exports are cached on disk.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "False").lower() == "true"
+EMBEDDING_QUANTIZATION_CONFIG = os.getenv("EMBEDDING_QUANTIZATION_CONFIG", "avx2")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+EMBEDDING_MODEL_CACHE_DIR = os.getenv("EMBEDDING_MODEL_CACHE_DIR", str(BASE_DIR / "model_cache"))
+# Texts longer than about this many chunks (e.g. long assessment reports) are chunked, encoded and
+# written in windows of this many chunks, bounding memory per document. 0 disables windowing.
+EMBEDDING_STREAM_WINDOW = int(os.getenv("EMBEDDING_STREAM_WINDOW", "256"))
+
+# Chunk sections (e.g. "references,acknowledgements") never returned by search; needs a "sections" embedding space.
+RETRIEVAL_EXCLUDE_SECTIONS = [s.strip() for s in os.getenv("RETRIEVAL_EXCLUDE_SECTIONS", "").split(",") if s.strip()]
+# "chunks": score the query against every chunk. "two_stage": pick the RETRIEVAL_PAPER_CANDIDATES closest
+# papers by abstract/mean-chunk vector first (this includes metadata-only papers), then search only their chunks.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "chunks")
+RETRIEVAL_PAPER_CANDIDATES = int(os.getenv("RETRIEVAL_PAPER_CANDIDATES", "50"))
+
+# Web uploads are saved in UPLOAD_DIR/<user id>/ and listed from the UploadedDocument table.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "upload_test")
+# Documents per page in the Knowledge Library.
+KNOWLEDGE_LIBRARY_PAGE_SIZE = int(os.getenv("KNOWLEDGE_LIBRARY_PAGE_SIZE", "50"))
+
+# PDFs processed in parallel by each run_ingest_worker process (web uploads are queued, not processed in the request).
+INGEST_WORKER_CONCURRENCY = int(os.getenv("INGEST_WORKER_CONCURRENCY", "2"))
+
+# Log level of the app's own modules (e.g. per-paper chunk statistics while embedding are logged at INFO).
+# Management commands print their progress through their own stdout handlers.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+    },
+    "loggers": {
+        "PB_Assistant": {"handlers": ["console"], "level": LOG_LEVEL},
+        "PB_Assistant.management.commands": {"propagate": False},
+    },
+}
@@ -0,0 +1,24 @@
+import io
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from PB_Assistant.apps.textprocessing.grobid.stub_server import STUB_DOI_PREFIX
+from PB_Assistant.models import AcademicPaper, PdfIngestManifest
+
+
+class BenchIngestSmokeTests(TransactionTestCase):
+    """A small bench_ingest run against the stub GROBID process; import_pdfs commits from worker threads."""
+
+    def test_bench_imports_and_removes_its_papers(self):
+        out = io.StringIO()
+        call_command(
+            "bench_ingest", docs=4, latency=0.0, jitter=0.0, workers=2, no_embed=True,
+            scanned_share=0.0, stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("docs/s", output)
+        self.assertIn("GROBID processFulltextDocument", output)
+        self.assertIn("Removed the benchmark's papers", output)
+        self.assertFalse(AcademicPaper.objects.filter(doi__startswith=STUB_DOI_PREFIX).exists())
+        self.assertFalse(PdfIngestManifest.objects.exists())
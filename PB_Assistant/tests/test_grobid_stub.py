@@ -0,0 +1,98 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from PB_Assistant.apps.textprocessing import pdf_text_extractor
+from PB_Assistant.apps.textprocessing.grobid.errors import (
+    GrobidCircuitOpen, GrobidOverloaded, GrobidRejected, GrobidUnavailable,
+)
+from PB_Assistant.apps.textprocessing.grobid.stub_server import (
+    STUB_DOI_PREFIX, StubGrobidServer, synthetic_pdf, synthetic_tei,
+)
+from PB_Assistant.apps.textprocessing.pdf_text_extractor import PdfTextExtractor
+
+
+@override_settings(TEI_CACHE_DIR="", GROBID_FAILURE_THRESHOLD=100)
+class PdfTextExtractorStubTests(SimpleTestCase):
+    """PdfTextExtractor against a local StubGrobidServer; every stub listens on its own port."""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.pdf_path = str(Path(self.folder.name) / "paper.pdf")
+        Path(self.pdf_path).write_bytes(synthetic_pdf(3))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_header_is_the_fixture_named_by_the_pdf(self):
+        fixtures = [synthetic_tei(i) for i in range(5)]
+        with StubGrobidServer(fixtures, run_id="t1") as stub:
+            tei_xml = PdfTextExtractor(grobid_url=stub.url).process_header(self.pdf_path)
+        self.assertIn(f"{STUB_DOI_PREFIX}.t1.3", tei_xml)
+        self.assertIn("Synthetic paper 3", tei_xml)
+        self.assertEqual(stub.stats["ok"], 1)
+
+    def test_server_error_is_rejected_not_retryable(self):
+        with StubGrobidServer([synthetic_tei(0)], error_rate=1.0) as stub:
+            with self.assertRaises(GrobidRejected) as ctx:
+                PdfTextExtractor(grobid_url=stub.url).process_header(self.pdf_path)
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertFalse(ctx.exception.retryable)
+
+    def test_overload_backs_off_then_raises(self):
+        with StubGrobidServer([synthetic_tei(0)], overload_rate=1.0) as stub:
+            extractor = PdfTextExtractor(grobid_url=stub.url, max_retries=2)
+            limit_before = extractor.limiter.limit
+            with mock.patch.object(pdf_text_extractor.time, "sleep") as sleep:
+                with self.assertRaises(GrobidOverloaded) as ctx:
+                    extractor.process_header(self.pdf_path)
+        self.assertTrue(ctx.exception.retryable)
+        self.assertEqual(ctx.exception.status_code, 503)
+        # One request per attempt, a growing pause between them, and a smaller concurrency limit
+        self.assertEqual(stub.stats["overloaded"], 3)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertLessEqual(delays[0], 1.5)
+        self.assertGreaterEqual(delays[1], 1.5)
+        self.assertLess(extractor.limiter.limit, limit_before)
+
+    def test_busy_stub_recovers_within_retries(self):
+        with StubGrobidServer([synthetic_tei(0)], overload_rate=0.5, seed=1) as stub:
+            extractor = PdfTextExtractor(grobid_url=stub.url, max_retries=5)
+            with mock.patch.object(pdf_text_extractor.time, "sleep"):
+                tei_xml = extractor.process_header(self.pdf_path)
+        self.assertIn("Synthetic paper", tei_xml)
+        self.assertEqual(stub.stats["ok"], 1)
+
+    def test_unreachable_grobid_is_unavailable(self):
+        with StubGrobidServer([synthetic_tei(0)]) as stub:
+            url = stub.url
+        with self.assertRaises(GrobidUnavailable) as ctx:
+            PdfTextExtractor(grobid_url=url, max_retries=0).process_header(self.pdf_path)
+        self.assertTrue(ctx.exception.retryable)
+
+    def test_busy_half_open_probe_reopens_the_circuit(self):
+        with StubGrobidServer([synthetic_tei(0)], overload_rate=1.0) as stub:
+            extractor = PdfTextExtractor(grobid_url=stub.url, max_retries=2)
+            breaker = extractor.breaker
+            breaker.failure_threshold, breaker.reset_timeout = 1, 0.2
+            breaker.record_failure()
+            time.sleep(0.25)
+            # The probe gets a 503: no retries, the circuit opens again and the probe is released.
+            with mock.patch.object(pdf_text_extractor.time, "sleep") as sleep:
+                with self.assertRaises(GrobidOverloaded):
+                    extractor.process_header(self.pdf_path)
+                with self.assertRaises(GrobidCircuitOpen):
+                    extractor.process_header(self.pdf_path)
+            self.assertEqual(stub.stats["overloaded"], 1)
+            sleep.assert_not_called()
+            self.assertTrue(breaker.is_open)
+            # Once GROBID is back, the next probe closes the circuit.
+            stub.overload_rate = 0.0
+            time.sleep(0.25)
+            tei_xml = extractor.process_header(self.pdf_path)
+        self.assertIn("Synthetic paper", tei_xml)
+        self.assertFalse(breaker.is_open)
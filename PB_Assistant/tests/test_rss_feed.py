@@ -0,0 +1,85 @@
+import json
+import time
+
+from django.test import SimpleTestCase
+
+from PB_Assistant.website.services.feed_stub_server import StubFeedServer, synthetic_feed
+from PB_Assistant.website.services.rss_feed import ERROR_PAYLOAD, FeedCache
+
+
+def titles(payload: bytes) -> list:
+    return [item["title"] for item in json.loads(payload)]
+
+
+class FeedCacheStubTests(SimpleTestCase):
+    """FeedCache against a local StubFeedServer; TTLs are fractions of a second."""
+
+    def wait_for_refresh(self, cache: FeedCache):
+        # A background refresh holds the single-flight lock until it is done.
+        with cache._fetching:
+            pass
+
+    def test_fresh_hit_is_served_from_memory(self):
+        with StubFeedServer() as stub:
+            cache = FeedCache(stub.url, ttl=60)
+            first = cache.get()
+            second = cache.get()
+        self.assertEqual(first[1], 200)
+        self.assertIs(second[0], first[0])
+        self.assertEqual(titles(first[0])[0], "Story 0 (v1)")
+        self.assertEqual(stub.stats["requests"], 1)
+
+    def test_stale_hit_returns_cached_feed_and_refreshes_once(self):
+        with StubFeedServer() as stub:
+            cache = FeedCache(stub.url, ttl=0.2)
+            old, _ = cache.get()
+            stub.publish(synthetic_feed(version=2))
+            stub.latency = 0.5
+            time.sleep(0.25)
+            start = time.monotonic()
+            stale = [cache.get()[0] for _ in range(5)]
+            elapsed = time.monotonic() - start
+            self.wait_for_refresh(cache)
+            fresh, _ = cache.get()
+        # The slow upstream never held a request, and only one refresh was sent.
+        self.assertLess(elapsed, 0.25)
+        self.assertTrue(all(payload is old for payload in stale))
+        self.assertEqual(stub.stats["requests"], 2)
+        self.assertEqual(stub.stats["conditional"], 1)
+        self.assertEqual(titles(fresh)[0], "Story 0 (v2)")
+
+    def test_not_modified_keeps_payload_and_resets_the_timer(self):
+        with StubFeedServer() as stub:
+            cache = FeedCache(stub.url, ttl=0.2)
+            old, _ = cache.get()
+            time.sleep(0.25)
+            cache.get()
+            self.wait_for_refresh(cache)
+            payload, status = cache.get()
+            requests_after = stub.stats["requests"]
+        self.assertEqual(stub.stats["not_modified"], 1)
+        self.assertIs(payload, old)
+        self.assertEqual(status, 200)
+        # The 304 counted as a fetch, so the next get was fresh again.
+        self.assertEqual(requests_after, 2)
+
+    def test_failure_backs_off(self):
+        with StubFeedServer() as stub:
+            stub.failing = True
+            cache = FeedCache(stub.url, ttl=0.2, retry_after=60)
+            self.assertEqual(cache.get(), (ERROR_PAYLOAD, 500))
+            self.assertEqual(cache.get(), (ERROR_PAYLOAD, 500))
+            self.assertEqual(stub.stats["requests"], 1)
+
+        with StubFeedServer() as stub:
+            cache = FeedCache(stub.url, ttl=0.2, retry_after=60)
+            old, _ = cache.get()
+            stub.failing = True
+            time.sleep(0.25)
+            cache.get()
+            self.wait_for_refresh(cache)
+            # The failed refresh keeps the old feed and is not retried within retry_after.
+            payloads = [cache.get() for _ in range(3)]
+        self.assertEqual(stub.stats["errors"], 1)
+        self.assertEqual(stub.stats["requests"], 2)
+        self.assertTrue(all(payload is old and status == 200 for payload, status in payloads))
@@ -0,0 +1,12 @@
+from __future__ import annotations
+import re
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize_title(title: str | None) -> str | None:
+    """Lower-case, punctuation-free, single-spaced title used for trigram matching."""
+    if not title:
+        return None
+    normalized = NON_WORD_RE.sub(' ', title.lower()).strip()
+    return normalized or None
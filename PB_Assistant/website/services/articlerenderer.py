@@ -1,4 +1,12 @@
 class ArticleRenderer:
+    @staticmethod
+    def _is_from(doc, article):
+        # Documents saved before two-stage retrieval carry only the text id.
+        metadata = doc["metadata"]
+        if metadata.get("academicpaper_id") is not None:
+            return metadata["academicpaper_id"] == article["id"]
+        return metadata["id"] == article["academicpaper_text_id"]
+
     @staticmethod
     def render_articles(articles):
         """
@@ -31,8 +39,8 @@ class ArticleRenderer:
                     if article.get('authors_string') else 'N/A'
                 ),
                 "journal": article["source"] or "N/A",
-                "page_contents": [(doc["page_content"]).replace('\"', '\'') for doc in retrieved_docs if doc["metadata"]["id"] == article["academicpaper_text_id"] and doc["metadata"]["chunk_id"] in list(chunk_ids)],
-                "page_contents_not_used_by_llm": [(doc["page_content"]).replace('\"', '\'') for doc in retrieved_docs if doc["metadata"]["id"] == article["academicpaper_text_id"] and doc["metadata"]["chunk_id"] not in list(chunk_ids)]
+                "page_contents": [(doc["page_content"]).replace('\"', '\'') for doc in retrieved_docs if ArticleRenderer._is_from(doc, article) and doc["metadata"]["chunk_id"] in list(chunk_ids)],
+                "page_contents_not_used_by_llm": [(doc["page_content"]).replace('\"', '\'') for doc in retrieved_docs if ArticleRenderer._is_from(doc, article) and doc["metadata"]["chunk_id"] not in list(chunk_ids)]
             }
             for article in articles
         ]
@@ -1,3 +1,4 @@
+from django.db.models import Q
 from django.forms.models import model_to_dict
 from PB_Assistant.models import SearchHistory, AcademicPaper, AcademicPaperText
 import logging
@@ -5,13 +6,18 @@ logger = logging.getLogger(__name__)
 
 class DatabaseHandler:
 
-    def retrieve_articles_by_doc_ids(self, doc_ids):
+    def retrieve_articles_by_doc_ids(self, doc_ids, academicpaper_ids=None):
+        # Abstract hits of two-stage retrieval have no text id, only the paper id.
         try:
-            academicpapers = AcademicPaper.objects.filter(academicpaper_text__id__in=doc_ids).distinct()
+            academicpapers = AcademicPaper.objects.filter(
+                Q(academicpaper_text__id__in=[i for i in doc_ids if i is not None])
+                | Q(id__in=[i for i in academicpaper_ids or [] if i is not None])
+            ).distinct()
             results = []
             for academicpaper in academicpapers:
                 article_dict = model_to_dict(academicpaper)
-                article_dict['academicpaper_text_id'] = academicpaper.academicpaper_text.id if academicpaper.academicpaper_text else None
+                paper_text = getattr(academicpaper, "academicpaper_text", None)
+                article_dict['academicpaper_text_id'] = paper_text.id if paper_text else None
                 article_dict['authors_string'] = ", ".join(a.get("name", "") for a in academicpaper.author_list if a.get("name"))
                 results.append(article_dict)
             return results
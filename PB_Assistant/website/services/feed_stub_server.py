@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_feed(items: int = 5, version: int = 1) -> bytes:
+    """An RSS 2.0 document with `items` entries; `version` is part of every title."""
+    entries = "".join(
+        f"<item><title>{escape(f'Story {i} (v{version})')}</title>"
+        f"<link>https://news.example.org/{version}/{i}</link>"
+        f"<description>&lt;p&gt;Planetary boundaries update {i}.&lt;/p&gt;</description>"
+        f"<pubDate>Mon, 19 Oct 2026 08:{i:02d}:00 GMT</pubDate></item>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Stub feed</title>{entries}</channel></rss>"
+    ).encode("utf-8")
+
+
+class StubFeedServer:
+    """
+    A local stand-in for the news feed. It serves `feed` with an ETag and Last-Modified, answers
+    304 to a matching If-None-Match / If-Modified-Since, and 500 while `failing`. Replace the
+    feed with `publish`. `latency` delays every answer.
+
+        with StubFeedServer(latency=0.5) as stub:
+            FeedCache(stub.url, ttl=1).get()
+    """
+
+    def __init__(self, feed: Optional[bytes] = None, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.failing = False
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "conditional": 0}
+        self._lock = threading.Lock()
+        self._version = 0
+        self.publish(feed if feed is not None else synthetic_feed())
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, feed: bytes):
+        """Serve a new feed version, with a new ETag and Last-Modified."""
+        with self._lock:
+            self._version += 1
+            self.feed = feed
+            self.etag = f'"v{self._version}"'
+            self.last_modified = formatdate(time.time() + self._version, usegmt=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/feed"
+
+    def start(self) -> "StubFeedServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="feed-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug("feed-stub: " + format, *args)
+
+            def _send(self, status: int, body: bytes = b"", headers: Optional[dict] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if_none_match = self.headers.get("If-None-Match")
+                if_modified_since = self.headers.get("If-Modified-Since")
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                    if if_none_match or if_modified_since:
+                        stub.stats["conditional"] += 1
+                    feed, etag, last_modified = stub.feed, stub.etag, stub.last_modified
+                    if stub.failing:
+                        outcome = "errors"
+                    elif (if_none_match == etag) or (if_none_match is None and if_modified_since == last_modified):
+                        outcome = "not_modified"
+                    else:
+                        outcome = "ok"
+                    stub.stats[outcome] += 1
+                if outcome == "errors":
+                    self._send(500, b"stub failure")
+                elif outcome == "not_modified":
+                    self._send(304, headers={"ETag": etag})
+                else:
+                    self._send(200, feed, {
+                        "Content-Type": "application/rss+xml", "ETag": etag, "Last-Modified": last_modified,
+                    })
+
+        return Handler
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Cached:
+    """One Ollama endpoint's last answer; a failure is remembered as well, for the same TTL."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.value = None
+        self.fetched_at = None
+        self.failed_at = None
+
+    def fresh(self, now: float) -> bool:
+        last = max(self.fetched_at or 0.0, self.failed_at or 0.0)
+        return (self.fetched_at is not None or self.failed_at is not None) and now - last < self.ttl
+
+
+class ModelCatalog:
+    """
+    Ollama's installed models (/api/tags, cached for `ttl` seconds) and the models currently loaded
+    in its memory (/api/ps, cached for `ps_ttl` seconds). If Ollama cannot be reached, the last
+    known lists are kept.
+
+    Expired lists are still served while one background thread refreshes them, so a slow Ollama
+    never holds a request; only the first snapshot waits for /api/tags.
+    """
+
+    def __init__(self, base_url: str, ttl: float = 60, ps_ttl: float = 10, timeout: float = 5):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._tags = _Cached(ttl)
+        self._ps = _Cached(ps_ttl)
+        # Guards the cached lists; held only to read or swap them, never during a request to Ollama.
+        self._lock = threading.Lock()
+        # Single flight: held by whichever thread is refreshing the lists.
+        self._fetching = threading.Lock()
+
+    def _get(self, path: str):
+        r = requests.get(f"{self.base_url}{path}", timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json() or {}
+        return sorted({m.get("name") for m in data.get("models", []) if m.get("name")}, key=str.lower)
+
+    def _fetch(self, cached: _Cached, path: str):
+        try:
+            value = self._get(path)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Ollama {path} failed: {e}")
+            with self._lock:
+                cached.failed_at = time.monotonic()
+            return
+        with self._lock:
+            cached.value = value
+            cached.fetched_at = time.monotonic()
+            cached.failed_at = None
+
+    def refresh(self):
+        """Fetch the lists whose cache expired. Call with `_fetching` held."""
+        for cached, path in ((self._tags, "/api/tags"), (self._ps, "/api/ps")):
+            with self._lock:
+                fresh = cached.fresh(time.monotonic())
+                # Loaded models are of no use without the model list.
+                if self._tags.value is None and cached is self._ps:
+                    return
+            if not fresh:
+                self._fetch(cached, path)
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._fetching.release()
+
+    def snapshot(self) -> dict:
+        """
+        {"models": [...], "loaded": [...], "status": {name: "warm" | "cold"}}, or None when the
+        model list has never been fetched.
+        """
+        now = time.monotonic()
+        with self._lock:
+            known = self._tags.value is not None
+            tags_fresh = self._tags.fresh(now)
+            stale = not (tags_fresh and self._ps.fresh(now))
+        if known:
+            if stale and self._fetching.acquire(blocking=False):
+                threading.Thread(target=self._background_refresh, name="ollama-catalog-refresh", daemon=True).start()
+        elif not tags_fresh:
+            # Nothing cached yet: wait for the refresh in flight, or make it.
+            with self._fetching:
+                self.refresh()
+
+        with self._lock:
+            if self._tags.value is None:
+                return None
+            # Loaded models are polled separately; without /api/ps every model counts as cold.
+            models = self._tags.value
+            loaded = [name for name in (self._ps.value or []) if name in models]
+        return {
+            "models": models,
+            "loaded": loaded,
+            "status": {name: "warm" if name in loaded else "cold" for name in models},
+        }
+
+    def mark_loaded(self, model_name: str):
+        """A query just ran on `model_name`, so Ollama holds it now (for its keep_alive)."""
+        with self._lock:
+            if self._ps.value is not None and model_name not in self._ps.value:
+                self._ps.value = sorted(self._ps.value + [model_name], key=str.lower)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> ModelCatalog:
+    """The process-wide model catalog, configured from the OLLAMA_* settings."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog(
+                settings.OLLAMA_BASE_URL,
+                ttl=settings.OLLAMA_MODELS_TTL,
+                ps_ttl=settings.OLLAMA_PS_TTL,
+            )
+        return _catalog
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import List
+from typing import Iterable, List, Optional
 from django.conf import settings
 from langchain_classic.chains import RetrievalQA
 from langchain_classic.chains.combine_documents.stuff import StuffDocumentsChain
@@ -14,7 +14,10 @@ from langchain_core.documents import Document
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.retrievers import BaseRetriever
 from pgvector.django import CosineDistance
-from PB_Assistant.models import AcademicPaperTextEmbedding
+from django.db import connection, transaction
+from django.db.models import F
+from PB_Assistant.models import AcademicPaper, AcademicPaperTextEmbedding, AcademicPaperVector, EmbeddingSpace
+from PB_Assistant.apps.textprocessing.embedding_spaces import space_vector
 
 logger = logging.getLogger(__name__)
 
@@ -81,23 +84,112 @@ def build_llm_chain(model_name:str) -> LLMChain:
     return LLMChain(llm=llm, prompt=main_prompt)
 
 
-def build_custom_retrieval_qa_chain(llm_chain: LLMChain, query_vector) -> RetrievalQA:
+def _search_chunks(query_vector, space: EmbeddingSpace, sections, exclude_sections, k: int,
+                   academicpaper_ids: Optional[List[int]] = None) -> List[tuple]:
+    embeddings_qs = AcademicPaperTextEmbedding.objects.filter(space=space)
+    if sections:
+        embeddings_qs = embeddings_qs.filter(section__in=list(sections))
+    if exclude_sections:
+        embeddings_qs = embeddings_qs.exclude(section__in=list(exclude_sections))
+    if academicpaper_ids is None:
+        distance = CosineDistance(space_vector(space), query_vector)
+    else:
+        # Exact distances over the candidates' chunks: the uncast column does not match the HNSW
+        # index, whose approximate scan would filter out most rows after the fact.
+        embeddings_qs = embeddings_qs.filter(academicpaper_text__academicpaper_id__in=academicpaper_ids)
+        distance = CosineDistance("vector", query_vector)
+    embeddings_qs = embeddings_qs.annotate(
+        distance=distance, paper_pk=F("academicpaper_text__academicpaper_id"),
+    ).order_by("distance")[:k]
+    return [
+        (emb.distance, LangchainDocument(page_content=emb.content, metadata={
+            "chunk_id": f"{emb.academicpaper_text_id}:{emb.chunk_index}",
+            "id": emb.academicpaper_text_id,
+            "academicpaper_id": emb.paper_pk,
+            "section": emb.section_title or emb.section,
+        }))
+        for emb in embeddings_qs
+    ]
+
+
+def _candidate_papers(query_vector, space: EmbeddingSpace, paper_candidates: int) -> dict:
+    """
+    First stage: {academicpaper_id: abstract distance or None} of the `paper_candidates` papers
+    whose abstract or chunk centroid is closest to the query, through the space's paper index.
+    """
+    limit = 2 * paper_candidates  # at most two vectors per paper
+    rows = (
+        AcademicPaperVector.objects.filter(space=space)
+        .annotate(distance=CosineDistance(space_vector(space), query_vector))
+        .order_by("distance")
+        .values_list("academicpaper_id", "kind", "distance")[:limit]
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        # HNSW scans return at most ef_search rows.
+        cursor.execute("SET LOCAL hnsw.ef_search = %s", [max(40, limit)])
+        rows = list(rows)
+    candidates: dict = {}
+    for paper_id, kind, distance in rows:
+        if paper_id not in candidates and len(candidates) >= paper_candidates:
+            continue
+        candidates.setdefault(paper_id, None)
+        if kind == AcademicPaperVector.KIND_ABSTRACT:
+            candidates[paper_id] = distance
+    return candidates
+
+
+def retrieve_documents(query_vector, space: EmbeddingSpace, sections: Optional[Iterable[str]] = None,
+                       exclude_sections: Optional[Iterable[str]] = None, k: int = 4,
+                       paper_candidates: Optional[int] = None) -> List[Document]:
+    """
+    The `k` chunks closest to the query. With `paper_candidates`, retrieval is two-stage: the
+    closest papers are selected by their paper-level vectors first, and only their chunks are
+    searched. Papers without chunks (metadata-only records) then compete with their abstract.
+    Falls back to plain chunk search when the space has no paper vectors yet.
+    """
+    if not paper_candidates:
+        return [doc for _, doc in _search_chunks(query_vector, space, sections, exclude_sections, k)]
+    candidates = _candidate_papers(query_vector, space, paper_candidates)
+    if not candidates:
+        return [doc for _, doc in _search_chunks(query_vector, space, sections, exclude_sections, k)]
+
+    scored = _search_chunks(query_vector, space, sections, exclude_sections, k, list(candidates))
+    with_chunks = set(
+        AcademicPaperVector.objects.filter(
+            space=space, academicpaper_id__in=list(candidates), kind=AcademicPaperVector.KIND_CENTROID,
+        ).values_list("academicpaper_id", flat=True)
+    )
+    abstract_only = {
+        paper_id: distance for paper_id, distance in candidates.items()
+        if distance is not None and paper_id not in with_chunks
+    }
+    use_abstracts = (not sections or "abstract" in sections) and "abstract" not in (exclude_sections or ())
+    if abstract_only and use_abstracts:
+        for paper in AcademicPaper.objects.filter(pk__in=list(abstract_only)).only("id", "text"):
+            scored.append((abstract_only[paper.pk], LangchainDocument(page_content=paper.text, metadata={
+                "chunk_id": f"abstract:{paper.pk}",
+                "id": None,
+                "academicpaper_id": paper.pk,
+                "section": "Abstract",
+            })))
+    scored.sort(key=lambda item: item[0])
+    return [doc for _, doc in scored[:k]]
+
+
+def build_custom_retrieval_qa_chain(llm_chain: LLMChain, query_vector, space: EmbeddingSpace,
+                                    sections: Optional[Iterable[str]] = None,
+                                    exclude_sections: Optional[Iterable[str]] = None,
+                                    paper_candidates: Optional[int] = None) -> RetrievalQA:
     """
     Custom RetrievalQA chain using AcademicPaperTextEmbedding instead of vector_store.
+    Only chunks of the given embedding space are searched, through that space's index.
+    `sections` / `exclude_sections` restrict the search by chunk section label; chunks
+    without a label (recursive chunker) are never excluded. `paper_candidates` enables
+    two-stage retrieval (see retrieve_documents).
     """
-    # Find similar embeddings
-    embeddings_qs = AcademicPaperTextEmbedding.objects.annotate(
-        distance=CosineDistance('vector', query_vector)
-    ).order_by('distance')[:4]
-
-    # Build Document objects
-    documents = []
-    for emb in embeddings_qs:
-        metadata = {
-            "chunk_id": f"{emb.academicpaper_text_id}:{emb.chunk_index}",
-            "id": emb.academicpaper_text_id,
-        }
-        documents.append(LangchainDocument(page_content=emb.content, metadata=metadata))
+    documents = retrieve_documents(
+        query_vector, space, sections=sections, exclude_sections=exclude_sections, paper_candidates=paper_candidates,
+    )
 
     document_prompt = PromptTemplate(
         input_variables=["page_content", "chunk_id"],
@@ -0,0 +1,213 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+NS_RDF = {'d': 'http://purl.org/rss/1.0/'}
+NS = {
+    'content': 'http://purl.org/rss/1.0/modules/content/',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+}
+ERROR_PAYLOAD = json.dumps({'error': 'Failed to fetch RSS feed'}).encode('utf-8')
+
+
+def normalize_date(raw_date):
+    if not raw_date:
+        return None
+    raw_date = raw_date.strip()
+    parsed = None
+    try:
+        parsed = parsedate_to_datetime(raw_date)
+    except Exception:
+        parsed = None
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(raw_date.replace('Z', '+00:00'))
+        except Exception:
+            return None
+    return parsed.date().strftime('%b %d, %Y')
+
+
+def clean_text(html_text):
+    if not html_text:
+        return ''
+    # Only needed when the feed is refreshed, so it is not loaded with the views.
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, 'html.parser')
+    return ' '.join(soup.get_text().split())
+
+
+def parse_feed(content: bytes, limit: int = 5, source: str = 'Mongabay') -> list:
+    """The first `limit` items of an RSS 2.0 or RSS 1.0 (RDF) feed as dicts for the news widget."""
+    parser = etree.XMLParser(recover=True)
+    root = etree.fromstring(content, parser=parser)
+    if root is None:
+        raise ValueError('Empty or unparseable feed')
+    if root.tag.endswith('RDF'):
+        item_nodes = root.findall('d:item', namespaces=NS_RDF)
+    else:
+        channel = root.find('channel')
+        if channel is None:
+            channel = root.find('.//channel')
+        item_nodes = channel.findall('item') if channel is not None else root.findall('.//item')
+
+    items = []
+    for item in item_nodes[:limit]:
+        title = item.findtext('title') or item.findtext('d:title', namespaces=NS_RDF)
+        link = item.findtext('link') or item.findtext('d:link', namespaces=NS_RDF)
+        description = (
+            item.findtext('content:encoded', namespaces=NS)
+            or item.findtext('description')
+            or item.findtext('d:description', namespaces=NS_RDF)
+        )
+        date_raw = (
+            item.findtext('pubDate')
+            or item.findtext('dc:date', namespaces=NS)
+            or item.findtext('d:date', namespaces=NS_RDF)
+        )
+
+        plain_text_description = clean_text(description)
+        if len(plain_text_description) > 140:
+            plain_text_description = plain_text_description[:140].rstrip() + '...'
+
+        if not title or not link:
+            continue
+
+        items.append({
+            'title': title,
+            'link': link,
+            'description': plain_text_description,
+            'date': normalize_date(date_raw),
+            'source': source,
+        })
+    return items
+
+
+class FeedCache:
+    """
+    The news feed, held in memory as ready-to-send JSON.
+
+    Within `ttl` seconds of the last fetch the cached payload is returned as is. After that it is
+    still returned (up to `max_stale` seconds) while one background thread revalidates it with
+    If-None-Match / If-Modified-Since, so a slow upstream never holds a request. Only the first
+    request, or one after `max_stale`, waits for the fetch. A failed fetch keeps the old payload
+    and is not retried for `retry_after` seconds.
+    """
+
+    def __init__(self, url: str, ttl: float = 900, max_stale: float = 86400, retry_after: float = 60,
+                 timeout: float = 10):
+        self.url = url
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.payload = None
+        self.fetched_at = 0.0
+        self.failed_at = None
+        self._etag = None
+        self._last_modified = None
+        # Guards the cached state; held only to read or swap it, never during a fetch.
+        self._lock = threading.Lock()
+        # Single flight: held by whichever thread is fetching the feed.
+        self._fetching = threading.Lock()
+
+    def _backing_off(self, now: float) -> bool:
+        return self.failed_at is not None and now - self.failed_at < self.retry_after
+
+    def _result(self):
+        with self._lock:
+            payload = self.payload
+        return (payload, 200) if payload is not None else (ERROR_PAYLOAD, 500)
+
+    def get(self):
+        """(json bytes, HTTP status) of the feed."""
+        now = time.monotonic()
+        with self._lock:
+            payload, age, backing_off = self.payload, now - self.fetched_at, self._backing_off(now)
+        if payload is not None and age < self.ttl:
+            return payload, 200
+        if payload is not None and age < self.ttl + self.max_stale:
+            if not backing_off:
+                self._refresh_in_background()
+            return payload, 200
+        if backing_off:
+            return self._result()
+        # Nothing usable cached: wait for the fetch in flight, or make it.
+        with self._fetching:
+            now = time.monotonic()
+            with self._lock:
+                expired = self.payload is None or now - self.fetched_at >= self.ttl + self.max_stale
+                backing_off = self._backing_off(now)
+            if expired and not backing_off:
+                self.refresh()
+        return self._result()
+
+    def _refresh_in_background(self):
+        if not self._fetching.acquire(blocking=False):
+            return
+        threading.Thread(target=self._background_refresh, name='rss-feed-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._fetching.release()
+
+    def refresh(self) -> bool:
+        """Fetch the feed (conditionally, once it has been fetched before). Call with `_fetching` held."""
+        headers = {
+            'User-Agent': 'PB_Assistant/1.0 (+https://example.com)',
+            'Accept': 'application/rss+xml, application/xml;q=0.9, */*;q=0.8',
+        }
+        with self._lock:
+            cached = self.payload is not None
+            etag, last_modified = self._etag, self._last_modified
+        if cached:
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        try:
+            response = requests.get(self.url, timeout=self.timeout, headers=headers)
+            not_modified = response.status_code == 304 and cached
+            if not not_modified:
+                response.raise_for_status()
+                payload = json.dumps(parse_feed(response.content)).encode('utf-8')
+        except Exception as e:
+            logger.error(f"Error fetching or parsing RSS feed: {e}")
+            with self._lock:
+                self.failed_at = time.monotonic()
+            return False
+        with self._lock:
+            if not not_modified:
+                self.payload = payload
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+            self.fetched_at = time.monotonic()
+            self.failed_at = None
+        return True
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed() -> FeedCache:
+    """The process-wide feed cache, configured from the RSS_FEED_* settings."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = FeedCache(
+                settings.RSS_FEED_URL,
+                ttl=settings.RSS_FEED_TTL,
+                max_stale=settings.RSS_FEED_MAX_STALE,
+            )
+        return _feed
@@ -1,24 +1,46 @@
 import time
 import logging
+import threading
+from django.conf import settings
 from .databasehandler import DatabaseHandler
 from .articlerenderer import ArticleRenderer
-from .qa_chain import build_llm_chain, build_custom_retrieval_qa_chain, process_qa_response, serialize_documents
+from PB_Assistant.models import EmbeddingSpace
 from PB_Assistant.apps.textprocessing.embedder import TextEmbedder
 
 logger = logging.getLogger(__name__)
 
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> TextEmbedder:
+    """The process-wide embedder of the active space, loaded on the first search and again after a space switch."""
+    global _embedder
+    with _embedder_lock:
+        active_id = EmbeddingSpace.objects.filter(is_active=True).values_list("id", flat=True).first()
+        if _embedder is None or _embedder.space.pk != active_id:
+            _embedder = TextEmbedder()
+        return _embedder
+
+
 class SearchService:
     def __init__(self):
         self.db_handler = DatabaseHandler()
-        self.embedder = TextEmbedder()
+        self.embedder = get_embedder()
 
     def perform_search(self, user_query, selected_model, user):
         """
         Orchestrates the search process.
         """
+        # LangChain is imported on the first search, not when the views module loads.
+        from .qa_chain import build_llm_chain, build_custom_retrieval_qa_chain, process_qa_response, serialize_documents
         query_vector = self.embedder.embed_text(user_query)
         llm_chain = build_llm_chain(model_name=selected_model)
-        qa = build_custom_retrieval_qa_chain(llm_chain, query_vector)
+        qa = build_custom_retrieval_qa_chain(
+            llm_chain, query_vector, self.embedder.space,
+            exclude_sections=settings.RETRIEVAL_EXCLUDE_SECTIONS,
+            paper_candidates=settings.RETRIEVAL_PAPER_CANDIDATES if settings.RETRIEVAL_MODE == "two_stage" else None,
+        )
 
         start_time = time.time()
         response = qa(user_query)
@@ -35,7 +57,8 @@ class SearchService:
         self.db_handler.save_search_history(user_id, user_query, answer, chunk_ids, serialized_docs)
 
         retrieved_doc_ids = [doc.metadata['id'] for doc in retrieved_documents]
-        articles = self.db_handler.retrieve_articles_by_doc_ids(retrieved_doc_ids)
+        retrieved_paper_ids = [doc.metadata.get('academicpaper_id') for doc in retrieved_documents]
+        articles = self.db_handler.retrieve_articles_by_doc_ids(retrieved_doc_ids, retrieved_paper_ids)
         articles_as_dict = ArticleRenderer.render_articles_and_contents(
             articles, serialized_docs, chunk_ids
         )
@@ -15,6 +15,7 @@ urlpatterns = [
     path("api/preferences/save/", views.save_preferences, name="save_preferences"),
     path("api/documents/upload/", views.upload_documents, name="upload_documents"),
     path("api/documents/delete/", views.delete_document, name='delete_document'),
+    path("api/documents/jobs/", views.ingest_jobs, name='ingest_jobs'),
     path('api/folders/', views.get_folders, name='get_folders'),
     path('api/folders/create/', views.create_folder, name='create_folder'),
     path('api/folders/<int:folder_id>/update/', views.update_folder, name='update_folder'),
@@ -1,40 +1,36 @@
 
+import hashlib
 import logging
-import requests
 import os 
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
-from django.http import HttpResponseBadRequest, JsonResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.contrib import messages
 from django.conf import settings
 import json
 from django.shortcuts import render, redirect
 from django.db.models import Count
+from django.core.paginator import Paginator
 
 from .services.databasehandler import DatabaseHandler
 from .services.articlerenderer import ArticleRenderer
 from .services.search_service import SearchService
+from .services.rss_feed import get_feed
+from .services.ollama_catalog import get_catalog
 
 logger = logging.getLogger(__name__)
 db_handler = DatabaseHandler()
 
-OLLAMA_BASE_URL = settings.OLLAMA_BASE_URL
-
 def ollama_models(request):
     """
-    Returns: {"models": ["llama3:latest", "mistral:7b", ...]}
+    Returns: {"models": ["llama3:latest", "mistral:7b", ...], "loaded": ["llama3:latest"],
+              "status": {"llama3:latest": "warm", "mistral:7b": "cold"}}
+    Models in "loaded" are already in Ollama's memory and answer without a loading delay.
     """
-    try:
-        r = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
-        r.raise_for_status()
-        data = r.json() or {}
-        names = sorted(
-            {m.get("name") for m in data.get("models", []) if m.get("name")},
-            key=str.lower
-        )
-        return JsonResponse({"models": list(names)})
-    except requests.RequestException as e:
-        # Friendly fallback for frontend; you can log e
+    catalog = get_catalog().snapshot()
+    if catalog is None:
+        # Friendly fallback for frontend
         return JsonResponse({"models": [], "error": "Ollama unreachable"}, status=503)
+    return JsonResponse(catalog)
 
 @require_GET
 def index(request):
@@ -59,6 +55,7 @@ def search(request):
 
     search_service = SearchService()
     search_context = search_service.perform_search(user_query, selected_model, request.user)
+    get_catalog().mark_loaded(selected_model)
 
     return render(request, 'website/search_result.html', {
         **search_context,
@@ -88,7 +85,8 @@ def load_history_item(request, id):
     chunk_ids = history_item['chunk_ids']
 
     doc_ids = [doc['metadata']['id'] for doc in source_documents]
-    articles = db_handler.retrieve_articles_by_doc_ids(doc_ids)
+    paper_ids = [doc['metadata'].get('academicpaper_id') for doc in source_documents]
+    articles = db_handler.retrieve_articles_by_doc_ids(doc_ids, paper_ids)
     articles_as_dict = ArticleRenderer.render_articles_and_contents(
         articles, source_documents, chunk_ids
     )
@@ -138,7 +136,11 @@ def save_preferences(request):
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-from PB_Assistant.models import SearchFolder, SearchHistory, PlanetaryBoundary
+from PB_Assistant.models import SearchFolder, SearchHistory, PlanetaryBoundary, IngestJob
+from PB_Assistant.apps.textprocessing.ingest_queue import enqueue_upload, job_counts
+from PB_Assistant.apps.textprocessing.uploads import (
+    DEFAULT_SORT, SORT_FIELDS, forget_upload, list_uploads, record_upload, user_upload_dir,
+)
 
 @require_GET
 def get_planetary_boundaries(request):
@@ -148,27 +150,61 @@ def get_planetary_boundaries(request):
 @require_POST
 def upload_documents(request):
     user_id = request.user.id if request.user.is_authenticated else 1
-    upload_dir = os.path.join('upload_test', str(user_id))
+    upload_dir = user_upload_dir(user_id)
     os.makedirs(upload_dir, exist_ok=True)
 
-    boundaries = request.POST.getlist('boundaries[]')
-    print("Selected Planetary Boundaries:", boundaries)
+    boundaries = list(PlanetaryBoundary.objects.filter(name__in=request.POST.getlist('boundaries[]')))
 
     files = request.FILES.getlist('documents')
     if not files:
         return JsonResponse({"error": "No documents provided"}, status=400)
 
+    # Files are only saved and queued here; run_ingest_worker does the GROBID/import work.
     saved_files = []
+    jobs = []
     for file in files:
         file_path = os.path.join(upload_dir, file.name)
+        digest = hashlib.sha256()
         with open(file_path, 'wb+') as destination:
             for chunk in file.chunks():
                 destination.write(chunk)
+                digest.update(chunk)
         saved_files.append(file.name)
+        job = enqueue_upload(user_id, file_path, file.name, boundaries)
+        record_upload(user_id, file_path, file.name, digest.hexdigest(), job)
+        jobs.append({"id": job.id, "name": file.name, "status": job.status})
+
+    return JsonResponse({
+        "message": f"{len(saved_files)} documents uploaded and queued for processing.",
+        "saved_files": saved_files,
+        "jobs": jobs,
+    }, status=202)
+
+def _job_as_dict(job):
+    return {
+        "id": job.id,
+        "name": job.original_name,
+        "status": job.status,
+        "stage": job.stage,
+        "result": job.result,
+        "message": job.message,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
 
+@require_GET
+def ingest_jobs(request):
+    """
+    Progress of the user's uploads: ?ids=1,2,3 for specific jobs, otherwise the 50 most recent.
+    """
+    user_id = request.user.id if request.user.is_authenticated else 1
+    jobs = IngestJob.objects.filter(user_id=user_id).order_by('-created_at')
+    ids = [i for i in request.GET.get('ids', '').split(',') if i.isdigit()]
+    if ids:
+        jobs = jobs.filter(id__in=ids)
     return JsonResponse({
-        "message": f"{len(saved_files)} documents uploaded successfully.",
-        "saved_files": saved_files
+        "counts": job_counts(user_id),
+        "jobs": [_job_as_dict(job) for job in jobs[:50]],
     })
 
 @require_http_methods(['DELETE'])
@@ -181,7 +217,7 @@ def delete_document(request):
             return JsonResponse({'error': 'Filename is required'}, status=400)
 
         user_id = request.user.id if request.user.is_authenticated else 1
-        upload_dir = os.path.join('upload_test', str(user_id))
+        upload_dir = user_upload_dir(user_id)
         
         # Sanitize filename to prevent directory traversal
         if '..' in filename or filename.startswith('/'):
@@ -193,6 +229,10 @@ def delete_document(request):
             # Security check: ensure the resolved path is within the user's upload directory
             if os.path.realpath(filepath).startswith(os.path.realpath(upload_dir)):
                 os.remove(filepath)
+                IngestJob.objects.filter(
+                    file_path=os.path.abspath(filepath), status=IngestJob.STATUS_QUEUED
+                ).delete()
+                forget_upload(user_id, filename)
                 return JsonResponse({'message': 'Document deleted successfully'}, status=200)
             else:
                 return JsonResponse({'error': 'Permission denied'}, status=403)
@@ -260,10 +300,6 @@ def delete_folder(request, folder_id):
         return JsonResponse({'error': 'Folder not found'}, status=404)
 
 
-from bs4 import BeautifulSoup
-from lxml import etree
-from email.utils import parsedate_to_datetime
-from datetime import datetime
 @require_http_methods(['PUT'])
 def move_history(request, history_id):
     user_id = 1  # Hardcoded for now
@@ -290,107 +326,27 @@ def move_history(request, history_id):
 
 @require_GET
 def knowledge_library_view(request):
+    """
+    The user's uploads from the UploadedDocument table: ?sort= (a key of SORT_FIELDS) and ?page=.
+    Files changed outside the app show up after `python manage.py reconcile_uploads`.
+    """
     user_id = request.user.id if request.user.is_authenticated else 1
-    upload_dir = os.path.join('upload_test', str(user_id))
-
-    documents = []
-    if os.path.exists(upload_dir):
-        for filename in os.listdir(upload_dir):
-            filepath = os.path.join(upload_dir, filename)
-            if os.path.isfile(filepath):
-                documents.append({
-                    'name': filename,
-                    'size': os.path.getsize(filepath),
-                    'timestamp': datetime.fromtimestamp(os.path.getmtime(filepath))
-                })
-    
-    # Sort documents by timestamp, newest first
-    documents.sort(key=lambda x: x['timestamp'], reverse=True)
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORT_FIELDS:
+        sort = DEFAULT_SORT
+
+    paginator = Paginator(list_uploads(user_id, sort), settings.KNOWLEDGE_LIBRARY_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
 
     context = {
-        'documents': documents
+        'documents': page.object_list,
+        'page': page,
+        'sort': sort,
     }
     return render(request, 'website/knowledge_library.html', context)
 
 @require_GET
 def rss_feed(request):
-    try:
-        url = 'https://news.mongabay.com/?feed=custom&s=&post_type=posts&topic=planetary-boundaries'
-        response = requests.get(
-            url,
-            timeout=10,
-            headers={
-                'User-Agent': 'PB_Assistant/1.0 (+https://example.com)',
-                'Accept': 'application/rss+xml, application/xml;q=0.9, */*;q=0.8',
-            },
-        )
-        response.raise_for_status()
-
-        parser = etree.XMLParser(recover=True)
-        root = etree.fromstring(response.content, parser=parser)
-        ns_rdf = {'d': 'http://purl.org/rss/1.0/'}
-        ns = {
-            'content': 'http://purl.org/rss/1.0/modules/content/',
-            'dc': 'http://purl.org/dc/elements/1.1/',
-        }
-        items = []
-        def normalize_date(raw_date):
-            if not raw_date:
-                return None
-            raw_date = raw_date.strip()
-            parsed = None
-            try:
-                parsed = parsedate_to_datetime(raw_date)
-            except Exception:
-                parsed = None
-            if parsed is None:
-                try:
-                    parsed = datetime.fromisoformat(raw_date.replace('Z', '+00:00'))
-                except Exception:
-                    return None
-            return parsed.date().strftime('%b %d, %Y')
-
-        def clean_text(html_text):
-            if not html_text:
-                return ''
-            soup = BeautifulSoup(html_text, 'html.parser')
-            return ' '.join(soup.get_text().split())
-
-        if root.tag.endswith('RDF'):
-            item_nodes = root.findall('d:item', namespaces=ns_rdf)
-        else:
-            channel = root.find('channel') or root.find('.//channel')
-            item_nodes = channel.findall('item') if channel is not None else root.findall('.//item')
-
-        for item in item_nodes[:5]:
-            title = item.findtext('title') or item.findtext('d:title', namespaces=ns_rdf)
-            link = item.findtext('link') or item.findtext('d:link', namespaces=ns_rdf)
-            description = (
-                item.findtext('content:encoded', namespaces=ns)
-                or item.findtext('description')
-                or item.findtext('d:description', namespaces=ns_rdf)
-            )
-            date_raw = (
-                item.findtext('pubDate')
-                or item.findtext('dc:date', namespaces=ns)
-                or item.findtext('d:date', namespaces=ns_rdf)
-            )
-
-            plain_text_description = clean_text(description)
-            if len(plain_text_description) > 140:
-                plain_text_description = plain_text_description[:140].rstrip() + '...'
-
-            if not title or not link:
-                continue
-
-            items.append({
-                'title': title,
-                'link': link,
-                'description': plain_text_description,
-                'date': normalize_date(date_raw),
-                'source': 'Mongabay',
-            })
-        return JsonResponse(items, safe=False)
-    except Exception as e:
-        logger.error(f"Error fetching or parsing RSS feed: {e}")
-        return JsonResponse({'error': 'Failed to fetch RSS feed'}, status=500)
+    # Served from the in-memory feed cache; refreshes happen in the background.
+    payload, status = get_feed().get()
+    return HttpResponse(payload, content_type='application/json', status=status)
@@ -13,7 +13,14 @@ async function loadModels() {
             showError('No models found. Is Ollama running? Try `ollama serve` and `ollama pull <model>`.');
             return;
         }
-        ollamaModelsDropdown.html(availableModels.map(n => `<option value="${n}">${n}</option>`).join(''));
+        // Models already loaded in Ollama's memory answer right away; list them first.
+        const status = data.status || {};
+        const orderedModels = availableModels.filter(n => status[n] === 'warm')
+            .concat(availableModels.filter(n => status[n] !== 'warm'));
+        ollamaModelsDropdown.html(orderedModels.map(n => {
+            const warm = status[n] === 'warm';
+            return `<option value="${n}" data-status="${warm ? 'warm' : 'cold'}">${n}${warm ? ' · loaded' : ''}</option>`;
+        }).join(''));
         ollamaModelsDropdown.prop('disabled', false); // important: enabled so it gets submitted
     } catch (e) {
         ollamaModelsDropdown.html('<option value="">Error loading models</option>');
@@ -340,7 +340,13 @@ $(document).ready(function () {
             return;
         }
 
-        $('#loading-overlay-text').text('Loading, please wait...');
+        // A model that is not in Ollama's memory yet is loaded before the first answer.
+        const selectedModel = $('#ollamaModels option:selected');
+        if (selectedModel.data('status') === 'cold') {
+            $('#loading-overlay-text').text(`Loading model ${selectedModel.val()} into memory, the first answer can take a minute...`);
+        } else {
+            $('#loading-overlay-text').text('Loading, please wait...');
+        }
         $('#loading-overlay').removeClass('hidden');
 
         const searchButton = $('#searchButton');